@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Benchmark response serialization and JSON rendering.
+
+Builds the bodies of the program list, history and check responses twice:
+with the ModelSerializers and DRF's JSONRenderer (the original path) and
+with the read-only serializers and FastJSONRenderer, checks that both give
+the same bytes, and reports the median time per response and the speedup.
+Sparse fieldsets (``?fields=``) and parsing a check request are measured
+too. Nothing touches the database.
+
+Run from the backend directory:
+    python benchmarks/json_rendering.py --page 20 --history 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from decimal import Decimal
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'government_benefits.settings')
+
+import django
+
+django.setup()
+
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from batch_eligibility import make_programs
+from eligibility.models import EligibilityCheck
+from eligibility.serializers import (
+    EligibilityCheckReadSerializer,
+    EligibilityCheckSerializer,
+    GovernmentProgramReadSerializer,
+    GovernmentProgramSerializer,
+)
+from government_benefits.renderers import FastJSONParser, FastJSONRenderer, orjson
+
+
+def median_ms(op, iterations):
+    op()
+    times = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        op()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def make_checks(count, programs, rng):
+    checks = []
+    for i in range(count):
+        check = EligibilityCheck(
+            id=i + 1, uuid=uuid.UUID(int=rng.getrandbits(128)), user_id=1, age=rng.randint(16, 100),
+            annual_income=Decimal(rng.randint(0, 12000000)) / 100, is_student=rng.random() < 0.3,
+            is_citizen=rng.random() < 0.9, household_size=rng.randint(1, 8), state='California',
+            total_potential_benefits=Decimal(rng.randint(0, 4000000)) / 100, created_at=timezone.now(),
+        )
+        check.evaluated_programs = rng.sample(programs, min(8, len(programs)))
+        checks.append(check)
+    return checks
+
+
+def request(query=''):
+    return Request(APIRequestFactory().get(f'/?{query}'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--page', type=int, default=20, help='Programs per program list page')
+    parser.add_argument('--history', type=int, default=20, help='Checks per history page')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    programs = make_programs(max(args.page, 50), rng)
+    for program in programs:
+        program.description = 'Helps eligible households cover essential costs. ' * 4
+        program.states = 'California,Oregon,Washington'
+        program.created_at = program.updated_at = timezone.now()
+    page = programs[:args.page]
+    checks = make_checks(args.history, programs, rng)
+    full, sparse = request(), request('fields=id,created_at,eligible_programs.id,eligible_programs.name')
+
+    cases = [
+        (f'programs ({args.page})',
+         lambda: JSONRenderer().render(
+             GovernmentProgramSerializer(page, many=True, context={'request': full}).data),
+         lambda: FastJSONRenderer().render(
+             GovernmentProgramReadSerializer(page, many=True, context={'request': full}).data)),
+        (f'history ({args.history} checks)',
+         lambda: JSONRenderer().render(
+             EligibilityCheckSerializer(checks, many=True, context={'request': full}).data),
+         lambda: FastJSONRenderer().render(
+             EligibilityCheckReadSerializer(checks, many=True, context={'request': full}).data)),
+        ('history, sparse',
+         lambda: JSONRenderer().render(
+             EligibilityCheckSerializer(checks, many=True, context={'request': sparse}).data),
+         lambda: FastJSONRenderer().render(
+             EligibilityCheckReadSerializer(checks, many=True, context={'request': sparse}).data)),
+        ('check',
+         lambda: JSONRenderer().render(EligibilityCheckSerializer(checks[0], context={'request': full}).data),
+         lambda: FastJSONRenderer().render(
+             EligibilityCheckReadSerializer(checks[0], context={'request': full}).data)),
+    ]
+
+    print(f'orjson {"installed" if orjson is not None else "not installed (stdlib fallback)"}')
+    print(f'{"response":<26}{"bytes":>9}{"original ms":>13}{"fast ms":>10}{"speedup":>9}')
+    for name, original, fast in cases:
+        body = original()
+        if fast() != body:
+            sys.exit(f'{name}: the fast path renders different bytes')
+        before = median_ms(original, args.iterations)
+        after = median_ms(fast, args.iterations)
+        print(f'{name:<26}{len(body):>9,}{before:>13.3f}{after:>10.3f}{before / after:>8.1f}x')
+
+    payload = FastJSONRenderer().render({
+        'age': 30, 'annual_income': '25000.00', 'is_student': False, 'is_citizen': True,
+        'household_size': 3, 'state': 'California',
+    })
+    before, after = (
+        median_ms(lambda: parser_class().parse(BytesIO(payload)), args.iterations * 10)
+        for parser_class in (JSONParser, FastJSONParser)
+    )
+    print(f'{"parse check request":<26}{len(payload):>9,}{before:>13.4f}{after:>10.4f}{before / after:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark the two layouts for a check's eligible programs.
+
+Inserts the same synthetic checks twice, once with only the compact
+eligible_program_ids column and once with a row per program in the M2M
+through table, and reports insert throughput and the growth of the
+tables involved. Everything runs in a transaction that is rolled back,
+but point it at a scratch database anyway. Needs at least one program.
+
+Run from the backend directory:
+    python benchmarks/program_set_storage.py --checks 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'government_benefits.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection, transaction
+
+from eligibility.models import EligibilityCheck, GovernmentProgram
+from users.models import User
+
+
+def table_bytes(tables):
+    """Return the on-disk size of ``tables`` (PostgreSQL) or of the database (SQLite)"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            total = 0
+            for table in tables:
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+                total += cursor.fetchone()[0]
+            return total
+        if connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA page_count')
+            page_count = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_size')
+            return page_count * cursor.fetchone()[0]
+    return None
+
+
+def make_checks(user, program_ids, count, rng):
+    checks = []
+    for _ in range(count):
+        eligible = sorted(rng.sample(program_ids, rng.randint(0, min(len(program_ids), 12))))
+        checks.append((EligibilityCheck(
+            user=user,
+            age=rng.randint(16, 100),
+            annual_income=Decimal(rng.randint(0, 120000)),
+            is_student=rng.random() < 0.4,
+            is_citizen=rng.random() < 0.9,
+            household_size=rng.randint(1, 8),
+            state='California',
+            total_potential_benefits=Decimal(rng.randint(0, 40000)),
+        ), eligible))
+    return checks
+
+
+def insert(checks, links, batch_size):
+    Through = EligibilityCheck.eligible_programs.through
+    for check, eligible in checks:
+        check.eligible_program_ids = [] if links else eligible
+    started = time.perf_counter()
+    for start in range(0, len(checks), batch_size):
+        batch = checks[start:start + batch_size]
+        created = EligibilityCheck.objects.bulk_create([check for check, _ in batch])
+        if links:
+            Through.objects.bulk_create([
+                Through(eligibilitycheck_id=check.pk, governmentprogram_id=program_id)
+                for check, (_, eligible) in zip(created, batch)
+                for program_id in eligible
+            ], batch_size=batch_size * 4)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    program_ids = list(GovernmentProgram.objects.values_list('id', flat=True))
+    if not program_ids:
+        sys.exit('No programs found; run seed_data.py first')
+
+    tables = [EligibilityCheck._meta.db_table, EligibilityCheck.eligible_programs.through._meta.db_table]
+    results = {}
+    with transaction.atomic():
+        user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+        for layout, links in (('compact', False), ('m2m', True)):
+            checks = make_checks(user, program_ids, args.checks, rng)
+            before = table_bytes(tables)
+            elapsed = insert(checks, links, args.batch_size)
+            after = table_bytes(tables)
+            growth = after - before if before is not None else None
+            link_rows = sum(len(eligible) for _, eligible in checks)
+            results[layout] = (elapsed, growth, link_rows)
+        transaction.set_rollback(True)
+
+    print(f'{args.checks} checks on {connection.vendor}')
+    for layout, (elapsed, growth, link_rows) in results.items():
+        size = f'{growth / 1024:>10,.0f} KiB' if growth is not None else '       n/a'
+        rows = f'{link_rows} through rows' if layout == 'm2m' else 'no through rows'
+        print(f'  {layout:<8}{args.checks / elapsed:>10,.0f} checks/s  {size}  ({rows})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+"""
+Concurrent-connection throughput of the WSGI and ASGI serving paths.
+
+Each path runs in its own process (the async views are picked when the
+URLconf is imported) and drives Django's real request handler in-process:
+
+  wsgi  WSGIHandler on a pool of --wsgi-threads threads, like one threaded
+        WSGI worker: connections beyond that wait for a free thread
+  asgi  ASGIHandler on one event loop with ELIGIBILITY_ASYNC_VIEWS on:
+        every connection is a task
+
+--concurrency clients each send requests back to back, cycling through
+the catalog, check, history and statistics endpoints (bearer-token
+authenticated). --db-latency-ms adds a sleep to every query to stand in
+for the network round trip to a database server, which is what a WSGI
+thread sits blocked on; SQLite has none of its own.
+
+A benchmark user and its checks are committed to the database and
+removed afterwards, so point it at SQLite or a throwaway PostgreSQL.
+
+Run from the backend directory:
+    python benchmarks/serving_throughput.py --concurrency 1,16,64 --db-latency-ms 2
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USERNAME = 'benchmark-serving'
+ENDPOINTS = ('programs', 'check', 'history', 'statistics')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def request_cycle(endpoints, token):
+    """(method, path, body, headers) for each endpoint in turn"""
+    auth = [(b'authorization', f'Bearer {token}'.encode())]
+    profile = json.dumps({'age': 20, 'annual_income': '15000.00', 'is_student': True,
+                          'is_citizen': True, 'household_size': 3, 'state': 'CA'}).encode()
+    requests = {
+        'programs': ('GET', '/api/eligibility/programs/', b'', []),
+        'check': ('POST', '/api/eligibility/check/', profile,
+                  auth + [(b'content-type', b'application/json')]),
+        'history': ('GET', '/api/eligibility/history/', b'', auth),
+        'statistics': ('GET', '/api/eligibility/statistics/', b'', []),
+    }
+    return [requests[name] for name in endpoints]
+
+
+def add_db_latency(seconds):
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # Fired on every reconnect of the same connection object
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+
+
+def seed(history):
+    from eligibility import rollups
+    from eligibility.models import EligibilityCheck, GovernmentProgram
+    from users.authentication import issue_pair
+    from users.models import User
+
+    cleanup()
+    user = User.objects.create_user(USERNAME, f'{USERNAME}@example.com')
+    program_ids = list(GovernmentProgram.objects.filter(is_active=True).values_list('id', flat=True))
+    EligibilityCheck.objects.bulk_create([
+        EligibilityCheck(
+            user=user, age=20 + i % 50, annual_income=Decimal(i % 90000), is_student=bool(i % 2),
+            is_citizen=True, household_size=1 + i % 6, state='CA',
+            eligible_program_ids=program_ids[i % max(len(program_ids), 1):][:8],
+            total_potential_benefits=Decimal(5000),
+        )
+        for i in range(history)
+    ], batch_size=1000)
+    rollups.reconcile()
+    return issue_pair(user)['access']
+
+
+def cleanup():
+    from eligibility import rollups
+    from eligibility.models import EligibilityCheck
+    from users.models import User
+
+    EligibilityCheck.objects.filter(user__username=USERNAME).delete()
+    User.objects.filter(username=USERNAME).delete()
+    rollups.reconcile()
+
+
+def run_wsgi(requests, concurrency, total, threads):
+    from django.core.wsgi import get_wsgi_application
+    from django.test.client import FakePayload
+
+    application = get_wsgi_application()
+
+    def handle(method, path, body, headers):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+            'SCRIPT_NAME': '', 'SERVER_NAME': 'testserver', 'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_LENGTH': str(len(body)), 'wsgi.input': FakePayload(body),
+            'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr, 'wsgi.multithread': True,
+            'wsgi.multiprocess': False, 'wsgi.run_once': False, 'wsgi.version': (1, 0),
+        }
+        for name, value in headers:
+            key = name.decode().upper().replace('-', '_')
+            environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value.decode()
+        status = []
+        result = application(environ, lambda status_line, response_headers: status.append(status_line))
+        try:
+            b''.join(result)
+        finally:
+            result.close()
+        return int(status[0].split()[0])
+
+    pool = ThreadPoolExecutor(max_workers=threads)
+    lock = threading.Lock()
+    sent = [0]
+    timings, failures = [], []
+
+    def client(offset):
+        # One connection: wait for each response before sending the next
+        position = offset
+        while True:
+            with lock:
+                if sent[0] >= total:
+                    return
+                sent[0] += 1
+            request = requests[position % len(requests)]
+            position += 1
+            started = time.perf_counter_ns()
+            status = pool.submit(handle, *request).result()
+            elapsed = time.perf_counter_ns() - started
+            with lock:
+                timings.append(elapsed)
+                if status >= 400:
+                    failures.append(status)
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    return timings, failures, elapsed
+
+
+def run_asgi(requests, concurrency, total):
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def handle(method, path, body, headers):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(), 'root_path': '',
+            'query_string': url.query.encode(), 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver'), (b'content-length', str(len(body)).encode())] + headers,
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await application(scope, receive, send)
+        return status[0]
+
+    async def main():
+        sent = [0]
+        timings, failures = [], []
+
+        async def client(offset):
+            position = offset
+            while sent[0] < total:
+                sent[0] += 1
+                request = requests[position % len(requests)]
+                position += 1
+                started = time.perf_counter_ns()
+                status = await handle(*request)
+                timings.append(time.perf_counter_ns() - started)
+                if status >= 400:
+                    failures.append(status)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(concurrency)))
+        return timings, failures, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def worker(args):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'government_benefits.settings')
+    import django
+
+    django.setup()
+    from django.test.utils import setup_test_environment
+
+    # Accept the 'testserver' host
+    setup_test_environment()
+    token = seed(args.history)
+    try:
+        if args.db_latency_ms:
+            add_db_latency(args.db_latency_ms / 1000)
+        requests = request_cycle(args.endpoints.split(','), token)
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            total = max(args.requests, concurrency * len(requests))
+            if args.worker == 'wsgi':
+                timings, failures, elapsed = run_wsgi(requests, concurrency, total, args.wsgi_threads)
+            else:
+                timings, failures, elapsed = run_asgi(requests, concurrency, total)
+            timings.sort()
+            print(json.dumps({
+                'path': args.worker,
+                'concurrency': concurrency,
+                'requests': len(timings),
+                'errors': len(failures),
+                'requests_per_s': len(timings) / elapsed,
+                'p50_ms': percentile(timings, 0.50) / 1e6,
+                'p99_ms': percentile(timings, 0.99) / 1e6,
+            }), flush=True)
+    finally:
+        cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,8,32,128', help='Comma-separated concurrent connections')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per concurrency level')
+    parser.add_argument('--wsgi-threads', type=int, default=8, help='Threads of the WSGI worker')
+    parser.add_argument('--db-latency-ms', type=float, default=1.0,
+                        help='Simulated network round trip added to every query')
+    parser.add_argument('--history', type=int, default=200, help='Eligibility checks seeded for the user')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help=f'Comma-separated subset of {", ".join(ENDPOINTS)}')
+    parser.add_argument('--paths', default='wsgi,asgi', help='Serving paths to measure')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--worker', choices=('wsgi', 'asgi'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    results = []
+    for path in args.paths.split(','):
+        env = dict(os.environ, ELIGIBILITY_ASYNC_VIEWS=str(path == 'asgi'))
+        command = [
+            sys.executable, os.path.abspath(__file__), '--worker', path,
+            '--concurrency', args.concurrency, '--requests', str(args.requests),
+            '--wsgi-threads', str(args.wsgi_threads), '--db-latency-ms', str(args.db_latency_ms),
+            '--history', str(args.history), '--endpoints', args.endpoints,
+        ]
+        completed = subprocess.run(command, env=env, cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True, check=True)
+        results += [json.loads(line) for line in completed.stdout.splitlines() if line.startswith('{')]
+
+    print(f'{"path":<6}{"conns":>7}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"errors":>8}')
+    for result in results:
+        print(f'{result["path"]:<6}{result["concurrency"]:>7}{result["requests_per_s"]:>10,.1f}'
+              f'{result["p50_ms"]:>10.2f}{result["p99_ms"]:>10.2f}{result["errors"]:>8}')
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'db_latency_ms': args.db_latency_ms, 'wsgi_threads': args.wsgi_threads,
+                       'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
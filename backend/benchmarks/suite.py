@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+"""
+Latency, throughput and allocation benchmarks for the hot paths.
+
+Runs each benchmark for a fixed number of iterations after a warmup and
+reports p50/p95/p99 latency, operations per second, and (in a separate,
+traced pass) the peak bytes allocated and the blocks still alive per
+operation. Covered:
+
+  rules.loop          the original per-program loop, per catalog size
+  rules.index         EligibilityIndex.evaluate, per catalog size
+  api.check           POST /check/ end to end, per catalog size
+  serialize.programs  GovernmentProgramSerializer, one page of programs
+  serialize.check     EligibilityCheckSerializer, one check with its programs
+  serialize.*_read    the same through the read-only serializers, rendered
+                      with FastJSONRenderer
+  api.history         GET /history/ (and ?compact=true), per history size
+  api.statistics      GET /statistics/, per history size
+  api.login           POST /auth/login/
+
+Everything written to the database is rolled back, but point it at SQLite
+or a throwaway PostgreSQL all the same. Results are JSON; pass --baseline
+with an earlier run to fail on regressions.
+
+Run from the backend directory:
+    python benchmarks/suite.py --output bench.json
+    python benchmarks/suite.py --baseline bench.json --histories 1000,1000000
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'government_benefits.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from batch_eligibility import loop_evaluate, make_profiles, make_programs
+from eligibility import rollups
+from eligibility.catalog import bump_catalog_version
+from eligibility.index import EligibilityIndex, invalidate_index
+from eligibility.memo import get_memo
+from eligibility.models import EligibilityCheck, GovernmentProgram
+from eligibility.serializers import (
+    EligibilityCheckReadSerializer,
+    EligibilityCheckSerializer,
+    GovernmentProgramReadSerializer,
+    GovernmentProgramSerializer,
+)
+from government_benefits.renderers import FastJSONRenderer
+from users.models import User
+
+PASSWORD = 'benchmark-password'
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def allocations(op, runs):
+    """Median peak bytes allocated, and blocks left alive, per call of ``op``"""
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(runs):
+            start_bytes = tracemalloc.get_traced_memory()[0]
+            start_blocks = len(tracemalloc.take_snapshot().traces)
+            tracemalloc.reset_peak()
+            op()
+            peaks.append(tracemalloc.get_traced_memory()[1] - start_bytes)
+            retained.append(len(tracemalloc.take_snapshot().traces) - start_blocks)
+    finally:
+        tracemalloc.stop()
+    return sorted(peaks)[len(peaks) // 2], sorted(retained)[len(retained) // 2]
+
+
+def measure(name, params, op, iterations, warmup, alloc_runs):
+    for _ in range(warmup):
+        op()
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        op_started = time.perf_counter_ns()
+        op()
+        timings.append(time.perf_counter_ns() - op_started)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    peak_bytes, retained_blocks = allocations(op, alloc_runs) if alloc_runs else (None, None)
+
+    result = {
+        'name': name,
+        'params': params,
+        'iterations': iterations,
+        'p50_ms': percentile(timings, 0.50) / 1e6,
+        'p95_ms': percentile(timings, 0.95) / 1e6,
+        'p99_ms': percentile(timings, 0.99) / 1e6,
+        'mean_ms': sum(timings) / len(timings) / 1e6,
+        'ops_per_s': iterations / elapsed,
+        'peak_alloc_bytes': peak_bytes,
+        'retained_blocks': retained_blocks,
+    }
+    print(f'  {result_key(result):<40} p50 {result["p50_ms"]:>9.3f} ms  p95 {result["p95_ms"]:>9.3f} ms  '
+          f'p99 {result["p99_ms"]:>9.3f} ms  {result["ops_per_s"]:>10,.1f}/s', file=sys.stderr)
+    return result
+
+
+def result_key(result):
+    params = ','.join(f'{key}={value}' for key, value in sorted(result['params'].items()))
+    return f'{result["name"]}[{params}]' if params else result['name']
+
+
+def catalog_changed():
+    # bulk_create and rollbacks send no catalog signals
+    bump_catalog_version()
+    invalidate_index()
+    get_memo().clear()
+
+
+def api_call(client, method, path, payload=None, expected=200):
+    def call():
+        response = getattr(client, method)(path, payload, format='json')
+        if response.status_code != expected:
+            raise RuntimeError(f'{method.upper()} {path} returned {response.status_code}')
+    return call
+
+
+def make_user(username):
+    user = User(username=username, email=f'{username}@example.com')
+    user.set_password(PASSWORD)
+    user.save()
+    return user
+
+
+def seed_checks(user, count, program_ids, rng, batch_size=5000):
+    now = timezone.now()
+    for start in range(0, count, batch_size):
+        EligibilityCheck.objects.bulk_create([
+            EligibilityCheck(
+                user=user, age=rng.randint(16, 100), annual_income=Decimal(rng.randint(0, 120000)),
+                is_student=rng.random() < 0.4, is_citizen=rng.random() < 0.9,
+                household_size=rng.randint(1, 8), state='California',
+                eligible_program_ids=rng.sample(program_ids, min(len(program_ids), 8)),
+                total_potential_benefits=Decimal(rng.randint(0, 40000)),
+                created_at=now,
+            )
+            for _ in range(min(batch_size, count - start))
+        ])
+
+
+def saved_programs(programs):
+    for program in programs:
+        program.id = None
+        program.description = ''
+    return GovernmentProgram.objects.bulk_create(programs, batch_size=5000)
+
+
+def run_catalog(size, args, rng, run):
+    programs = make_programs(size, rng)
+    profiles = make_profiles(1000, rng)
+    index = EligibilityIndex(programs, version='benchmark')
+    cycle = itertools.cycle(profiles)
+    params = {'programs': size}
+
+    # The loop is slow at 100k programs; a tenth of the iterations is plenty
+    loop_iterations = max(args.iterations // 10, 10) if size > 10000 else args.iterations
+    run('rules.loop', params, lambda: loop_evaluate(programs, next(cycle)), iterations=loop_iterations)
+    run('rules.index', params, lambda: index.evaluate(next(cycle)))
+
+    with transaction.atomic():
+        saved_programs(programs)
+        catalog_changed()
+        client = APIClient()
+        client.force_authenticate(make_user(f'benchmark-catalog-{size}'))
+
+        def post_check():
+            profile = next(cycle)
+            payload = dict(profile, annual_income=str(profile['annual_income']), state='CA')
+            api_call(client, 'post', '/api/eligibility/check/', payload)()
+
+        run('api.check', params, post_check)
+        transaction.set_rollback(True)
+    catalog_changed()
+
+
+def run_serializers(args, rng, run):
+    programs = make_programs(20, rng)
+    for program in programs:
+        program.created_at = program.updated_at = timezone.now()
+    check = EligibilityCheck(
+        id=1, user_id=1, age=30, annual_income=Decimal('25000.00'), is_student=False, is_citizen=True,
+        household_size=3, state='CA', total_potential_benefits=Decimal('12000.00'), created_at=timezone.now(),
+    )
+    check.evaluated_programs = programs[:8]
+    run('serialize.programs', {'page': len(programs)},
+        lambda: GovernmentProgramSerializer(programs, many=True).data)
+    run('serialize.check', {'eligible': len(check.evaluated_programs)},
+        lambda: EligibilityCheckSerializer(check).data)
+    run('serialize.programs_read', {'page': len(programs)},
+        lambda: FastJSONRenderer().render(GovernmentProgramReadSerializer(programs, many=True).data))
+    run('serialize.check_read', {'eligible': len(check.evaluated_programs)},
+        lambda: FastJSONRenderer().render(EligibilityCheckReadSerializer(check).data))
+
+
+def run_history(size, args, rng, run):
+    params = {'checks': size}
+    with transaction.atomic():
+        program_ids = [program.id for program in saved_programs(make_programs(50, rng))]
+        catalog_changed()
+        user = make_user(f'benchmark-history-{size}')
+        seed_checks(user, size, program_ids, rng)
+        rollups.reconcile()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {EligibilityCheck._meta.db_table}')
+
+        client = APIClient()
+        client.force_authenticate(user)
+        run('api.history', params, api_call(client, 'get', '/api/eligibility/history/'))
+        run('api.history', dict(params, compact=True),
+            api_call(client, 'get', '/api/eligibility/history/?compact=true'))
+        run('api.statistics', params, api_call(client, 'get', '/api/eligibility/statistics/'))
+        transaction.set_rollback(True)
+    catalog_changed()
+
+
+def run_login(args, rng, run):
+    with transaction.atomic():
+        user = make_user('benchmark-login')
+        client = APIClient()
+        # Password hashing dominates; keep the iteration count modest
+        run('api.login', {}, api_call(client, 'post', '/api/auth/login/',
+                                      {'username': user.username, 'password': PASSWORD}),
+            iterations=max(args.iterations // 10, 10))
+        transaction.set_rollback(True)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against ``baseline`` and return the regressed benchmark keys"""
+    previous = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    print(f'\nAgainst baseline {baseline["meta"].get("revision") or ""} '
+          f'(tolerance {tolerance:.0%}):', file=sys.stderr)
+    for result in results:
+        key = result_key(result)
+        before = previous.get(key)
+        if before is None:
+            print(f'  {key:<40} new', file=sys.stderr)
+            continue
+        p95_change = result['p95_ms'] / before['p95_ms'] - 1
+        rate_change = result['ops_per_s'] / before['ops_per_s'] - 1
+        regressed = p95_change > tolerance or rate_change < -tolerance / (1 + tolerance)
+        if regressed:
+            regressions.append(key)
+        print(f'  {key:<40} p95 {p95_change:>+7.1%}  throughput {rate_change:>+7.1%}'
+              f'{"  REGRESSION" if regressed else ""}', file=sys.stderr)
+    return regressions
+
+
+def sizes(value):
+    return [int(size) for size in value.split(',') if size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--catalogs', type=sizes, default=[10, 1000, 100000],
+                        help='catalog sizes for the rule and check benchmarks')
+    parser.add_argument('--histories', type=sizes, default=[1000, 100000],
+                        help='stored checks for the history and statistics benchmarks')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--alloc-runs', type=int, default=20,
+                        help='traced calls per benchmark for allocation figures (0 to skip)')
+    parser.add_argument('--only', default='',
+                        help='comma-separated benchmark name prefixes to run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown before a benchmark counts as regressed')
+    args = parser.parse_args()
+
+    # The test client needs the 'testserver' host and test email backend
+    setup_test_environment()
+    rng = random.Random(args.seed)
+    prefixes = tuple(prefix for prefix in args.only.split(',') if prefix)
+    results = []
+
+    def run(name, params, op, iterations=None):
+        if prefixes and not name.startswith(prefixes):
+            return
+        results.append(measure(name, params, op, iterations or args.iterations,
+                               args.warmup, args.alloc_runs))
+
+    print(f'Benchmarks on {connection.vendor}', file=sys.stderr)
+    for size in args.catalogs:
+        run_catalog(size, args, rng, run)
+    run_serializers(args, rng, run)
+    for size in args.histories:
+        run_history(size, args, rng, run)
+    run_login(args, rng, run)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'seed': args.seed,
+            'iterations': args.iterations,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        if regressions:
+            sys.exit(f'{len(regressions)} benchmark(s) regressed: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    main()
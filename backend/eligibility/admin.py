@@ -1,22 +1,104 @@
 from django.contrib import admin
-from .models import GovernmentProgram, EligibilityCheck, ApplicationStatus
+from django.contrib.admin import helpers
+from django.forms import modelformset_factory
+from django.template.response import TemplateResponse
+from .archive import recent_checks
+from .models import (
+    GovernmentProgram,
+    ProgramIncomeLimit,
+    EligibilityCheck,
+    ApplicationStatus,
+    StatisticsCounter,
+    DailyCheckRollup,
+    ReevaluationJob
+)
+from .simulation import SIMULATED_FIELDS, simulate
+
+class ProgramIncomeLimitInline(admin.TabularInline):
+    model = ProgramIncomeLimit
+    extra = 0
+    ordering = ['state', 'household_size']
 
 @admin.register(GovernmentProgram)
 class GovernmentProgramAdmin(admin.ModelAdmin):
     list_display = ['name', 'program_type', 'max_benefit_amount', 'is_active', 'created_at']
     list_filter = ['program_type', 'is_active', 'requires_enrollment', 'requires_citizenship']
-    search_fields = ['name', 'description']
+    search_fields = ['name', 'description', 'states']
     ordering = ['name']
+    inlines = [ProgramIncomeLimitInline]
+    actions = ['simulate_policy_change']
+    
+    @admin.action(description='Simulate criteria changes over past eligibility checks')
+    def simulate_policy_change(self, request, queryset):
+        # Edit the selected programs' criteria without saving them, then count
+        # the stored checks that would gain or lose each program
+        ProposalFormSet = modelformset_factory(GovernmentProgram, fields=SIMULATED_FIELDS, extra=0)
+        queryset = queryset.order_by('id')
+        formset = ProposalFormSet(request.POST if 'simulate' in request.POST else None,
+                                  queryset=queryset, prefix='proposal')
+        result = None
+        if formset.is_bound and formset.is_valid():
+            changes = {
+                form.instance.pk: {field: form.cleaned_data[field] for field in form.changed_data}
+                for form in formset.forms
+            }
+            # Fresh instances: validating the forms applied the proposals to theirs
+            result = simulate(queryset.all(), changes)
+        
+        return TemplateResponse(request, 'admin/eligibility/governmentprogram/simulate_policy.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Simulate criteria changes',
+            'opts': self.model._meta,
+            'formset': formset,
+            'queryset': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'result': result,
+        })
 
 @admin.register(EligibilityCheck)
 class EligibilityCheckAdmin(admin.ModelAdmin):
-    list_display = ['user', 'age', 'annual_income', 'is_student', 'total_potential_benefits', 'created_at']
+    list_display = ['user', 'age', 'annual_income', 'is_student', 'eligible_program_count',
+                    'total_potential_benefits', 'created_at']
     list_filter = ['is_student', 'is_citizen', 'created_at']
     search_fields = ['user__username', 'user__email']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'eligible_program_list']
+    exclude = ['eligible_programs']
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        # Only the retention window; older checks are on their way to the archive
+        return recent_checks(super().get_queryset(request))
+
+    @admin.display(description='Eligible programs')
+    def eligible_program_count(self, obj):
+        return len(obj.eligible_program_ids)
+
+    @admin.display(description='Eligible programs')
+    def eligible_program_list(self, obj):
+        programs = GovernmentProgram.objects.filter(id__in=obj.eligible_program_ids).order_by('name')
+        return ', '.join(program.name for program in programs) or '-'
 
 @admin.register(ApplicationStatus)
 class ApplicationStatusAdmin(admin.ModelAdmin):
     list_display = ['user', 'program', 'status', 'application_date', 'updated_at']
     list_filter = ['status', 'created_at', 'updated_at']
-    search_fields = ['user__username', 'program__name']
\ No newline at end of file
+    search_fields = ['user__username', 'program__name']
+
+@admin.register(StatisticsCounter)
+class StatisticsCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value']
+    search_fields = ['name']
+
+@admin.register(DailyCheckRollup)
+class DailyCheckRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'state', 'check_count']
+    list_filter = ['state']
+    date_hierarchy = 'day'
+
+@admin.register(ReevaluationJob)
+class ReevaluationJobAdmin(admin.ModelAdmin):
+    list_display = ['program', 'status', 'candidates', 'scanned', 'updated', 'gained', 'lost',
+                    'created_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['program__name']
+    readonly_fields = [field.name for field in ReevaluationJob._meta.fields]
\ No newline at end of file
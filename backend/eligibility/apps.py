@@ -2,4 +2,12 @@ from django.apps import AppConfig
 
 class EligibilityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'eligibility'
\ No newline at end of file
+    name = 'eligibility'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+        from .search import create_search_index
+
+        post_migrate.connect(create_search_index, sender=self)
\ No newline at end of file
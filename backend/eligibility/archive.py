@@ -0,0 +1,115 @@
+"""
+Retention for eligibility checks.
+
+Checks older than ``ELIGIBILITY_RETENTION_DAYS`` leave the hot
+``EligibilityCheck`` table: ``manage.py archive_checks`` copies them, oldest
+first and in bounded batches, to gzip-compressed NDJSON files (one per month
+of ``created_at``) and then deletes them in a short transaction per batch.
+The history endpoint and the admin changelist only look at checks inside
+the retention window, so they stay on the recent end of the
+``created_at`` index however far archival lags behind. The statistics
+keep counting archived checks (see rollups.py).
+
+Native PostgreSQL partitioning is not used: a partitioned table needs the
+partition key in every unique constraint, which ``uuid`` and the primary
+key referenced by the M2M through table would not allow.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import EligibilityCheck
+
+ARCHIVE_FIELDS = [
+    'id', 'uuid', 'user_id', 'age', 'annual_income', 'is_student', 'is_citizen',
+    'household_size', 'state', 'eligible_program_ids', 'total_potential_benefits', 'created_at',
+]
+
+
+def retention_cutoff(retention_days=None, now=None):
+    """Checks created before this moment are due for archival"""
+    if retention_days is None:
+        retention_days = settings.ELIGIBILITY_RETENTION_DAYS
+    return (now or timezone.now()) - timedelta(days=retention_days)
+
+
+def recent_checks(queryset=None):
+    """Restrict ``queryset`` (all checks by default) to the retention window"""
+    if queryset is None:
+        queryset = EligibilityCheck.objects.all()
+    return queryset.filter(created_at__gte=retention_cutoff())
+
+
+def archive_path(directory, created_at):
+    return os.path.join(directory, f'eligibility-checks-{created_at:%Y-%m}.ndjson.gz')
+
+
+def write_archive(directory, rows):
+    """Append ``rows`` to their monthly archive files and flush them to disk"""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(archive_path(directory, row['created_at']), []).append(row)
+    for path, month_rows in by_month.items():
+        # Each append is a separate gzip member; readers see one stream
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+                for row in month_rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder).encode() + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+    return list(by_month)
+
+
+def archive_batch(cutoff, directory, batch_size):
+    """Archive and delete up to ``batch_size`` of the oldest checks before ``cutoff``
+
+    Returns the number of checks moved. Rows are written to the archive
+    before they are deleted, so an interrupted run can leave a batch in
+    both places but never in neither; ``id`` and ``uuid`` identify repeats.
+    """
+    rows = list(
+        EligibilityCheck.objects.filter(created_at__lt=cutoff)
+        .order_by('created_at', 'id')
+        .values(*ARCHIVE_FIELDS)[:batch_size]
+    )
+    if not rows:
+        return 0
+    write_archive(directory, rows)
+
+    ids = [row['id'] for row in rows]
+    # The statistics keep counting archived checks; they are only recorded as archived
+    delta = rollups.RollupDelta()
+    for row in rows:
+        delta.add_check(EligibilityCheck(created_at=row['created_at'], state=row['state']),
+                        row['eligible_program_ids'])
+    with transaction.atomic():
+        EligibilityCheck.eligible_programs.through.objects.filter(eligibilitycheck_id__in=ids).delete()
+        # One plain DELETE for the batch: QuerySet.delete() would send the
+        # per-row pre_delete signal, which takes the checks out of the statistics
+        delete_checks(ids)
+        delta.apply(archived=True)
+    return len(rows)
+
+
+def delete_checks(ids):
+    """Delete the checks with these ids without collecting them or sending signals"""
+    connection = connections[router.db_for_write(EligibilityCheck)]
+    table = connection.ops.quote_name(EligibilityCheck._meta.db_table)
+    pk = connection.ops.quote_name(EligibilityCheck._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {pk} IN ({placeholders})', ids)
+
+
+def read_archive(path):
+    """Yield the checks stored in one archive file as dictionaries"""
+    with gzip.open(path, 'rt') as archive:
+        for line in archive:
+            yield json.loads(line)
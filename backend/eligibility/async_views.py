@@ -0,0 +1,129 @@
+"""
+Async versions of the catalog, check, history and statistics endpoints.
+
+They are routed in place of the views in ``views.py`` when
+``ELIGIBILITY_ASYNC_VIEWS`` is on, which is meant for deployments served
+by ``government_benefits.asgi``. Responses are the same as the DRF views'
+(JSON only); the request and response handling is shared with them.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from government_benefits.asyncapi import async_api_view, gather_queries
+from government_benefits.instrumentation import span
+from government_benefits.renderers import FastJSONRenderer
+from . import memo
+from .archive import recent_checks
+from .caching import cache_rendered, catalog_etag, etag_matches, not_modified, response_cache_key
+from .catalog import get_catalog_version
+from .models import EligibilityCheck, GovernmentProgram
+from .pagination import KeysetPagination
+from .serializers import EligibilityInputSerializer, GovernmentProgramReadSerializer
+from .views import (
+    build_check,
+    check_response,
+    history_program_ids,
+    history_response,
+    persist_check,
+    statistics_queries,
+    statistics_response,
+)
+
+
+async def _program_page(request):
+    """A page of active programs, rendered like PageNumberPagination renders it"""
+    paginator = PageNumberPagination()
+    page_size = paginator.get_page_size(request)
+    try:
+        number = int(request.query_params.get(paginator.page_query_param, 1))
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise NotFound(paginator.invalid_page_message)
+
+    queryset = GovernmentProgram.objects.filter(is_active=True).order_by('id')
+    offset = (number - 1) * page_size
+    # The count and the page are independent; run them at once
+    count, programs = await gather_queries(queryset.count, lambda: list(queryset[offset:offset + page_size]))
+    if offset and offset >= count:
+        raise NotFound(paginator.invalid_page_message)
+
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, paginator.page_query_param, number + 1) if offset + page_size < count else None
+    if number == 1:
+        previous_link = None
+    elif number == 2:
+        previous_link = remove_query_param(url, paginator.page_query_param)
+    else:
+        previous_link = replace_query_param(url, paginator.page_query_param, number - 1)
+    with span('serialize'):
+        results = GovernmentProgramReadSerializer(programs, many=True, context={'request': request}).data
+    return FastJSONRenderer().render({
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': results,
+    })
+
+
+@async_api_view(['GET'], [AllowAny])
+async def program_list(request):
+    """List all active government programs (shares ETags and cached pages with the sync view)"""
+    version = await sync_to_async(get_catalog_version)()
+    etag = catalog_etag(version, FastJSONRenderer.format)
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        return not_modified(etag)
+
+    key = response_cache_key(version, FastJSONRenderer.format, request)
+    cached = cache.get(key)
+    if cached is not None:
+        response = HttpResponse(cached[0], content_type=cached[1])
+    else:
+        response = HttpResponse(await _program_page(request), content_type=FastJSONRenderer.media_type)
+        cache_rendered(key, response.content, response['Content-Type'])
+
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@async_api_view(['POST'], [IsAuthenticated])
+async def check_eligibility(request):
+    """Check user eligibility for government programs"""
+    serializer = EligibilityInputSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    # The index may need rebuilding from the database
+    with span('rules'):
+        eligible_programs, total_benefits = await sync_to_async(memo.evaluate)(data)
+
+    eligibility_check = build_check(request.user, data, eligible_programs, total_benefits)
+    with span('persist'):
+        await sync_to_async(persist_check)(eligibility_check, eligible_programs)
+    return check_response(request, eligibility_check, eligible_programs)
+
+
+@async_api_view(['GET'], [IsAuthenticated])
+async def get_eligibility_history(request):
+    """Get user's eligibility check history, newest first, one page at a time"""
+    checks = recent_checks(EligibilityCheck.objects.filter(user=request.user))
+    paginator = KeysetPagination()
+    page = await sync_to_async(paginator.paginate_queryset)(checks, request)
+    programs = await GovernmentProgram.objects.ain_bulk(history_program_ids(page))
+    return history_response(request, paginator, page, programs)
+
+
+@async_api_view(['GET'], [AllowAny])
+async def get_program_statistics(request):
+    """Get statistics about programs and applications, running the rollup queries concurrently"""
+    return statistics_response(*await gather_queries(*statistics_queries(request)))
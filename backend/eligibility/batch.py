@@ -0,0 +1,139 @@
+"""
+Vectorized bulk screening.
+
+The compiled catalog is laid out as NumPy columns (one entry per active
+program) and a batch of profiles is evaluated as a profiles x programs
+boolean matrix. Profiles are processed in chunks so the matrix stays a
+few megabytes however large the batch is.
+"""
+import threading
+
+import numpy as np
+
+from .index import MAX_HOUSEHOLD_SIZE, from_cents, get_index, iter_bits, state_key, to_cents
+
+CHUNK_SIZE = 2048
+
+NO_MIN = np.iinfo(np.int64).min
+NO_MAX = np.iinfo(np.int64).max
+
+
+class CatalogMatrix:
+    """Column layout of an ``EligibilityIndex`` for vectorized screening.
+
+    States that partition the catalog or override income tables get a code
+    from ``state_codes``; every other state shares code 0. ``applicable``
+    is a states x programs mask and ``income_limit`` a states x household
+    sizes x programs table, so state and household size are gathers.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        programs = index.programs
+        count = len(programs)
+        self.program_ids = np.array(index.program_ids, dtype=np.int64)
+        self.benefit_cents = np.array(index.benefit_cents, dtype=np.int64)
+        self.min_age = np.array([p.min_age or NO_MIN for p in programs], dtype=np.int64)
+        self.max_age = np.array([p.max_age or NO_MAX for p in programs], dtype=np.int64)
+        self.requires_enrollment = np.array([p.requires_enrollment for p in programs], dtype=bool)
+        self.requires_citizenship = np.array([p.requires_citizenship for p in programs], dtype=bool)
+
+        keys = sorted((set(index.state_programs) | set(index.household_income)) - {''})
+        self.state_codes = {key: code for code, key in enumerate(keys, start=1)}
+        all_keys = [''] + keys
+
+        self.applicable = np.zeros((len(all_keys), count), dtype=bool)
+        for code, key in enumerate(all_keys):
+            mask = index.applicable(key)
+            for position in iter_bits(mask):
+                self.applicable[code, position] = True
+
+        flat = [to_cents(p.max_income) if p.max_income else NO_MAX for p in programs]
+        self.income_limit = np.empty((len(all_keys), MAX_HOUSEHOLD_SIZE + 1, count), dtype=np.int64)
+        self.income_limit[:] = np.array(flat, dtype=np.int64)
+        for position, by_state in index.income_tables.items():
+            for code, key in enumerate(all_keys):
+                limits = by_state.get(key, by_state[''])
+                # Falsy limits are no limit, as in ThresholdIndex
+                self.income_limit[code, :, position] = [limit or NO_MAX for limit in limits]
+
+    def state_code_array(self, states):
+        """Map state names to the codes used by ``applicable`` and ``income_limit``"""
+        codes = self.state_codes
+        return np.fromiter((codes.get(state_key(state), 0) for state in states), dtype=np.int64, count=len(states))
+
+    def matrix(self, age, income_cents, is_student, is_citizen, household_size, state_code):
+        """Return the profiles x programs eligibility matrix for one chunk"""
+        household_size = np.clip(household_size, 0, MAX_HOUSEHOLD_SIZE)
+        age = age[:, None]
+        eligible = self.applicable[state_code]
+        eligible &= age >= self.min_age
+        eligible &= age <= self.max_age
+        eligible &= income_cents[:, None] <= self.income_limit[state_code, household_size]
+        eligible &= is_student[:, None] | ~self.requires_enrollment
+        eligible &= is_citizen[:, None] | ~self.requires_citizenship
+        return eligible
+
+    def screen_arrays(self, age, income_cents, is_student, is_citizen, household_size, state_code,
+                      chunk_size=CHUNK_SIZE):
+        """Screen profile columns, yielding ``(program_ids, total_cents)`` per profile"""
+        for start in range(0, len(age), chunk_size):
+            stop = start + chunk_size
+            eligible = self.matrix(
+                age[start:stop], income_cents[start:stop],
+                is_student[start:stop], is_citizen[start:stop],
+                household_size[start:stop], state_code[start:stop],
+            )
+            totals = eligible @ self.benefit_cents
+            rows, columns = np.nonzero(eligible)
+            ids = self.program_ids[columns].tolist()
+            bounds = np.searchsorted(rows, np.arange(len(eligible) + 1)).tolist()
+            for row, total in enumerate(totals.tolist()):
+                yield ids[bounds[row]:bounds[row + 1]], total
+
+
+def profile_columns(profiles, matrix):
+    """Convert validated ``EligibilityInputSerializer`` data to NumPy columns"""
+    count = len(profiles)
+    age = np.fromiter((p['age'] for p in profiles), dtype=np.int64, count=count)
+    income = np.fromiter((to_cents(p['annual_income']) for p in profiles), dtype=np.int64, count=count)
+    is_student = np.fromiter((p['is_student'] for p in profiles), dtype=bool, count=count)
+    is_citizen = np.fromiter((p['is_citizen'] for p in profiles), dtype=bool, count=count)
+    household_size = np.fromiter((p['household_size'] for p in profiles), dtype=np.int64, count=count)
+    state_code = matrix.state_code_array([p['state'] for p in profiles])
+    return age, income, is_student, is_citizen, household_size, state_code
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_catalog_matrix():
+    """Return the column layout for the current eligibility index"""
+    global _matrix
+
+    index = get_index()
+    matrix = _matrix
+    if matrix is None or matrix.index is not index:
+        with _matrix_lock:
+            matrix = _matrix
+            if matrix is None or matrix.index is not index:
+                matrix = CatalogMatrix(index)
+                _matrix = matrix
+    return matrix
+
+
+def screen_profiles(profiles, chunk_size=CHUNK_SIZE):
+    """Screen a list of validated profiles against the active catalog.
+
+    Returns one ``{'eligible_program_ids', 'total_potential_benefits'}``
+    dict per profile, in input order.
+    """
+    matrix = get_catalog_matrix()
+    return [
+        {
+            'eligible_program_ids': ids,
+            'total_potential_benefits': from_cents(total),
+        }
+        for ids, total in matrix.screen_arrays(*profile_columns(profiles, matrix), chunk_size=chunk_size)
+    ]
@@ -0,0 +1,87 @@
+"""
+Versioned response caching for catalog endpoints.
+
+Responses that depend only on the program catalog carry the catalog
+version stamp as their ETag. A matching ``If-None-Match`` is answered
+with 304 from the cached stamp alone, and rendered response bytes are
+cached per version, renderer, origin and query string (the pagination
+links in them are absolute URLs). A catalog edit bumps the version,
+which retires every cached entry and ETag at once.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+
+from government_benefits.routers import reading_replica
+
+from .catalog import get_catalog_version
+
+RESPONSE_KEY_PREFIX = 'eligibility:catalog_response'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates
+
+
+def catalog_etag(version, media_format):
+    return f'"{version}-{media_format}"'
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def response_cache_key(version, media_format, request):
+    # The body's next/previous links are built from the scheme and host
+    origin = f'{request.scheme}://{request.get_host()}'
+    query = request.META.get('QUERY_STRING', '')
+    digest = hashlib.sha1(f'{media_format} {origin}?{query}'.encode()).hexdigest()
+    return f'{RESPONSE_KEY_PREFIX}:{version}:{digest}'
+
+
+def cache_rendered(key, content, content_type):
+    ttl = getattr(settings, 'ELIGIBILITY_CATALOG_CACHE_TTL', 3600)
+    if reading_replica():
+        # The version stamp comes from the primary; a lagging replica may not
+        # have caught up with it yet
+        ttl = min(ttl, settings.DATABASE_REPLICA_STICKY_SECONDS)
+    cache.set(key, (content, content_type), ttl)
+
+
+class CatalogCacheMixin:
+    """Conditional GET and rendered-response caching for catalog views"""
+
+    def get(self, request, *args, **kwargs):
+        version = get_catalog_version()
+        media_format = request.accepted_renderer.format
+        etag = catalog_etag(version, media_format)
+
+        if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+            return not_modified(etag)
+
+        key = response_cache_key(version, media_format, request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == 200:
+                response.add_post_render_callback(
+                    lambda rendered: cache_rendered(key, rendered.content, rendered['Content-Type'])
+                )
+
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -0,0 +1,46 @@
+"""
+Catalog version stamp shared by every worker.
+
+The stamp is derived from the newest ``updated_at`` in the program catalog
+plus the number of programs, and is kept in Django's cache so that a bump
+in one worker becomes visible to the others. Entries expire after
+``ELIGIBILITY_CATALOG_VERSION_TTL`` seconds, which bounds staleness even
+with a process-local cache backend.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, Max
+
+CATALOG_VERSION_KEY = 'eligibility:catalog_version'
+
+
+def _version_ttl():
+    return getattr(settings, 'ELIGIBILITY_CATALOG_VERSION_TTL', 60)
+
+
+def compute_catalog_version():
+    """Compute the catalog version stamp from the database"""
+    from .models import GovernmentProgram
+
+    # Always from the primary: a lagging replica would publish an old stamp
+    stats = GovernmentProgram.objects.using(DEFAULT_DB_ALIAS).aggregate(latest=Max('updated_at'), total=Count('id'))
+    latest = stats['latest']
+    stamp = int(latest.timestamp() * 1000000) if latest else 0
+    return f"{stamp}-{stats['total']}"
+
+
+def get_catalog_version():
+    """Return the current catalog version stamp"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = compute_catalog_version()
+        cache.set(CATALOG_VERSION_KEY, version, _version_ttl())
+    return version
+
+
+def bump_catalog_version():
+    """Recompute and publish the catalog version after a catalog edit"""
+    version = compute_catalog_version()
+    cache.set(CATALOG_VERSION_KEY, version, _version_ttl())
+    return version
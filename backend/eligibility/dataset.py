@@ -0,0 +1,321 @@
+"""
+Deterministic synthetic data for performance testing.
+
+``manage.py generate_dataset`` writes a program catalog and then users in
+fixed-size blocks, each user with eligibility checks (screened against the
+catalog with ``CatalogMatrix``, so the stored program sets are real) and
+application statuses. Block ``n`` draws from its own ``random.Random``
+seeded with the dataset seed and ``n``, so the same options always produce
+the same rows, whichever worker process writes which block.
+
+Rows are inserted with ``bulk_create`` or, on PostgreSQL, ``COPY``. Blocks
+only return their ``RollupDelta``; the caller applies the merged deltas
+once, so parallel workers never contend for the rollup rows.
+"""
+import io
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+
+from users.models import User
+
+from . import rollups
+from .batch import get_catalog_matrix, profile_columns
+from .index import MAX_HOUSEHOLD_SIZE, from_cents
+from .models import ApplicationStatus, EligibilityCheck, GovernmentProgram, ProgramIncomeLimit, ProgramRollup
+
+US_STATES = [
+    'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado', 'Connecticut', 'Delaware',
+    'District of Columbia', 'Florida', 'Georgia', 'Hawaii', 'Idaho', 'Illinois', 'Indiana', 'Iowa',
+    'Kansas', 'Kentucky', 'Louisiana', 'Maine', 'Maryland', 'Massachusetts', 'Michigan', 'Minnesota',
+    'Mississippi', 'Missouri', 'Montana', 'Nebraska', 'Nevada', 'New Hampshire', 'New Jersey',
+    'New Mexico', 'New York', 'North Carolina', 'North Dakota', 'Ohio', 'Oklahoma', 'Oregon',
+    'Pennsylvania', 'Rhode Island', 'South Carolina', 'South Dakota', 'Tennessee', 'Texas', 'Utah',
+    'Vermont', 'Virginia', 'Washington', 'West Virginia', 'Wisconsin', 'Wyoming',
+]
+# Rough population shares, so a few states dominate as they do in practice
+STATE_WEIGHTS = {'California': 12, 'Texas': 9, 'Florida': 7, 'New York': 6, 'Pennsylvania': 4, 'Illinois': 4}
+
+FIRST_NAMES = ['Alex', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn', 'Drew']
+LAST_NAMES = ['Smith', 'Garcia', 'Nguyen', 'Johnson', 'Brown', 'Lee', 'Patel', 'Kim', 'Lopez', 'Davis']
+
+# Federal poverty guideline for one person plus each additional member
+POVERTY_BASE = 15060
+POVERTY_PER_MEMBER = 5380
+
+STATUS_WEIGHTS = {
+    'not_started': 20,
+    'in_progress': 30,
+    'submitted': 20,
+    'approved': 15,
+    'denied': 10,
+    'pending_documents': 5,
+}
+
+
+@dataclass(frozen=True)
+class DatasetConfig:
+    """Everything a block needs; sent to worker processes"""
+    seed: int
+    prefix: str
+    users: int
+    block_size: int
+    checks_per_user: float
+    applications_per_user: float
+    start: datetime
+    end: datetime
+    password: str
+    batch_size: int
+    program_links: bool
+    use_copy: bool
+
+    @property
+    def blocks(self):
+        return -(-self.users // self.block_size)
+
+
+def _draw_count(rng, mean, cap):
+    """A skewed count averaging about ``mean``: most users do little, a few a lot"""
+    if mean <= 0:
+        return 0
+    return min(int(rng.expovariate(1 / mean) + 0.5), cap)
+
+
+def _moment(rng, start, end):
+    return start + timedelta(seconds=rng.random() * (end - start).total_seconds())
+
+
+def _state(rng):
+    return rng.choices(US_STATES, weights=[STATE_WEIGHTS.get(state, 1) for state in US_STATES])[0]
+
+
+def make_programs(count, seed, prefix):
+    """Unsaved programs with varied criteria, and their household income tables"""
+    rng = random.Random(f'{seed}:programs')
+    types = GovernmentProgram.PROGRAM_TYPES
+    programs = []
+    income_tables = []
+    for i in range(count):
+        program_type, label = types[i % len(types)]
+        if rng.random() < 0.6:
+            states = ''
+        else:
+            states = ','.join(sorted(rng.sample(US_STATES, rng.choice([1, 1, 2, 3, 5]))))
+        program = GovernmentProgram(
+            name=f'{prefix} {label} program {i + 1}',
+            program_type=program_type,
+            description=f'Synthetic {label.lower()} program generated with seed {seed}.',
+            max_benefit_amount=rng.choice([None, Decimal(rng.randrange(100, 20000, 50))]),
+            application_url=f'https://benefits.example.com/{prefix}/{i + 1}',
+            min_age=rng.choice([None, None, 16, 18, 21, 55, 62]),
+            max_age=rng.choice([None, None, None, 24, 26, 64]),
+            max_income=rng.choice([None, Decimal(rng.randrange(15000, 120000, 500))]),
+            requires_enrollment=program_type == 'education' and rng.random() < 0.7,
+            requires_citizenship=rng.random() < 0.8,
+            states=states,
+            is_active=rng.random() < 0.95,
+        )
+        programs.append(program)
+        if program_type in ('food', 'healthcare', 'housing') and rng.random() < 0.3:
+            income_tables.append((program, rng.choice([130, 138, 185, 200])))
+    return programs, income_tables
+
+
+def create_programs(count, seed, prefix, batch_size):
+    """Insert the synthetic catalog; returns ``(programs, income limits)`` written"""
+    programs, income_tables = make_programs(count, seed, prefix)
+    with transaction.atomic():
+        GovernmentProgram.objects.bulk_create(programs, batch_size=batch_size)
+        limits = ProgramIncomeLimit.objects.bulk_create([
+            ProgramIncomeLimit(
+                program=program,
+                household_size=size,
+                max_income=(Decimal(POVERTY_BASE + POVERTY_PER_MEMBER * (size - 1)) * percent / 100)
+                .quantize(Decimal('1')),
+            )
+            for program, percent in income_tables
+            for size in range(1, MAX_HOUSEHOLD_SIZE + 1)
+        ], batch_size=batch_size)
+        # As reconcile() leaves it: a rollup row per program
+        ProgramRollup.objects.bulk_create([ProgramRollup(program=program) for program in programs],
+                                          batch_size=batch_size)
+    return len(programs), len(limits)
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    # psycopg2 wraps binary values for the cursor; COPY wants bytea hex
+    value = getattr(value, 'adapted', value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = '\\x' + bytes(value).hex()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(model, objs):
+    """Insert ``objs`` with PostgreSQL ``COPY``; their auto primary keys are not set"""
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, models.AutoField)]
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write('\t'.join(
+            _copy_value(field.get_db_prep_save(getattr(obj, field.attname), connection)) for field in fields
+        ))
+        buffer.write('\n')
+    buffer.seek(0)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN', buffer)
+
+
+def _write(model, objs, config, key=None):
+    """Insert ``objs``; with ``key``, set their primary keys (re-read by that unique field after COPY)"""
+    if not config.use_copy:
+        model.objects.bulk_create(objs, batch_size=config.batch_size)
+        return
+    copy_rows(model, objs)
+    if key is not None:
+        pks = {}
+        for start in range(0, len(objs), config.batch_size):
+            values = [getattr(obj, key) for obj in objs[start:start + config.batch_size]]
+            pks.update(model.objects.filter(**{f'{key}__in': values}).values_list(key, 'pk'))
+        for obj in objs:
+            obj.pk = pks[getattr(obj, key)]
+
+
+# bulk_create would overwrite these with the current time
+GENERATED_TIMESTAMPS = [
+    (User, 'created_at'), (User, 'updated_at'),
+    (ApplicationStatus, 'created_at'), (ApplicationStatus, 'updated_at'),
+]
+
+
+@contextmanager
+def explicit_timestamps():
+    """Let inserts keep the generated ``created_at``/``updated_at`` values"""
+    fields = [model._meta.get_field(name) for model, name in GENERATED_TIMESTAMPS]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _profile(rng, user_state):
+    age = rng.randint(16, 90)
+    return {
+        'age': age,
+        'annual_income': min(Decimal(int(rng.lognormvariate(10.4, 0.9) * 100)) / 100, Decimal('9999999.99')),
+        'is_student': rng.random() < (0.6 if age < 26 else 0.05),
+        'is_citizen': rng.random() < 0.92,
+        'household_size': min(1 + int(rng.expovariate(0.6)), 8),
+        # People mostly check where they live
+        'state': user_state if rng.random() < 0.9 else _state(rng),
+    }
+
+
+def generate_block(block, config, matrix):
+    """Build the unsaved users, checks and applications of one block"""
+    rng = random.Random(f'{config.seed}:users:{block}')
+    first = block * config.block_size
+    users, checks, profiles, owners, applications = [], [], [], [], []
+    for number in range(first, min(first + config.block_size, config.users)):
+        joined = _moment(rng, config.start, config.end)
+        user = User(
+            username=f'{config.prefix}-{number:08d}',
+            email=f'{config.prefix}-{number:08d}@example.com',
+            password=config.password,
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            state=_state(rng),
+            date_joined=joined,
+            created_at=joined,
+            updated_at=joined,
+        )
+        users.append(user)
+        for _ in range(_draw_count(rng, config.checks_per_user, 50)):
+            profiles.append(_profile(rng, user.state))
+            owners.append((user, _moment(rng, joined, config.end)))
+
+    # Screen the whole block at once; the stored program sets are real results
+    eligible_by_user = {}
+    screened = matrix.screen_arrays(*profile_columns(profiles, matrix))
+    for profile, (user, created_at), (program_ids, total_cents) in zip(profiles, owners, screened):
+        checks.append(EligibilityCheck(
+            user=user,
+            eligible_program_ids=program_ids,
+            total_potential_benefits=from_cents(total_cents),
+            created_at=created_at,
+            **profile,
+        ))
+        eligible_by_user.setdefault(user.username, set()).update(program_ids)
+
+    all_program_ids = matrix.program_ids.tolist()
+    statuses = list(STATUS_WEIGHTS)
+    for user in users:
+        count = _draw_count(rng, config.applications_per_user, len(all_program_ids))
+        if not count:
+            continue
+        # Applicants mostly apply to programs they were found eligible for
+        candidates = sorted(eligible_by_user.get(user.username, ()))
+        if len(candidates) < count:
+            candidates = all_program_ids
+        for program_id in rng.sample(candidates, count):
+            status = rng.choices(statuses, weights=list(STATUS_WEIGHTS.values()))[0]
+            created_at = _moment(rng, user.created_at, config.end)
+            applications.append(ApplicationStatus(
+                user=user,
+                program_id=program_id,
+                status=status,
+                application_date=created_at if status != 'not_started' else None,
+                created_at=created_at,
+                updated_at=_moment(rng, created_at, config.end),
+            ))
+    return users, checks, applications
+
+
+def write_block(block, config):
+    """Generate and insert one block; returns ``(block, rows per table, RollupDelta, seconds)``"""
+    started = time.perf_counter()
+    users, checks, applications = generate_block(block, config, get_catalog_matrix())
+    Through = EligibilityCheck.eligible_programs.through
+    links = 0
+    with explicit_timestamps(), transaction.atomic():
+        _write(User, users, config, key='username')
+        for check in checks:
+            check.user_id = check.user.pk
+        _write(EligibilityCheck, checks, config, key='uuid' if config.program_links else None)
+        if config.program_links:
+            through_rows = [
+                Through(eligibilitycheck_id=check.pk, governmentprogram_id=program_id)
+                for check in checks
+                for program_id in check.eligible_program_ids
+            ]
+            _write(Through, through_rows, config)
+            links = len(through_rows)
+        for application in applications:
+            application.user_id = application.user.pk
+        _write(ApplicationStatus, applications, config)
+
+    delta = rollups.RollupDelta()
+    for check in checks:
+        delta.add_check(check, check.eligible_program_ids)
+    delta.counters[rollups.TOTAL_APPLICATIONS] += len(applications)
+    rows = {
+        'users': len(users),
+        'checks': len(checks),
+        'program_links': links,
+        'applications': len(applications),
+    }
+    return block, rows, delta, time.perf_counter() - started
+
+
+def write_block_in_worker(args):
+    return write_block(*args)
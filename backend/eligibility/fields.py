@@ -0,0 +1,67 @@
+from django.db import models
+
+
+def encode_ids(ids):
+    """Pack a set of positive integers as delta-encoded varints, ascending"""
+    packed = bytearray()
+    previous = 0
+    for value in sorted(set(ids)):
+        delta = value - previous
+        previous = value
+        while delta >= 0x80:
+            packed.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        packed.append(delta)
+    return bytes(packed)
+
+
+def decode_ids(packed):
+    """Unpack ``encode_ids`` output into a sorted list of integers"""
+    ids = []
+    value = shift = delta = 0
+    for byte in packed:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        value += delta
+        ids.append(value)
+        delta = shift = 0
+    return ids
+
+
+class ProgramIdSetField(models.BinaryField):
+    """Sorted set of program IDs stored in one compact binary column.
+
+    In Python the value is a sorted list of ints. Stored as delta-encoded
+    varints, a typical set of program IDs takes one or two bytes per ID,
+    against one through-table row per ID for a ManyToManyField.
+    """
+    description = 'Sorted set of program IDs'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', list)
+        kwargs.setdefault('blank', True)
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decode_ids(bytes(value))
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decode_ids(bytes(value))
+        if isinstance(value, str):
+            return sorted({int(part) for part in value.split(',') if part.strip()})
+        return sorted(set(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is not None and not isinstance(value, (bytes, bytearray, memoryview)):
+            value = encode_ids(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        return ','.join(str(program_id) for program_id in self.value_from_object(obj) or [])
@@ -0,0 +1,357 @@
+"""
+Compiled, process-local eligibility index.
+
+Active programs are compiled once into sorted threshold arrays for the age
+and income limits and integer bitsets for the enrollment and citizenship
+flags. A check is then a handful of binary searches and bitwise ANDs, with
+no catalog query. Money is handled in integer cents.
+
+Programs limited to some states are partitioned into one bitset per state.
+Programs with ``ProgramIncomeLimit`` tables get one threshold array per
+household size (and per state that overrides the national table), built
+at load time, so household size and state cost a list lookup per check.
+
+The index is rebuilt when the catalog version stamp changes (see
+``catalog.py``). Saves and deletes in this process drop the index at once;
+other workers notice within ``ELIGIBILITY_INDEX_CHECK_INTERVAL`` seconds
+plus the version stamp TTL.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .catalog import get_catalog_version
+
+CENT = Decimal('0.01')
+
+# Mirrors the bounds of EligibilityInputSerializer.household_size
+MAX_HOUSEHOLD_SIZE = 20
+
+
+def to_cents(amount):
+    """Convert a money amount to integer cents"""
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+def from_cents(cents):
+    """Convert integer cents back to a two-place Decimal"""
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+def state_key(state):
+    """Normalise a state name for lookups"""
+    return (state or '').strip().upper()
+
+
+def parse_states(states):
+    """Split a program's comma-separated ``states`` into lookup keys"""
+    return {state_key(state) for state in (states or '').split(',') if state.strip()}
+
+
+# Set bit positions of every byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def iter_bits(mask):
+    """Yield the positions of the set bits in ``mask``, lowest first.
+
+    Walks the mask a byte at a time, so the cost is linear in the catalog
+    size even when most programs match (clearing bits one by one copies the
+    whole integer per bit, which is quadratic for dense masks).
+    """
+    packed = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for offset, byte in enumerate(packed):
+        if byte:
+            base = offset * 8
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+
+class ThresholdIndex:
+    """Sorted thresholds for one criterion with cumulative program bitsets.
+
+    ``lower=True`` means a value passes when it is at least the threshold
+    (minimum age); otherwise it passes when it is at most the threshold
+    (maximum age, maximum income). Programs without a limit (None or 0, as
+    check_eligibility always read them) always pass.
+    """
+
+    def __init__(self, limits, lower):
+        self.lower = lower
+        self.unlimited = 0
+        constrained = []
+        for position, limit in enumerate(limits):
+            if limit:
+                constrained.append((limit, position))
+            else:
+                self.unlimited |= 1 << position
+        constrained.sort()
+        self.thresholds = [limit for limit, _ in constrained]
+
+        # masks[k] holds the programs a value passes when k thresholds lie
+        # on the failing side of it.
+        # Where each threshold starts to fail (``lower``) or pass, in value
+        # order: ``masks[bisect_right(starts, value)]`` for either kind
+        self.starts = self.thresholds if lower else [limit + 1 for limit in self.thresholds]
+
+        count = len(constrained)
+        self.masks = [0] * (count + 1)
+        if lower:
+            for k, (_, position) in enumerate(constrained, start=1):
+                self.masks[k] = self.masks[k - 1] | (1 << position)
+        else:
+            for k in range(count - 1, -1, -1):
+                self.masks[k] = self.masks[k + 1] | (1 << constrained[k][1])
+
+    def match(self, value):
+        """Return the bitset of programs whose limit ``value`` satisfies"""
+        if self.lower:
+            return self.unlimited | self.masks[bisect_right(self.thresholds, value)]
+        return self.unlimited | self.masks[bisect_left(self.thresholds, value)]
+
+
+def _dense_limits(rows, fallback):
+    """Expand ``{household_size: cents}`` to a list indexed by household size.
+
+    Sizes above the largest listed one reuse the nearest listed size below
+    them; sizes below every listed one use ``fallback[size]``.
+    """
+    limits = list(fallback)
+    current = None
+    for size in range(MAX_HOUSEHOLD_SIZE + 1):
+        if size in rows:
+            current = rows[size]
+        if current is not None:
+            limits[size] = current
+    return limits
+
+
+class EligibilityIndex:
+    """Compiled eligibility rules for a snapshot of the active catalog"""
+
+    def __init__(self, programs, version=None, income_limits=()):
+        self.version = version
+        self.programs = list(programs)
+        self.program_ids = [program.id for program in self.programs]
+        self.programs_by_id = dict(zip(self.program_ids, self.programs))
+        self.benefit_cents = [
+            to_cents(program.max_benefit_amount) if program.max_benefit_amount else 0
+            for program in self.programs
+        ]
+        self.all_programs = (1 << len(self.programs)) - 1
+
+        self.min_age = ThresholdIndex([p.min_age for p in self.programs], lower=True)
+        self.max_age = ThresholdIndex([p.max_age for p in self.programs], lower=False)
+
+        self.requires_enrollment = 0
+        self.requires_citizenship = 0
+        self.nationwide = 0
+        self.state_programs = {}
+        for position, program in enumerate(self.programs):
+            bit = 1 << position
+            if program.requires_enrollment:
+                self.requires_enrollment |= bit
+            if program.requires_citizenship:
+                self.requires_citizenship |= bit
+            states = parse_states(program.states)
+            if not states:
+                self.nationwide |= bit
+            for key in states:
+                self.state_programs[key] = self.state_programs.get(key, 0) | bit
+
+        self._compile_income_limits(income_limits)
+        self.checked_at = time.monotonic()
+
+    def _compile_income_limits(self, income_limits):
+        flat_limits = [to_cents(p.max_income) if p.max_income else None for p in self.programs]
+
+        # {position: {state key: {household size: cents}}}, '' = national
+        tables = {}
+        positions = {program_id: position for position, program_id in enumerate(self.program_ids)}
+        for limit in income_limits:
+            position = positions.get(limit.program_id)
+            if position is not None:
+                rows = tables.setdefault(position, {}).setdefault(state_key(limit.state), {})
+                rows[limit.household_size] = to_cents(limit.max_income)
+
+        # {position: {state key: [cents or None per household size]}}
+        self.income_tables = {}
+        for position, by_state in tables.items():
+            national = _dense_limits(by_state.get('', {}), [flat_limits[position]] * (MAX_HOUSEHOLD_SIZE + 1))
+            self.income_tables[position] = {
+                key: national if key == '' else _dense_limits(rows, national)
+                for key, rows in by_state.items()
+            }
+            self.income_tables[position][''] = national
+
+        # Programs with tables are unlimited in the flat index and the only
+        # limited ones in the per-household indexes, so the two are ANDed.
+        self.max_income = ThresholdIndex(
+            [None if position in self.income_tables else limit for position, limit in enumerate(flat_limits)],
+            lower=False,
+        )
+        self.household_income = {}
+        if not self.income_tables:
+            return
+        override_states = {key for by_state in self.income_tables.values() for key in by_state}
+        for key in override_states:
+            self.household_income[key] = [
+                ThresholdIndex(self._household_limits(key, size), lower=False)
+                for size in range(MAX_HOUSEHOLD_SIZE + 1)
+            ]
+
+    def _household_limits(self, key, size):
+        limits = [None] * len(self.programs)
+        for position, by_state in self.income_tables.items():
+            limits[position] = by_state.get(key, by_state[''])[size]
+        return limits
+
+    def income_limit_cents(self, position, household_size, state):
+        """Return a program's income limit in cents for a household, or None"""
+        by_state = self.income_tables.get(position)
+        if by_state is None:
+            program = self.programs[position]
+            return to_cents(program.max_income) if program.max_income else None
+        size = min(max(household_size, 0), MAX_HOUSEHOLD_SIZE)
+        return by_state.get(state_key(state), by_state[''])[size] or None
+
+    @classmethod
+    def build(cls):
+        """Compile the index from the active programs in the database"""
+        from .models import GovernmentProgram, ProgramIncomeLimit
+
+        version = get_catalog_version()
+        # From the primary, like the version stamp it is labelled with
+        programs = GovernmentProgram.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True).order_by('id')
+        income_limits = ProgramIncomeLimit.objects.using(DEFAULT_DB_ALIAS).filter(program__is_active=True)
+        return cls(programs, version=version, income_limits=income_limits)
+
+    def applicable(self, state):
+        """Return the bitset of programs offered in ``state``"""
+        return self.nationwide | self.state_programs.get(state_key(state), 0)
+
+    def income_indexes(self, household_size, state):
+        """The threshold indexes an income is matched against for a household"""
+        if not self.household_income:
+            return [self.max_income]
+        by_size = self.household_income.get(state_key(state)) or self.household_income['']
+        return [self.max_income, by_size[min(max(household_size, 0), MAX_HOUSEHOLD_SIZE)]]
+
+    def flag_mask(self, is_student, is_citizen, state):
+        """Programs offered in ``state`` whose enrollment and citizenship rules pass"""
+        mask = self.applicable(state)
+        if not is_student:
+            mask &= ~self.requires_enrollment
+        if not is_citizen:
+            mask &= ~self.requires_citizenship
+        return mask
+
+    def match(self, age, income_cents, is_student, is_citizen, household_size, state):
+        """Return the bitset of programs the applicant is eligible for"""
+        mask = self.flag_mask(is_student, is_citizen, state)
+        mask &= self.min_age.match(age)
+        mask &= self.max_age.match(age)
+        for index in self.income_indexes(household_size, state):
+            mask &= index.match(income_cents)
+        return mask
+
+    def sweep(self, base, indexes, low, high=None):
+        """Split ``[low, high]`` where the eligible set changes along one criterion.
+
+        ``base`` is the bitset allowed by every other criterion and
+        ``indexes`` the threshold indexes of this one. Returns
+        ``(start, end, mask)`` for each maximal interval with a constant
+        eligible set (``end`` is None when unbounded), in one merged pass
+        over the presorted ``starts`` from a binary search to ``low``.
+        """
+        positions = [bisect_right(index.starts, low) for index in indexes]
+
+        def mask_at():
+            mask = base
+            for index, position in zip(indexes, positions):
+                mask &= index.unlimited | index.masks[position]
+            return mask
+
+        intervals = []
+        start, current = low, mask_at()
+        previous = low
+        pending = heapq.merge(*(index.starts[position:] for index, position in zip(indexes, positions)))
+        for value in pending:
+            if high is not None and value > high:
+                break
+            if value == previous:
+                continue
+            previous = value
+            for i, index in enumerate(indexes):
+                while positions[i] < len(index.starts) and index.starts[positions[i]] <= value:
+                    positions[i] += 1
+            mask = mask_at()
+            if mask != current:
+                intervals.append((start, value - 1, current))
+                start, current = value, mask
+        intervals.append((start, high, current))
+        return intervals
+
+    def total_cents(self, mask):
+        """Sum the maximum benefit of every program in ``mask``"""
+        benefit_cents = self.benefit_cents
+        return sum(benefit_cents[position] for position in iter_bits(mask))
+
+    def evaluate(self, data):
+        """Evaluate validated ``EligibilityInputSerializer`` data.
+
+        Returns the eligible programs and their total potential benefits.
+        """
+        mask = self.match(
+            data['age'],
+            to_cents(data['annual_income']),
+            data['is_student'],
+            data['is_citizen'],
+            data['household_size'],
+            data['state'],
+        )
+        positions = list(iter_bits(mask))
+        benefit_cents = self.benefit_cents
+        programs = [self.programs[position] for position in positions]
+        return programs, from_cents(sum(benefit_cents[position] for position in positions))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _check_interval():
+    return getattr(settings, 'ELIGIBILITY_INDEX_CHECK_INTERVAL', 5)
+
+
+def get_index():
+    """Return the current index, rebuilding it if the catalog has changed"""
+    global _index
+
+    index = _index
+    now = time.monotonic()
+    if index is not None and now - index.checked_at < _check_interval():
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is not None and time.monotonic() - index.checked_at < _check_interval():
+            return index
+        if index is None or index.version != get_catalog_version():
+            index = EligibilityIndex.build()
+            _index = index
+        else:
+            index.checked_at = time.monotonic()
+        return index
+
+
+def invalidate_index():
+    """Drop this process's index so the next check rebuilds it"""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,55 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from eligibility.archive import archive_batch, retention_cutoff
+from eligibility.models import EligibilityCheck
+
+
+class Command(BaseCommand):
+    help = ('Move eligibility checks older than the retention window to compressed monthly '
+            'archive files, oldest first, in short batches')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Keep this many days of checks (default: ELIGIBILITY_RETENTION_DAYS)')
+        parser.add_argument('--archive-dir', default=None,
+                            help='Directory for the archive files (default: ELIGIBILITY_ARCHIVE_DIR)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Checks archived and deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches, to spread the load')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many checks are due')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['retention_days'])
+        directory = options['archive_dir'] or settings.ELIGIBILITY_ARCHIVE_DIR
+
+        if options['dry_run']:
+            due = EligibilityCheck.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f'{due} checks created before {cutoff:%Y-%m-%d %H:%M} are due for archival')
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        archived = batches = 0
+        started = time.perf_counter()
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved = archive_batch(cutoff, directory, options['batch_size'])
+            if not moved:
+                break
+            archived += moved
+            batches += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  batch {batches}: {archived} archived ({archived / elapsed:,.0f} checks/s)')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} checks created before {cutoff:%Y-%m-%d %H:%M} to {directory} '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
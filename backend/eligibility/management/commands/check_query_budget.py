@@ -0,0 +1,258 @@
+import re
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from eligibility import rollups, urls as eligibility_urls
+from eligibility.catalog import bump_catalog_version
+from eligibility.index import invalidate_index
+from eligibility.memo import get_memo
+from eligibility.models import ApplicationStatus, EligibilityCheck, GovernmentProgram
+from users import urls as user_urls
+from users.authentication import get_principal_cache, issue_pair, read_token, resolve_user
+from users.models import User, UserDocument
+
+PASSWORD = 'budget-password'
+
+# Most queries each route may issue, whatever the size of the data. A route
+# that scales with the data (an N+1) exceeds its budget at the larger sizes.
+QUERY_BUDGETS = {
+    'programs': 2,
+    'program_search': 4,
+    'check_eligibility': 6,
+    'check_eligibility_batch': 0,
+    'what_if': 0,
+    'simulate_policy': 3,
+    'eligibility_check_detail': 2,
+    'eligibility_history': 2,
+    'applications': 3,
+    'application_detail': 3,
+    'statistics': 4,
+    'memo_statistics': 0,
+    'register': 3,
+    'login': 5,
+    'logout': 1,
+    'token': 2,
+    'token_refresh': 4,
+    'token_revoke': 3,
+    'profile': 0,
+    'update_profile': 2,
+    'user_documents': 2,
+    'document_income': 1,
+}
+
+# Tables that grow with usage; a full scan of one of them is a regression
+LARGE_TABLES = [
+    EligibilityCheck._meta.db_table,
+    EligibilityCheck.eligible_programs.through._meta.db_table,
+    ApplicationStatus._meta.db_table,
+    User._meta.db_table,
+    UserDocument._meta.db_table,
+]
+
+# Routes that read a large table in full by design, in bounded chunks
+FULL_SCAN_ROUTES = {'simulate_policy'}
+
+
+def route_requests(user, check, application, program_id):
+    """(route name, method, path, payload, authenticate as) for every case to measure.
+
+    Requests authenticated with a token string send it as a bearer token;
+    the worker's principal cache is warm, as it is for a busy API client.
+    """
+    profile = {'age': 20, 'annual_income': '15000.00', 'is_student': True,
+               'is_citizen': True, 'household_size': 3, 'state': 'CA'}
+    admin = User(is_staff=True, is_superuser=True, username='budget-admin')
+    tokens = issue_pair(user)
+    get_principal_cache().clear()
+    resolve_user(read_token(tokens['access'], 'access'))
+    return [
+        ('programs', 'get', reverse('programs'), None, None),
+        ('program_search', 'get', reverse('program_search') + '?q=budget+program&program_type=education,food'
+         '&age_range=18-24&requires_citizenship=true', None, None),
+        ('program_search', 'get', reverse('program_search') + '?benefit_range=1000-5000&page=2&page_size=2',
+         None, None),
+        ('check_eligibility', 'post', reverse('check_eligibility'), profile, user),
+        ('check_eligibility', 'post', reverse('check_eligibility'), profile, tokens['access']),
+        ('check_eligibility_batch', 'post', reverse('check_eligibility_batch'),
+         {'profiles': [dict(profile, age=age) for age in range(18, 68)]}, user),
+        ('what_if', 'post', reverse('what_if'), dict(profile, household_size=2), user),
+        ('simulate_policy', 'post', reverse('simulate_policy'),
+         {'changes': [{'program_id': program_id, 'max_income': '30000.00', 'min_age': 21}]}, admin),
+        ('eligibility_check_detail', 'get',
+         reverse('eligibility_check_detail', args=[check.uuid]), None, user),
+        ('eligibility_history', 'get', reverse('eligibility_history'), None, user),
+        ('eligibility_history', 'get', reverse('eligibility_history') + '?compact=true', None, user),
+        ('eligibility_history', 'get', reverse('eligibility_history'), None, tokens['access']),
+        ('applications', 'get', reverse('applications'), None, user),
+        ('applications', 'post', reverse('applications'),
+         {'program_id': program_id, 'status': 'submitted'}, user),
+        ('application_detail', 'get', reverse('application_detail', args=[application.pk]), None, user),
+        ('application_detail', 'patch', reverse('application_detail', args=[application.pk]),
+         {'notes': 'Budget check'}, user),
+        ('application_detail', 'delete', reverse('application_detail', args=[application.pk]), None, user),
+        ('statistics', 'get', reverse('statistics'), None, None),
+        ('memo_statistics', 'get', reverse('memo_statistics'), None, admin),
+        ('register', 'post', reverse('register'),
+         {'username': 'budget-new', 'email': 'new@example.com', 'password': PASSWORD,
+          'password_confirm': PASSWORD}, None),
+        ('login', 'post', reverse('login'), {'username': user.username, 'password': PASSWORD}, None),
+        ('logout', 'post', reverse('logout'), None, user),
+        ('token', 'post', reverse('token'), {'username': user.username, 'password': PASSWORD}, None),
+        ('token_refresh', 'post', reverse('token_refresh'), {'refresh': tokens['refresh']}, None),
+        ('token_revoke', 'post', reverse('token_revoke'), {'refresh': issue_pair(user)['refresh']},
+         tokens['access']),
+        ('profile', 'get', reverse('profile'), None, user),
+        ('update_profile', 'put', reverse('update_profile'), {'city': 'Sacramento'}, user),
+        ('user_documents', 'get', reverse('user_documents'), None, user),
+        ('document_income', 'get', reverse('document_income'), None, user),
+    ]
+
+
+def full_scans(sql):
+    """Large tables the database plans to read in full for ``sql``"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            scanned = re.findall(r'Seq Scan on "?(\w+)"?', plan)
+        elif connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            scanned = [
+                match.group(1)
+                for row in cursor.fetchall()
+                for match in [re.match(r'SCAN "?(\w+)"?$', row[-1])] if match
+            ]
+        else:
+            return []
+    return sorted(set(scanned) & set(LARGE_TABLES))
+
+
+class Command(BaseCommand):
+    help = ('Request every eligibility and user API route against seeded data of several sizes '
+            'and fail if a route exceeds its query budget or fully scans a large table')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,1000,10000',
+                            help='Comma-separated numbers of checks and users to seed')
+        parser.add_argument('--no-explain', action='store_true',
+                            help='Only count queries')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        names = {
+            pattern.name
+            for urlconf in (eligibility_urls, user_urls)
+            for pattern in urlconf.urlpatterns if isinstance(pattern, URLPattern)
+        }
+        failures = [f'{name}: no query budget declared' for name in sorted(names - set(QUERY_BUDGETS))]
+
+        # Test settings for the client (the 'testserver' host, fast email backend)
+        setup_test_environment()
+        try:
+            for size in sizes:
+                # Seed, measure and roll everything back
+                with transaction.atomic():
+                    user, *objects = self.seed(size)
+                    failures += self.measure(size, user, objects, not options['no_explain'])
+                    transaction.set_rollback(True)
+                self.catalog_changed()
+        finally:
+            teardown_test_environment()
+
+        if failures:
+            raise CommandError('Query budget exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'All {len(names)} routes within budget at sizes {sizes}'))
+
+    def seed(self, size):
+        programs = GovernmentProgram.objects.bulk_create([
+            GovernmentProgram(
+                name=f'Budget program {i}',
+                program_type=GovernmentProgram.PROGRAM_TYPES[i % len(GovernmentProgram.PROGRAM_TYPES)][0],
+                description='Seeded by check_query_budget',
+                max_benefit_amount=Decimal(1000 + i),
+                max_income=Decimal(20000 + 1000 * i) if i % 2 else None,
+                is_active=i % 10 != 9,
+            )
+            for i in range(max(10, min(size // 10, 200)))
+        ])
+        program_ids = [program.id for program in programs]
+
+        user = User(username='budget-user', email='budget@example.com')
+        user.set_password(PASSWORD)
+        user.save()
+        others = User.objects.bulk_create([
+            User(username=f'budget-user-{i}', email=f'budget-{i}@example.com') for i in range(size)
+        ])
+
+        now = timezone.now()
+        owners = [user] * size + others
+        EligibilityCheck.objects.bulk_create([
+            EligibilityCheck(
+                user=owner, age=18 + i % 60, annual_income=Decimal(i % 90000), is_student=bool(i % 2),
+                is_citizen=True, household_size=1 + i % 6, state='CA', created_at=now,
+                eligible_program_ids=program_ids[i % len(program_ids):][:8],
+                total_potential_benefits=Decimal(5000),
+            )
+            for i, owner in enumerate(owners)
+        ], batch_size=1000)
+        ApplicationStatus.objects.bulk_create([
+            ApplicationStatus(user=owner, program_id=program_ids[i % len(program_ids)], status='in_progress')
+            for i, owner in enumerate([user] * min(len(program_ids) - 1, size) + others)
+        ], batch_size=1000)
+        UserDocument.objects.bulk_create([
+            UserDocument(user=owner, document_type='other', file='documents/budget.pdf',
+                         original_filename='budget.pdf')
+            for owner in [user] * min(size, 50) + others
+        ], batch_size=1000)
+        rollups.reconcile()
+        self.catalog_changed()
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for table in LARGE_TABLES:
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+
+        check = EligibilityCheck.objects.filter(user=user).latest('created_at')
+        application = ApplicationStatus.objects.filter(user=user).first()
+        # The last program is left for the application the client creates
+        return user, check, application, program_ids[-1]
+
+    def catalog_changed(self):
+        # bulk_create and rollbacks send no catalog signals
+        bump_catalog_version()
+        invalidate_index()
+        get_memo().clear()
+
+    def measure(self, size, user, objects, explain):
+        failures = []
+        for name, method, path, payload, as_user in route_requests(user, *objects):
+            client = APIClient()
+            if isinstance(as_user, str):
+                client.credentials(HTTP_AUTHORIZATION=f'Bearer {as_user}')
+            elif as_user is not None:
+                client.force_authenticate(as_user)
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(client, method)(path, payload, format='json')
+            queries = [
+                query['sql'] for query in context.captured_queries
+                if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'))
+            ]
+
+            label = f'{method.upper()} {path} (size {size})'
+            self.stdout.write(f'  {label}: {response.status_code}, {len(queries)} queries')
+            if response.status_code >= 400:
+                failures.append(f'{label}: HTTP {response.status_code}')
+            if len(queries) > QUERY_BUDGETS[name]:
+                failures.append(f'{label}: {len(queries)} queries, budget {QUERY_BUDGETS[name]}')
+            if explain and name not in FULL_SCAN_ROUTES:
+                for sql in queries:
+                    if sql.startswith('SELECT'):
+                        for table in full_scans(sql):
+                            failures.append(f'{label}: full scan of {table} in {sql[:200]}')
+        return failures
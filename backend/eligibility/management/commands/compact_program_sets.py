@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from eligibility.models import EligibilityCheck
+
+
+class Command(BaseCommand):
+    help = ('Copy eligible programs from the EligibilityCheck M2M through table into the '
+            'compact eligible_program_ids column, in batches of check IDs')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Checks converted per transaction')
+        parser.add_argument('--drop-links', action='store_true',
+                            help='Delete the converted through-table rows afterwards')
+
+    def handle(self, *args, **options):
+        Through = EligibilityCheck.eligible_programs.through
+        batch_size = options['batch_size']
+        last_id = EligibilityCheck.objects.aggregate(last=Max('id'))['last'] or 0
+
+        converted = links = 0
+        started = time.perf_counter()
+        for low in range(0, last_id + 1, batch_size):
+            high = low + batch_size
+            with transaction.atomic():
+                program_ids = {}
+                rows = Through.objects.filter(
+                    eligibilitycheck_id__gte=low, eligibilitycheck_id__lt=high
+                ).values_list('eligibilitycheck_id', 'governmentprogram_id')
+                for check_id, program_id in rows:
+                    program_ids.setdefault(check_id, []).append(program_id)
+                if not program_ids:
+                    continue
+
+                checks = list(EligibilityCheck.objects.filter(id__in=program_ids).only('id'))
+                for check in checks:
+                    check.eligible_program_ids = program_ids[check.id]
+                EligibilityCheck.objects.bulk_update(checks, ['eligible_program_ids'])
+
+                if options['drop_links']:
+                    Through.objects.filter(
+                        eligibilitycheck_id__gte=low, eligibilitycheck_id__lt=high
+                    ).delete()
+
+            converted += len(checks)
+            links += sum(len(ids) for ids in program_ids.values())
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  checks < {high}: {converted} converted, {links} links '
+                              f'({converted / elapsed:,.0f} checks/s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Converted {converted} checks ({links} program links) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,117 @@
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from eligibility import rollups
+from eligibility.dataset import DatasetConfig, create_programs, write_block, write_block_in_worker
+from eligibility.models import GovernmentProgram
+from eligibility.signals import catalog_changed
+from users.models import User
+
+TABLES = ['programs', 'income_limits', 'users', 'checks', 'program_links', 'applications']
+
+
+class Command(BaseCommand):
+    help = ('Generate a deterministic synthetic dataset (programs, users, eligibility checks and '
+            'applications) for performance testing, and report rows written per second')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programs', type=int, default=1000, help='Programs to add to the catalog')
+        parser.add_argument('--users', type=int, default=10000, help='Users to create')
+        parser.add_argument('--checks-per-user', type=float, default=3.0,
+                            help='Average eligibility checks per user')
+        parser.add_argument('--applications-per-user', type=float, default=1.0,
+                            help='Average application statuses per user')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread timestamps over this many days before --end-date')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                            help='Latest timestamp, YYYY-MM-DD (default: today); fix it to reproduce a dataset')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same options give the same rows')
+        parser.add_argument('--prefix', default='gen', help='Prefix of generated usernames and program names')
+        parser.add_argument('--password', default='generated-password', help='Password of every generated user')
+        parser.add_argument('--block-size', type=int, default=10000,
+                            help='Users generated and written per transaction (the unit of work of a worker)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes writing blocks')
+        parser.add_argument('--copy', action='store_true', help='Insert with COPY instead of INSERT (PostgreSQL)')
+        parser.add_argument('--program-links', action='store_true', default=None,
+                            help='Also write the eligible_programs M2M rows '
+                                 '(default: ELIGIBILITY_STORE_PROGRAM_LINKS)')
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy needs PostgreSQL')
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users prefixed {options['prefix']!r} already exist; pick another --prefix")
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; using one worker'))
+            workers = 1
+
+        end_date = options['end_date'] or timezone.localdate()
+        end = timezone.make_aware(datetime.combine(end_date, dt_time.min))
+        program_links = options['program_links']
+        config = DatasetConfig(
+            seed=options['seed'],
+            prefix=options['prefix'],
+            users=options['users'],
+            block_size=options['block_size'],
+            checks_per_user=options['checks_per_user'],
+            applications_per_user=options['applications_per_user'],
+            start=end - timedelta(days=options['days']),
+            end=end,
+            # Hashing is deliberately slow; every user shares one hash
+            password=make_password(options['password']),
+            batch_size=options['batch_size'],
+            program_links=settings.ELIGIBILITY_STORE_PROGRAM_LINKS if program_links is None else program_links,
+            use_copy=options['copy'],
+        )
+
+        started = time.perf_counter()
+        programs, limits = create_programs(options['programs'], config.seed, config.prefix, config.batch_size)
+        # bulk_create sends no signals
+        catalog_changed(GovernmentProgram)
+        self.stdout.write(f'  {programs} programs, {limits} income limits ({time.perf_counter() - started:.1f}s)')
+
+        totals = dict.fromkeys(TABLES, 0)
+        totals.update(programs=programs, income_limits=limits)
+        delta = rollups.RollupDelta()
+        for block, rows, block_delta, seconds in self.write_blocks(config, workers):
+            delta.merge(block_delta)
+            for table, count in rows.items():
+                totals[table] += count
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  block {block + 1}/{config.blocks}: {rows["users"]} users, {rows["checks"]} checks, '
+                f'{rows["applications"]} applications in {seconds:.1f}s '
+                f'({sum(totals.values()) / elapsed:,.0f} rows/s overall)'
+            )
+        delta.apply()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {sum(totals.values()):,} rows in {elapsed:.1f}s ({sum(totals.values()) / elapsed:,.0f} rows/s)'
+        ))
+        for table, count in totals.items():
+            self.stdout.write(f'  {table:<14}{count:>14,}')
+
+    def write_blocks(self, config, workers):
+        """Yield each block's result as it is written, in completion order"""
+        if workers <= 1:
+            for block in range(config.blocks):
+                yield write_block(block, config)
+            return
+
+        from multiprocessing import Pool
+
+        import django
+
+        # Forked workers must open their own connections
+        connections.close_all()
+        with Pool(workers, initializer=django.setup) as pool:
+            yield from pool.imap_unordered(write_block_in_worker, [(block, config) for block in range(config.blocks)])
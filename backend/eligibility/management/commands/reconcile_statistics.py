@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from eligibility import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the statistics rollup tables from the source tables'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rollups.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f'Statistics reconciled in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,61 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from eligibility import reevaluation
+
+
+class Command(BaseCommand):
+    help = ('Re-evaluate the stored eligibility checks affected by program criteria changes, '
+            'reporting progress, throughput and rows updated')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Checks rewritten per transaction (default: ELIGIBILITY_REEVALUATION_BATCH_SIZE)')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when no jobs are pending instead of polling')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        done = failed = 0
+        try:
+            while True:
+                requeued = reevaluation.requeue_stale()
+                if requeued:
+                    self.stdout.write(f'  requeued {requeued} stalled jobs')
+                job = reevaluation.claim(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'Job {job.pk}: re-evaluating checks for program {job.program_id}')
+                started = time.perf_counter()
+                try:
+                    reevaluation.run_job(job, options['batch_size'], report=self.report)
+                except Exception as exc:
+                    reevaluation.fail(job, f'{type(exc).__name__}: {exc}')
+                    self.stdout.write(self.style.ERROR(f'Job {job.pk} failed: {exc}'))
+                    failed += 1
+                    continue
+                done += 1
+                self.stdout.write(self.style.SUCCESS(
+                    f'Job {job.pk}: {job.scanned} of {job.candidates} candidate checks re-evaluated, '
+                    f'{job.updated} updated ({job.gained} gained, {job.lost} lost the program) '
+                    f'in {time.perf_counter() - started:.1f}s'
+                ))
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted; the running job will be handed out again after the job timeout')
+
+        self.stdout.write(self.style.SUCCESS(f'Finished {done} jobs ({failed} failed)'))
+
+    def report(self, job, seconds):
+        self.stdout.write(
+            f'  {job.scanned}/{job.candidates} checks ({job.scanned / job.candidates:.0%}), '
+            f'{job.updated} updated, {job.scanned / seconds:,.0f} checks/s'
+        )
@@ -0,0 +1,93 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from eligibility import rollups
+from eligibility.batch import get_catalog_matrix
+from eligibility.index import from_cents
+from eligibility.models import EligibilityCheck
+from eligibility.screening import ResultWriter, chunked, detect_format, read_profiles, screen_stream
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Screen a CSV or NDJSON file of applicant profiles against the active program catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='CSV or NDJSON file of applicant profiles')
+        parser.add_argument('output', help='File to stream results to')
+        parser.add_argument('--input-format', choices=['csv', 'ndjson'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--output-format', choices=['csv', 'ndjson'],
+                            help='Output format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Profiles screened per chunk')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes to screen chunks on')
+        parser.add_argument('--persist', action='store_true',
+                            help='Also store an EligibilityCheck for every valid profile')
+        parser.add_argument('--user', help='Username the persisted checks belong to')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per bulk_create when persisting')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['persist']:
+            if not options['user']:
+                raise CommandError('--persist requires --user')
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']!r} does not exist")
+
+        input_format = options['input_format'] or detect_format(options['input'])
+        output_format = options['output_format'] or detect_format(options['output'])
+        matrix = get_catalog_matrix()
+
+        screened = invalid = 0
+        started = time.perf_counter()
+        with open(options['input'], newline='') as source, \
+                open(options['output'], 'w', newline='') as target:
+            writer = ResultWriter(target, output_format)
+            chunks = chunked(read_profiles(source, input_format), options['chunk_size'])
+            row_number = 0
+            for results in screen_stream(matrix, chunks, workers=options['workers']):
+                for profile, program_ids, total_cents, error in results:
+                    row_number += 1
+                    writer.write(row_number, program_ids, total_cents, error)
+                    if error is not None:
+                        invalid += 1
+                screened += len(results)
+                if user is not None:
+                    self.persist(user, results, options['batch_size'])
+
+        elapsed = time.perf_counter() - started
+        rate = screened / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Screened {screened} profiles ({invalid} invalid) in {elapsed:.1f}s ({rate:,.0f}/s)'
+        ))
+
+    def persist(self, user, results, batch_size):
+        """Store one chunk of results with batched inserts"""
+        valid = [result for result in results if result[3] is None]
+        Through = EligibilityCheck.eligible_programs.through
+        for batch in chunked(valid, batch_size):
+            with transaction.atomic():
+                checks = EligibilityCheck.objects.bulk_create([
+                    EligibilityCheck(
+                        user=user,
+                        eligible_program_ids=program_ids,
+                        total_potential_benefits=from_cents(total_cents),
+                        **profile,
+                    )
+                    for profile, program_ids, total_cents, _ in batch
+                ], batch_size=batch_size)
+                if settings.ELIGIBILITY_STORE_PROGRAM_LINKS:
+                    Through.objects.bulk_create([
+                        Through(eligibilitycheck_id=check.pk, governmentprogram_id=program_id)
+                        for check, (_, program_ids, _, _) in zip(checks, batch)
+                        for program_id in program_ids
+                    ], batch_size=batch_size)
+                rollups.record_checks(checks, [program_ids for _, program_ids, _, _ in batch])
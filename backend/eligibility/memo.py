@@ -0,0 +1,138 @@
+"""
+Memoization of eligibility results.
+
+Results are keyed on a canonical fingerprint of the validated input plus
+the catalog version of the index that produced them, so any catalog edit
+makes old entries unreachable. Each worker keeps a bounded LRU with TTL
+in front of the Django cache named by ``ELIGIBILITY_MEMO_CACHE``; pointing
+that alias at a shared backend lets workers reuse each other's results.
+
+Only program IDs and the benefit total in cents are stored. A hit maps
+the IDs back to programs through the index and skips rule evaluation.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .index import from_cents, get_index, to_cents
+
+MEMO_KEY_PREFIX = 'eligibility:memo'
+
+
+def fingerprint(data):
+    """Return a canonical digest of validated eligibility input"""
+    canonical = '|'.join([
+        str(data['age']),
+        str(to_cents(data['annual_income'])),
+        '1' if data['is_student'] else '0',
+        '1' if data['is_citizen'] else '0',
+        str(data['household_size']),
+        data['state'].strip().upper(),
+    ])
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class ResultMemo:
+    """Process-local LRU with TTL backed by a Django cache"""
+
+    def __init__(self, max_entries, ttl, cache_alias):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.evictions += 1
+
+        value = caches[self.cache_alias].get(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._store(key, value, now)
+        return value
+
+    def set(self, key, value):
+        caches[self.cache_alias].set(key, value, self.ttl)
+        with self.lock:
+            self._store(key, value, time.monotonic())
+
+    def _store(self, key, value, now):
+        self.entries[key] = (now + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop local entries; shared entries die with their catalog version"""
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+            }
+
+
+_memo = ResultMemo(
+    max_entries=getattr(settings, 'ELIGIBILITY_MEMO_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'ELIGIBILITY_MEMO_TTL', 300),
+    cache_alias=getattr(settings, 'ELIGIBILITY_MEMO_CACHE', 'default'),
+)
+
+
+def get_memo():
+    return _memo
+
+
+def evaluate(data):
+    """Evaluate validated input, reusing a memoized result when possible.
+
+    Returns the eligible programs and their total potential benefits, like
+    ``EligibilityIndex.evaluate``.
+    """
+    index = get_index()
+    if not getattr(settings, 'ELIGIBILITY_MEMO_ENABLED', True):
+        return index.evaluate(data)
+
+    key = f'{MEMO_KEY_PREFIX}:{index.version}:{fingerprint(data)}'
+    cached = _memo.get(key)
+    if cached is not None:
+        program_ids, total_cents = cached
+        programs = [index.programs_by_id.get(program_id) for program_id in program_ids]
+        if None not in programs:
+            return programs, from_cents(total_cents)
+
+    programs, total_benefits = index.evaluate(data)
+    _memo.set(key, ([program.id for program in programs], to_cents(total_benefits)))
+    return programs, total_benefits
@@ -1,5 +1,9 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from users.models import User
+from .fields import ProgramIdSetField
 
 class GovernmentProgram(models.Model):
     """Model for government benefit programs"""
@@ -24,16 +28,46 @@ class GovernmentProgram(models.Model):
     max_income = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     requires_enrollment = models.BooleanField(default=False)  # College enrollment
     requires_citizenship = models.BooleanField(default=True)
+    states = models.CharField(max_length=1000, blank=True,
+                              help_text='Comma-separated states the program is offered in; blank for nationwide')
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    class Meta:
+        indexes = [
+            # The catalog endpoints only ever read active programs
+            models.Index(fields=['program_type', 'id'], condition=models.Q(is_active=True),
+                         name='program_active_type_idx'),
+        ]
+    
     def __str__(self):
         return self.name
 
+class ProgramIncomeLimit(models.Model):
+    """Income limit for a program by household size, optionally per state
+    
+    Rows with a blank state are the national default. A household larger
+    than any listed size uses the largest listed size below it, and
+    programs without rows fall back to ``GovernmentProgram.max_income``.
+    """
+    program = models.ForeignKey(GovernmentProgram, on_delete=models.CASCADE, related_name='income_limits')
+    state = models.CharField(max_length=50, blank=True)
+    household_size = models.PositiveSmallIntegerField()
+    max_income = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    class Meta:
+        unique_together = ['program', 'state', 'household_size']
+    
+    def __str__(self):
+        return f"{self.program.name} - {self.state or 'National'} - {self.household_size}"
+
 class EligibilityCheck(models.Model):
     """Model to store eligibility check results"""
+    # Assigned before the row is written, so write-behind checks can be
+    # handed back to the client and resolved while still queued.
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='eligibility_checks')
     
     # User information at time of check
@@ -44,11 +78,26 @@ class EligibilityCheck(models.Model):
     household_size = models.IntegerField()
     state = models.CharField(max_length=50)
     
-    # Results
+    # Results. eligible_program_ids is the primary, compact record; the M2M
+    # is only written when ELIGIBILITY_STORE_PROGRAM_LINKS is enabled.
+    eligible_program_ids = ProgramIdSetField()
     eligible_programs = models.ManyToManyField(GovernmentProgram, related_name='eligible_users')
     total_potential_benefits = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the check is built rather than when it is saved, so a check
+    # returned before write-behind stores it keeps the timestamp it was given
+    created_at = models.DateTimeField(default=timezone.now, editable=False, blank=True)
+    
+    class Meta:
+        indexes = [
+            # A user's history, newest first (the keyset pagination order)
+            models.Index(fields=['user', '-created_at', '-id'], name='elig_check_user_recent_idx'),
+            # Retention window filters and oldest-first archival
+            models.Index(fields=['created_at', 'id'], name='elig_check_created_idx'),
+            # Range lookups of the checks a criteria change can affect
+            models.Index(fields=['age'], name='elig_check_age_idx'),
+            models.Index(fields=['annual_income'], name='elig_check_income_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.created_at.strftime('%Y-%m-%d')}"
@@ -75,6 +124,81 @@ class ApplicationStatus(models.Model):
     
     class Meta:
         unique_together = ['user', 'program']
+        indexes = [
+            models.Index(fields=['user', 'status'], name='application_user_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.program.name} - {self.status}"
+
+class StatisticsCounter(models.Model):
+    """Named running total maintained by the statistics rollups"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+class DailyCheckRollup(models.Model):
+    """Number of eligibility checks per day and state"""
+    day = models.DateField()
+    state = models.CharField(max_length=50)
+    check_count = models.BigIntegerField(default=0)
+    # Of those, checks since moved to the archive (see archive.py)
+    archived_count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['day', 'state']
+    
+    def __str__(self):
+        return f"{self.day} - {self.state} - {self.check_count}"
+
+class ProgramRollup(models.Model):
+    """Number of stored eligibility checks each program appeared in"""
+    program = models.OneToOneField(GovernmentProgram, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='rollup')
+    eligible_count = models.BigIntegerField(default=0)
+    # Of those, checks since moved to the archive (see archive.py)
+    archived_count = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.program.name} - {self.eligible_count}"
+
+class ReevaluationJob(models.Model):
+    """Re-evaluation of stored checks after a program's criteria changed (see reevaluation.py)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    program = models.ForeignKey(GovernmentProgram, on_delete=models.CASCADE, related_name='reevaluation_jobs')
+    # The program's criteria before the change; the current ones are read
+    # when the job runs
+    previous_criteria = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    locked_by = models.CharField(max_length=100, blank=True)
+    
+    # Progress: checks whose outcome may have changed, checks re-evaluated so
+    # far, rows rewritten, and checks that gained or lost the program
+    candidates = models.BigIntegerField(null=True, blank=True)
+    scanned = models.BigIntegerField(default=0)
+    updated = models.BigIntegerField(default=0)
+    gained = models.BigIntegerField(default=0)
+    lost = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Moved after every batch; a running job that stops moving is handed out again
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='reevaluation_job_queue_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.program.name} - {self.status}"
\ No newline at end of file
+        return f"{self.program} - {self.status}"
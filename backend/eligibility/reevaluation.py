@@ -0,0 +1,362 @@
+"""
+Incremental re-evaluation of stored checks when a program's criteria change.
+
+Saving a program, or adding, editing or deleting one of its income limits,
+snapshots the program's criteria as they were and queues a
+``ReevaluationJob`` once the transaction commits, unless a job still
+waiting for that program starts from the same criteria. Each distinct
+starting point gets its own job: after edits A -> B -> A the checks
+stored under B are re-evaluated by the job starting from B, while the one
+starting from A finds nothing to do. ``manage.py run_reevaluation_jobs``
+works through the queue.
+
+A job compares the snapshot with the current criteria and turns the
+difference into a filter on the stored checks. Changed age and income
+limits become ranges between the old and the new limit (both columns are
+indexed). A flipped enrollment or citizenship rule selects the
+non-students or non-citizens, and a changed state list selects the states
+added or removed. The filter is narrowed to the checks that pass every
+criterion under the old or the new rules. Only changes to the benefit
+amount or to ``is_active`` select every check passing the rules, since
+they change the total of each check holding the program.
+
+The matching check ids are collected in one indexed query. The checks are
+then re-evaluated for that program alone, in batches of
+``ELIGIBILITY_REEVALUATION_BATCH_SIZE``, and each batch is rewritten in
+one transaction: the eligible set, the total (recomputed from the current
+catalog), the program links when they are stored, and the program rollup.
+A batch re-evaluated twice is left unchanged, so a job whose worker died
+is simply run again.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import and_, or_
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import rollups
+from .index import CENT, MAX_HOUSEHOLD_SIZE, EligibilityIndex, from_cents, parse_states, to_cents
+from .models import EligibilityCheck, GovernmentProgram, ProgramIncomeLimit, ReevaluationJob
+from .simulation import SIMULATED_FIELDS as CRITERIA_FIELDS
+
+MONEY_FIELDS = ['max_income', 'max_benefit_amount']
+CHECK_FIELDS = [
+    'id', 'age', 'annual_income', 'is_student', 'is_citizen', 'household_size', 'state',
+    'eligible_program_ids', 'total_potential_benefits',
+]
+
+# Check filters: ALL matches every check, NOTHING none
+ALL = None
+NOTHING = Q(pk__in=[])
+
+
+def criteria(values):
+    """JSON-ready criteria from ``{field: value}`` (a model row or instance)"""
+    result = {field: values[field] for field in CRITERIA_FIELDS}
+    for field in MONEY_FIELDS:
+        if result[field] is not None:
+            result[field] = str(Decimal(result[field]).quantize(CENT))
+    return result
+
+
+def instance_criteria(program):
+    return criteria({field: getattr(program, field) for field in CRITERIA_FIELDS})
+
+
+def criteria_snapshot(program_id):
+    """A program's stored criteria, income limits included, or None if it does not exist"""
+    values = GovernmentProgram.objects.filter(pk=program_id).values(*CRITERIA_FIELDS).first()
+    if values is None:
+        return None
+    snapshot = criteria(values)
+    snapshot['income_limits'] = [
+        [state, household_size, str(max_income)]
+        for state, household_size, max_income in ProgramIncomeLimit.objects.filter(program_id=program_id)
+        .order_by('state', 'household_size').values_list('state', 'household_size', 'max_income')
+    ]
+    return snapshot
+
+
+def compile_criteria(program_id, snapshot):
+    """An ``EligibilityIndex`` holding just the program described by ``snapshot``"""
+    fields = {field: snapshot[field] for field in CRITERIA_FIELDS}
+    for field in MONEY_FIELDS:
+        if fields[field] is not None:
+            fields[field] = Decimal(fields[field])
+    program = GovernmentProgram(id=program_id, **fields)
+    income_limits = [
+        ProgramIncomeLimit(program_id=program_id, state=state, household_size=household_size,
+                           max_income=Decimal(max_income))
+        for state, household_size, max_income in snapshot['income_limits']
+    ]
+    return EligibilityIndex([program], income_limits=income_limits)
+
+
+def _union(*filters):
+    # Unchanged criteria give the same filter twice
+    filters = [
+        check_filter for position, check_filter in enumerate(filters)
+        if check_filter is not NOTHING and check_filter not in filters[:position]
+    ]
+    if not filters:
+        return NOTHING
+    if any(check_filter is ALL for check_filter in filters):
+        return ALL
+    return reduce(or_, filters)
+
+
+def _intersection(*filters):
+    if any(check_filter is NOTHING for check_filter in filters):
+        return NOTHING
+    filters = [check_filter for check_filter in filters if check_filter is not ALL]
+    return reduce(and_, filters) if filters else ALL
+
+
+def _difference(old, new):
+    """Checks matched by exactly one of two filters"""
+    if old == new:
+        return NOTHING
+    if old is ALL or new is ALL:
+        return ~(new if old is ALL else old)
+    return (old & ~new) | (~old & new)
+
+
+def _between(field, low=None, high=None):
+    """Checks with ``low <= field <= high``; None leaves a side open"""
+    lookups = {}
+    if low is not None:
+        lookups[f'{field}__gte'] = low
+    if high is not None:
+        lookups[f'{field}__lte'] = high
+    return Q(**lookups) if lookups else ALL
+
+
+def _age_changes(old, new):
+    """Ages that pass one of two (minimum, maximum) pairs and fail the other"""
+    (old_min, old_max), (new_min, new_max) = old, new
+    changed = []
+    if old_min != new_min:
+        # Open below when either side had no minimum
+        low = min(old_min, new_min) if old_min and new_min else None
+        changed.append(_between('age', low, max(old_min or 0, new_min or 0) - 1))
+    if old_max != new_max:
+        high = max(old_max, new_max) if old_max and new_max else None
+        changed.append(_between('age', min(limit for limit in (old_max, new_max) if limit) + 1, high))
+    return _union(*changed)
+
+
+def _income_limits(index, keys):
+    """``{(state key, household size): cents or None}`` for the program in ``index``"""
+    return {
+        (key, size): index.income_limit_cents(0, size, key)
+        for key in keys for size in range(1, MAX_HOUSEHOLD_SIZE + 1)
+    }
+
+
+def _income_filter(limits):
+    """Incomes passing the highest of ``limits``"""
+    if any(limit is None for limit in limits):
+        return ALL
+    return _between('annual_income', high=from_cents(max(limits)))
+
+
+def _income_changes(old_limits, new_limits):
+    """Incomes between the old and new limit of any household, one range covering all of them"""
+    changed = [(old_limits[key], new_limits[key]) for key in old_limits if old_limits[key] != new_limits[key]]
+    if not changed:
+        return NOTHING
+    low = min(min(limit for limit in pair if limit is not None) for pair in changed)
+    highs = [max(pair) if None not in pair else None for pair in changed]
+    high = None if None in highs else max(highs)
+    return _between('annual_income', from_cents(low + 1), from_cents(high) if high is not None else None)
+
+
+def _state_filter(program):
+    states = parse_states(program.states)
+    if not states:
+        return ALL
+    return reduce(or_, (Q(state__iexact=state) for state in sorted(states)))
+
+
+def affected_checks(old, new):
+    """Filter on the checks whose outcome for the program can differ between two ``compile_criteria`` indexes"""
+    old_program, new_program = old.programs[0], new.programs[0]
+    keys = {''} | set(old.income_tables.get(0, {})) | set(new.income_tables.get(0, {}))
+    old_income, new_income = _income_limits(old, keys), _income_limits(new, keys)
+
+    def passes(program, income_limits):
+        return {
+            'active': ALL if program.is_active else NOTHING,
+            'age': _between('age', program.min_age or None, program.max_age or None),
+            'income': _income_filter(income_limits.values()),
+            'enrollment': Q(is_student=True) if program.requires_enrollment else ALL,
+            'citizenship': Q(is_citizen=True) if program.requires_citizenship else ALL,
+            'states': _state_filter(program),
+        }
+
+    old_passes = passes(old_program, old_income)
+    new_passes = passes(new_program, new_income)
+
+    changes = [
+        _age_changes((old_program.min_age, old_program.max_age), (new_program.min_age, new_program.max_age)),
+        _income_changes(old_income, new_income),
+        _difference(old_passes['enrollment'], new_passes['enrollment']),
+        _difference(old_passes['citizenship'], new_passes['citizenship']),
+        _difference(old_passes['states'], new_passes['states']),
+    ]
+    if old_program.is_active != new_program.is_active or old.benefit_cents != new.benefit_cents:
+        changes.append(ALL)
+
+    # Outcomes only differ for checks passing each criterion under old or new rules
+    return _intersection(
+        _union(*changes),
+        *(_union(old_passes[criterion], new_passes[criterion]) for criterion in old_passes),
+    )
+
+
+def candidate_ids(check_filter, chunk_size=10000):
+    """Sorted ids of the checks matching ``check_filter``"""
+    if check_filter is NOTHING:
+        return np.empty(0, dtype=np.int64)
+    checks = EligibilityCheck.objects.all() if check_filter is ALL else EligibilityCheck.objects.filter(check_filter)
+    ids = np.fromiter(checks.values_list('id', flat=True).iterator(chunk_size=chunk_size), dtype=np.int64)
+    ids.sort()
+    return ids
+
+
+def reevaluate_batch(program_id, index, benefit_cents, ids):
+    """Re-evaluate the checks ``ids`` for one program and rewrite the changed ones.
+
+    ``index`` holds the program's current criteria and ``benefit_cents``
+    maps every program id to its current benefit. Returns
+    ``(updated, gained, lost)``.
+    """
+    program = index.programs[0]
+    changed = []
+    gained = []
+    lost = []
+    with transaction.atomic():
+        for check in EligibilityCheck.objects.filter(id__in=ids).only(*CHECK_FIELDS):
+            program_ids = check.eligible_program_ids
+            was = program_id in program_ids
+            now = program.is_active and bool(index.match(
+                check.age, to_cents(check.annual_income), check.is_student, check.is_citizen,
+                check.household_size, check.state,
+            ))
+            if now and not was:
+                program_ids = sorted(program_ids + [program_id])
+                gained.append(check.id)
+            elif was and not now:
+                program_ids = [other for other in program_ids if other != program_id]
+                lost.append(check.id)
+            total = from_cents(sum(benefit_cents.get(other, 0) for other in program_ids))
+            if was == now and total == check.total_potential_benefits:
+                continue
+            check.eligible_program_ids = program_ids
+            check.total_potential_benefits = total
+            changed.append(check)
+
+        EligibilityCheck.objects.bulk_update(changed, ['eligible_program_ids', 'total_potential_benefits'],
+                                             batch_size=1000)
+        if settings.ELIGIBILITY_STORE_PROGRAM_LINKS:
+            Through = EligibilityCheck.eligible_programs.through
+            Through.objects.bulk_create([
+                Through(eligibilitycheck_id=check_id, governmentprogram_id=program_id) for check_id in gained
+            ], ignore_conflicts=True)
+            Through.objects.filter(eligibilitycheck_id__in=lost, governmentprogram_id=program_id).delete()
+        delta = rollups.RollupDelta()
+        delta.programs[program_id] = len(gained) - len(lost)
+        delta.apply()
+    return len(changed), len(gained), len(lost)
+
+
+def enqueue(program_id, previous_criteria):
+    """Queue a re-evaluation, unless one not yet started already starts from ``previous_criteria``"""
+    pending = ReevaluationJob.objects.filter(program_id=program_id, status='pending')
+    if any(snapshot == previous_criteria for snapshot in pending.values_list('previous_criteria', flat=True)):
+        return None
+    # Deleted in the transaction that queued this
+    if not GovernmentProgram.objects.filter(pk=program_id).exists():
+        return None
+    return ReevaluationJob.objects.create(program_id=program_id, previous_criteria=previous_criteria)
+
+
+def claim(worker):
+    """Mark the oldest pending job as running for ``worker`` and return it.
+
+    Jobs of a program already being re-evaluated wait for that job.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        busy = ReevaluationJob.objects.filter(status='running').values('program_id')
+        job = (
+            ReevaluationJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending').exclude(program_id__in=busy).order_by('id').first()
+        )
+        if job is None:
+            return None
+        job.status, job.locked_by, job.started_at, job.heartbeat_at = 'running', worker, now, now
+        job.candidates, job.scanned, job.updated, job.gained, job.lost, job.error = None, 0, 0, 0, 0, ''
+        job.save(update_fields=['status', 'locked_by', 'started_at', 'heartbeat_at', 'candidates', 'scanned',
+                                'updated', 'gained', 'lost', 'error'])
+    return job
+
+
+def requeue_stale():
+    """Return running jobs that stopped reporting progress to the queue; returns how many"""
+    cutoff = timezone.now() - timedelta(seconds=settings.ELIGIBILITY_REEVALUATION_JOB_TIMEOUT)
+    return ReevaluationJob.objects.filter(status='running', heartbeat_at__lt=cutoff).update(
+        status='pending', locked_by='', error='Timed out'
+    )
+
+
+def run_job(job, batch_size=None, report=None):
+    """Re-evaluate the checks a job's criteria change can affect.
+
+    ``report(job, seconds)`` is called after every batch.
+    """
+    batch_size = batch_size or settings.ELIGIBILITY_REEVALUATION_BATCH_SIZE
+    started = time.perf_counter()
+    snapshot = criteria_snapshot(job.program_id)
+    if snapshot is not None:
+        index = compile_criteria(job.program_id, snapshot)
+        ids = candidate_ids(affected_checks(compile_criteria(job.program_id, job.previous_criteria), index))
+        benefit_cents = {
+            program_id: to_cents(amount) if amount else 0
+            for program_id, amount in GovernmentProgram.objects.values_list('id', 'max_benefit_amount')
+        }
+        benefit_cents[job.program_id] = index.benefit_cents[0]
+
+        job.candidates = len(ids)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size].tolist()
+            updated, gained, lost = reevaluate_batch(job.program_id, index, benefit_cents, batch)
+            job.scanned += len(batch)
+            job.updated += updated
+            job.gained += gained
+            job.lost += lost
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=['candidates', 'scanned', 'updated', 'gained', 'lost', 'heartbeat_at'])
+            if report is not None:
+                report(job, time.perf_counter() - started)
+    else:
+        # Deleted since; its checks keep the id like any other deleted program
+        job.candidates = 0
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'candidates', 'finished_at'])
+    return job
+
+
+def fail(job, error):
+    job.status = 'failed'
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
@@ -0,0 +1,187 @@
+"""
+Incrementally maintained statistics.
+
+``get_program_statistics`` reads only the rollup tables defined here:
+named counters (totals and the active program type distribution), check
+counts per day and state, and per-program eligible counts taken from
+``EligibilityCheck.eligible_program_ids``. Single-row writes keep them
+current through signals (see ``signals.py``); bulk writers build a
+``RollupDelta`` and apply it once per batch, since ``bulk_create`` sends
+no signals. ``manage.py reconcile_statistics``
+rebuilds everything from the source tables.
+
+The statistics cover every check ever made, archived ones included.
+Archiving a check leaves the totals as they are and only records it in
+the ``archived`` counts, which reconciliation adds to what it counts in
+the table.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    ApplicationStatus,
+    DailyCheckRollup,
+    EligibilityCheck,
+    GovernmentProgram,
+    ProgramRollup,
+    StatisticsCounter,
+)
+
+TOTAL_CHECKS = 'total_checks'
+TOTAL_APPLICATIONS = 'total_applications'
+TOTAL_ARCHIVED = 'archived_checks'
+ACTIVE_PROGRAMS = 'active_programs'
+PROGRAM_TYPE_PREFIX = 'active_programs:'
+
+
+def _add(model, lookup, field, delta):
+    """Add ``delta`` to ``field`` of the row matching ``lookup``, creating it if needed"""
+    if not delta:
+        return
+    increment = {field: F(field) + delta}
+    if model.objects.filter(**lookup).update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **{field: delta})
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**increment)
+
+
+def _add_many(model, key, values, field, delta):
+    """Add ``delta`` to ``field`` of every row whose ``key`` is in ``values``, in one UPDATE when they exist"""
+    increment = {field: F(field) + delta}
+    lookup = {f'{key}__in': values}
+    if model.objects.filter(**lookup).update(**increment) == len(values):
+        return
+    # Create the missing rows at zero (racing creators are ignored), then
+    # apply the delta to just those
+    existing = set(model.objects.filter(**lookup).values_list(key, flat=True))
+    missing = [value for value in values if value not in existing]
+    model.objects.bulk_create([model(**{key: value, field: 0}) for value in missing], ignore_conflicts=True)
+    model.objects.filter(**{f'{key}__in': missing}).update(**increment)
+
+
+class RollupDelta:
+    """Accumulated changes to the rollups, applied in one pass"""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.daily = Counter()
+        self.programs = Counter()
+
+    def add_check(self, check, program_ids=(), sign=1):
+        self.counters[TOTAL_CHECKS] += sign
+        self.daily[(timezone.localdate(check.created_at), check.state)] += sign
+        self.add_programs(program_ids, sign)
+
+    def add_programs(self, program_ids, sign=1):
+        for program_id in program_ids:
+            self.programs[program_id] += sign
+
+    def merge(self, other):
+        self.counters.update(other.counters)
+        self.daily.update(other.daily)
+        self.programs.update(other.programs)
+
+    def apply(self, archived=False):
+        """Add to the totals, or with ``archived`` to the counts of checks moved to the archive"""
+        with transaction.atomic():
+            for name, delta in self.counters.items():
+                if archived and name == TOTAL_CHECKS:
+                    name = TOTAL_ARCHIVED
+                _add(StatisticsCounter, {'name': name}, 'value', delta)
+            daily_field = 'archived_count' if archived else 'check_count'
+            for (day, state), delta in sorted(self.daily.items()):
+                _add(DailyCheckRollup, {'day': day, 'state': state}, daily_field, delta)
+            program_field = 'archived_count' if archived else 'eligible_count'
+            by_delta = {}
+            for program_id, delta in sorted(self.programs.items()):
+                if delta:
+                    by_delta.setdefault(delta, []).append(program_id)
+            for delta, program_ids in by_delta.items():
+                _add_many(ProgramRollup, 'program_id', program_ids, program_field, delta)
+
+
+def record_checks(checks, program_id_lists):
+    """Count checks written with ``bulk_create`` and their eligible programs"""
+    delta = RollupDelta()
+    for check, program_ids in zip(checks, program_id_lists):
+        delta.add_check(check, program_ids)
+    delta.apply()
+
+
+def record_application(sign):
+    _add(StatisticsCounter, {'name': TOTAL_APPLICATIONS}, 'value', sign)
+
+
+def refresh_program_counters():
+    """Recount the active catalog by program type (the catalog is small)"""
+    type_counts = dict(
+        GovernmentProgram.objects.filter(is_active=True)
+        .values_list('program_type')
+        .annotate(total=Count('id'))
+    )
+    counters = {ACTIVE_PROGRAMS: sum(type_counts.values())}
+    for program_type, _ in GovernmentProgram.PROGRAM_TYPES:
+        counters[PROGRAM_TYPE_PREFIX + program_type] = type_counts.get(program_type, 0)
+    with transaction.atomic():
+        for name, value in counters.items():
+            StatisticsCounter.objects.update_or_create(name=name, defaults={'value': value})
+
+
+def reconcile():
+    """Rebuild every rollup from the source tables, plus the archived counts"""
+    with transaction.atomic():
+        StatisticsCounter.objects.update_or_create(
+            name=TOTAL_CHECKS, defaults={'value': EligibilityCheck.objects.count() + get_counter(TOTAL_ARCHIVED)}
+        )
+        StatisticsCounter.objects.update_or_create(
+            name=TOTAL_APPLICATIONS, defaults={'value': ApplicationStatus.objects.count()}
+        )
+        refresh_program_counters()
+
+        archived_daily = {
+            (day, state): count
+            for day, state, count in DailyCheckRollup.objects.filter(archived_count__gt=0)
+            .values_list('day', 'state', 'archived_count')
+        }
+        daily = Counter(archived_daily)
+        daily.update({
+            (row['day'], row['state']): row['total']
+            for row in EligibilityCheck.objects
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'state')
+            .annotate(total=Count('id'))
+            .order_by()
+        })
+        DailyCheckRollup.objects.all().delete()
+        DailyCheckRollup.objects.bulk_create([
+            DailyCheckRollup(day=day, state=state, check_count=total,
+                             archived_count=archived_daily.get((day, state), 0))
+            for (day, state), total in daily.items()
+        ], batch_size=1000)
+
+        # Program sets are packed per row, so count them in one streaming pass
+        archived_programs = dict(
+            ProgramRollup.objects.filter(archived_count__gt=0).values_list('program_id', 'archived_count')
+        )
+        eligible_counts = Counter(archived_programs)
+        stored_sets = EligibilityCheck.objects.values_list('eligible_program_ids', flat=True)
+        for program_ids in stored_sets.iterator(chunk_size=10000):
+            eligible_counts.update(program_ids)
+        # A row per program, so later checks only ever need the UPDATE
+        ProgramRollup.objects.all().delete()
+        ProgramRollup.objects.bulk_create([
+            ProgramRollup(program_id=program_id, eligible_count=eligible_counts.get(program_id, 0),
+                          archived_count=archived_programs.get(program_id, 0))
+            for program_id in GovernmentProgram.objects.order_by('id').values_list('id', flat=True)
+        ], batch_size=1000)
+
+
+def get_counter(name):
+    return StatisticsCounter.objects.filter(name=name).values_list('value', flat=True).first() or 0
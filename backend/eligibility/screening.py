@@ -0,0 +1,204 @@
+"""
+Streaming pipeline for screening applicant files.
+
+Profiles are read lazily from CSV or NDJSON, grouped into fixed-size
+chunks, parsed into NumPy columns and screened with ``CatalogMatrix``.
+Every stage is a generator, so memory depends on the chunk size and the
+number of chunks in flight, never on the size of the input file.
+"""
+import csv
+import json
+from collections import deque
+from decimal import InvalidOperation
+from itertools import islice
+
+from rest_framework.exceptions import ValidationError
+
+from .batch import profile_columns
+from .index import MAX_HOUSEHOLD_SIZE, from_cents
+from .serializers import EligibilityInputSerializer
+
+PROFILE_FIELDS = ['age', 'annual_income', 'is_student', 'is_citizen', 'household_size', 'state']
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', ''}
+
+# The API's own field, so the digits, places and finiteness rules are the same
+INCOME_FIELD = EligibilityInputSerializer().fields['annual_income']
+
+
+class UnreadableRow:
+    """Stands in for an input line that could not be decoded"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def detect_format(path):
+    """Guess the file format from its extension"""
+    return 'csv' if str(path).lower().endswith('.csv') else 'ndjson'
+
+
+def read_profiles(stream, fmt):
+    """Yield raw profile dicts from a CSV or NDJSON text stream
+
+    An NDJSON line that is not valid JSON yields an ``UnreadableRow``,
+    which screens as an invalid row.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield UnreadableRow(f'line {line_number}: invalid JSON ({exc})')
+
+
+def chunked(iterable, size):
+    """Yield lists of up to ``size`` items from ``iterable``"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'invalid boolean {value!r}')
+
+
+def _parse_income(value):
+    try:
+        return INCOME_FIELD.run_validation(value)
+    except ValidationError as exc:
+        raise ValueError(f"annual_income: {' '.join(exc.detail)}")
+
+
+def parse_profile(raw):
+    """Validate one raw profile, mirroring ``EligibilityInputSerializer``"""
+    if isinstance(raw, UnreadableRow):
+        raise ValueError(raw.error)
+    profile = {
+        'age': int(raw['age']),
+        'annual_income': _parse_income(raw['annual_income']),
+        'is_student': _parse_bool(raw['is_student']),
+        'is_citizen': _parse_bool(raw['is_citizen']),
+        'household_size': int(raw['household_size']),
+        'state': str(raw['state']).strip(),
+    }
+    if not 16 <= profile['age'] <= 100:
+        raise ValueError('age must be between 16 and 100')
+    if not 1 <= profile['household_size'] <= MAX_HOUSEHOLD_SIZE:
+        raise ValueError(f'household_size must be between 1 and {MAX_HOUSEHOLD_SIZE}')
+    if not profile['state'] or len(profile['state']) > 50:
+        raise ValueError('state must be 1-50 characters')
+    return profile
+
+
+def screen_chunk(matrix, rows):
+    """Screen one chunk of raw rows.
+
+    Returns ``(profile, program_ids, total_cents, error)`` per row, in
+    order; invalid rows carry an error message and no result.
+    """
+    profiles = []
+    errors = []
+    for raw in rows:
+        try:
+            profiles.append(parse_profile(raw))
+            errors.append(None)
+        except (KeyError, TypeError, ValueError, InvalidOperation) as exc:
+            profiles.append(None)
+            errors.append(str(exc) if not isinstance(exc, KeyError) else f'missing field {exc}')
+
+    valid = [profile for profile in profiles if profile is not None]
+    columns = profile_columns(valid, matrix)
+    screened = matrix.screen_arrays(*columns, chunk_size=max(len(valid), 1))
+
+    results = []
+    for profile, error in zip(profiles, errors):
+        if profile is None:
+            results.append((None, [], 0, error))
+        else:
+            ids, total = next(screened)
+            results.append((profile, ids, total, None))
+    return results
+
+
+_worker_matrix = None
+
+
+def _init_worker(matrix):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+
+def _screen_in_worker(rows):
+    return screen_chunk(_worker_matrix, rows)
+
+
+def screen_stream(matrix, chunks, workers=1):
+    """Screen an iterable of row chunks, yielding result lists in order.
+
+    With ``workers > 1`` chunks are fanned out to a process pool, keeping
+    at most two chunks per worker in flight so memory stays bounded.
+    """
+    if workers <= 1:
+        for rows in chunks:
+            yield screen_chunk(matrix, rows)
+        return
+
+    from multiprocessing import Pool
+
+    with Pool(workers, initializer=_init_worker, initargs=(matrix,)) as pool:
+        pending = deque()
+        for rows in chunks:
+            pending.append(pool.apply_async(_screen_in_worker, (rows,)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+class ResultWriter:
+    """Write screening results as NDJSON or CSV"""
+
+    CSV_FIELDS = ['row', 'eligible_program_ids', 'total_potential_benefits', 'error']
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.writer(stream)
+            self.writer.writerow(self.CSV_FIELDS)
+
+    def write(self, row_number, program_ids, total_cents, error):
+        total = str(from_cents(total_cents)) if error is None else None
+        if self.fmt == 'csv':
+            self.writer.writerow([
+                row_number,
+                ' '.join(str(program_id) for program_id in program_ids),
+                total or '',
+                error or '',
+            ])
+            return
+        record = {
+            'row': row_number,
+            'eligible_program_ids': program_ids,
+            'total_potential_benefits': total,
+        }
+        if error is not None:
+            record['error'] = error
+        self.stream.write(json.dumps(record) + '\n')
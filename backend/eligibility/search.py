@@ -0,0 +1,267 @@
+"""
+Full-text search and faceted filtering over the active program catalog.
+
+On PostgreSQL, names (weight A) and descriptions (weight B) are matched
+with ``websearch_to_tsquery`` against a weighted ``tsvector`` expression
+that a GIN index covers (created after ``migrate``, see
+``create_search_index``) and ranked with ``ts_rank``. Other databases use
+``ProgramSearchIndex``, a process-local inverted index over the same two
+fields with tf-idf ranking, rebuilt when the catalog version changes.
+
+Facet counts for every facet come from one aggregate query. Each facet is
+counted with every filter applied except its own, so a client can widen a
+selection without losing the counts of the alternatives.
+"""
+import math
+import re
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, Q
+
+from .catalog import get_catalog_version
+from .models import GovernmentProgram
+
+SEARCH_CONFIG = 'english'
+SEARCH_INDEX_NAME = 'program_search_idx'
+
+# (label, lower bound, upper bound); benefit bounds are half-open, age bounds inclusive
+BENEFIT_RANGES = [
+    ('0-1000', 0, 1000),
+    ('1000-5000', 1000, 5000),
+    ('5000-10000', 5000, 10000),
+    ('10000-', 10000, None),
+]
+AGE_RANGES = [
+    ('16-17', 16, 17),
+    ('18-24', 18, 24),
+    ('25-64', 25, 64),
+    ('65-', 65, None),
+]
+FLAGS = ['requires_enrollment', 'requires_citizenship']
+
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the this to was were will with '
+    'you your'.split()
+)
+
+
+def uses_database_search(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == 'postgresql'
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return (SearchVector('name', config=SEARCH_CONFIG, weight='A')
+            + SearchVector('description', config=SEARCH_CONFIG, weight='B'))
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Create the GIN index over ``search_vector()`` on PostgreSQL, once"""
+    if not uses_database_search(using):
+        return
+    from django.contrib.postgres.indexes import GinIndex
+
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, GovernmentProgram._meta.db_table)
+    if SEARCH_INDEX_NAME in constraints:
+        return
+    # Built from the same expression the queries use, so the planner matches it
+    with connection.schema_editor() as editor:
+        editor.add_index(GovernmentProgram, GinIndex(search_vector(), name=SEARCH_INDEX_NAME))
+
+
+def stem(word):
+    """Fold plurals: ``grants`` -> ``grant``, ``subsidies`` -> ``subsidy``"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_RE.findall((text or '').lower()) if word not in STOP_WORDS]
+
+
+class ProgramSearchIndex:
+    """Inverted index of active program names and descriptions"""
+
+    def __init__(self, programs, version=None):
+        self.version = version
+        # term -> {program id: weighted term frequency}
+        self.postings = {}
+        count = 0
+        for program in programs:
+            count += 1
+            for weight, text in ((NAME_WEIGHT, program.name), (DESCRIPTION_WEIGHT, program.description)):
+                for term in tokenize(text):
+                    postings = self.postings.setdefault(term, {})
+                    postings[program.id] = postings.get(program.id, 0) + weight
+        self.size = count
+
+    @classmethod
+    def build(cls):
+        version = get_catalog_version()
+        # From the primary, like the version stamp it is labelled with
+        programs = (GovernmentProgram.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True)
+                    .only('id', 'name', 'description'))
+        return cls(programs.iterator(), version=version)
+
+    def search(self, text):
+        """``{program id: score}`` of the programs matching every term of ``text``"""
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not terms:
+            return {}
+        scores = None
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                return {}
+            idf = math.log(1 + self.size / len(postings))
+            if scores is None:
+                scores = {program_id: frequency * idf for program_id, frequency in postings.items()}
+            else:
+                scores = {
+                    program_id: score + postings[program_id] * idf
+                    for program_id, score in scores.items() if program_id in postings
+                }
+        return scores
+
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Return the inverted index for the current catalog version"""
+    global _search_index
+
+    version = get_catalog_version()
+    index = _search_index
+    if index is not None and index.version == version:
+        return index
+    with _search_index_lock:
+        index = _search_index
+        if index is None or index.version != version:
+            index = ProgramSearchIndex.build()
+            _search_index = index
+        return index
+
+
+def invalidate_search_index():
+    global _search_index
+    with _search_index_lock:
+        _search_index = None
+
+
+def _benefit_q(lower, upper):
+    q = Q(max_benefit_amount__gte=lower)
+    if upper is not None:
+        q &= Q(max_benefit_amount__lt=upper)
+    return q
+
+
+def _age_q(lower, upper):
+    """Programs open to some age between ``lower`` and ``upper``"""
+    q = Q(max_age__isnull=True) | Q(max_age__gte=lower)
+    if upper is not None:
+        q &= Q(min_age__isnull=True) | Q(min_age__lte=upper)
+    return q
+
+
+def filter_q(filters, exclude=None):
+    """Q for the validated ``filters``, leaving out the facet named ``exclude``"""
+    q = Q()
+    if filters.get('program_type') and exclude != 'program_type':
+        q &= Q(program_type__in=filters['program_type'])
+    if filters.get('benefit_range') and exclude != 'benefit_range':
+        q &= _benefit_q(*filters['benefit_range'])
+    if filters.get('age_range') and exclude != 'age_range':
+        q &= _age_q(*filters['age_range'])
+    for flag in FLAGS:
+        if filters.get(flag) is not None and exclude != flag:
+            q &= Q(**{flag: filters[flag]})
+    if filters.get('state'):
+        # Offered nationwide or listed in the comma-separated states
+        q &= Q(states='') | Q(states__iregex=rf'(^|,)\s*{re.escape(filters["state"])}\s*(,|$)')
+    return q
+
+
+def facet_counts(queryset, filters):
+    """``(total, facets)`` for ``queryset`` under ``filters``, in one query"""
+    aggregates = {'total': Count('id', filter=filter_q(filters))}
+    without_type = filter_q(filters, exclude='program_type')
+    for program_type, _ in GovernmentProgram.PROGRAM_TYPES:
+        aggregates[f'type_{program_type}'] = Count('id', filter=without_type & Q(program_type=program_type))
+    without_benefit = filter_q(filters, exclude='benefit_range')
+    for position, (_, lower, upper) in enumerate(BENEFIT_RANGES):
+        aggregates[f'benefit_{position}'] = Count('id', filter=without_benefit & _benefit_q(lower, upper))
+    without_age = filter_q(filters, exclude='age_range')
+    for position, (_, lower, upper) in enumerate(AGE_RANGES):
+        aggregates[f'age_{position}'] = Count('id', filter=without_age & _age_q(lower, upper))
+    for flag in FLAGS:
+        without_flag = filter_q(filters, exclude=flag)
+        aggregates[f'{flag}_true'] = Count('id', filter=without_flag & Q(**{flag: True}))
+        aggregates[f'{flag}_false'] = Count('id', filter=without_flag & Q(**{flag: False}))
+
+    counts = queryset.aggregate(**aggregates)
+    facets = {
+        'program_type': {
+            program_type: counts[f'type_{program_type}'] for program_type, _ in GovernmentProgram.PROGRAM_TYPES
+        },
+        'benefit_range': {
+            label: counts[f'benefit_{position}'] for position, (label, _, _) in enumerate(BENEFIT_RANGES)
+        },
+        'age_range': {label: counts[f'age_{position}'] for position, (label, _, _) in enumerate(AGE_RANGES)},
+    }
+    for flag in FLAGS:
+        facets[flag] = {'true': counts[f'{flag}_true'], 'false': counts[f'{flag}_false']}
+    return counts['total'], facets
+
+
+def search_programs(filters, offset, limit):
+    """Search the active catalog.
+
+    Returns ``(total, facets, programs)``: the number of matching programs,
+    the facet counts and the ``limit`` programs from ``offset`` on, best
+    match first (by id without a text query).
+    """
+    queryset = GovernmentProgram.objects.filter(is_active=True)
+    text = filters.get('q')
+    scores = query = None
+    if text:
+        if uses_database_search(queryset.db):
+            from django.contrib.postgres.search import SearchQuery, SearchVectorExact
+
+            query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+            # A lookup rather than an annotation, so the facet aggregate needs no subquery
+            queryset = queryset.filter(SearchVectorExact(search_vector(), query))
+        else:
+            scores = get_search_index().search(text)
+            queryset = queryset.filter(id__in=list(scores))
+
+    total, facets = facet_counts(queryset, filters)
+    matching = queryset.filter(filter_q(filters))
+    if not total or offset >= total:
+        return total, facets, []
+
+    if scores is not None:
+        # Rank in process; fetch only the page
+        ids = sorted(matching.values_list('id', flat=True), key=lambda pk: (-scores[pk], pk))[offset:offset + limit]
+        by_id = GovernmentProgram.objects.in_bulk(ids)
+        programs = [by_id[pk] for pk in ids if pk in by_id]
+    elif query is not None:
+        from django.contrib.postgres.search import SearchRank
+
+        programs = list(matching.annotate(rank=SearchRank(search_vector(), query)).order_by('-rank', 'id')
+                        [offset:offset + limit])
+    else:
+        programs = list(matching.order_by('id')[offset:offset + limit])
+    return total, facets, programs
@@ -1,20 +1,45 @@
+from django.conf import settings
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from government_benefits.serializers import ReadOnlySerializer, SparseFieldsetMixin
 from .models import GovernmentProgram, EligibilityCheck, ApplicationStatus
 
-class GovernmentProgramSerializer(serializers.ModelSerializer):
+class GovernmentProgramSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = GovernmentProgram
         fields = '__all__'
 
-class EligibilityCheckSerializer(serializers.ModelSerializer):
-    eligible_programs = GovernmentProgramSerializer(many=True, read_only=True)
+class EligibilityCheckSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    eligible_programs = serializers.SerializerMethodField()
     
     class Meta:
         model = EligibilityCheck
-        fields = ['id', 'age', 'annual_income', 'is_student', 'is_citizen', 
+        fields = ['id', 'uuid', 'age', 'annual_income', 'is_student', 'is_citizen', 
                  'household_size', 'state', 'eligible_programs', 
                  'total_potential_benefits', 'created_at']
-        read_only_fields = ['id', 'created_at', 'eligible_programs', 'total_potential_benefits']
+        read_only_fields = ['id', 'uuid', 'created_at', 'eligible_programs', 'total_potential_benefits']
+
+    def get_eligible_programs(self, obj):
+        # The views set evaluated_programs (fresh from the eligibility index,
+        # or bulk-loaded per page); a check used on its own looks them up.
+        programs = getattr(obj, 'evaluated_programs', None)
+        if programs is None:
+            programs = GovernmentProgram.objects.filter(id__in=obj.eligible_program_ids)
+        return GovernmentProgramSerializer(
+            programs, many=True, context=self.context,
+            fieldset_prefix=[*self.fieldset_path(), 'eligible_programs'],
+        ).data
+
+class EligibilityCheckCompactSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Eligibility check with program IDs in place of nested programs"""
+    eligible_program_ids = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+    
+    class Meta:
+        model = EligibilityCheck
+        fields = ['id', 'uuid', 'age', 'annual_income', 'is_student', 'is_citizen', 
+                 'household_size', 'state', 'eligible_program_ids', 
+                 'total_potential_benefits', 'created_at']
+        read_only_fields = fields
 
 class EligibilityInputSerializer(serializers.Serializer):
     """Serializer for eligibility check input"""
@@ -25,7 +50,79 @@ class EligibilityInputSerializer(serializers.Serializer):
     household_size = serializers.IntegerField(min_value=1, max_value=20)
     state = serializers.CharField(max_length=50)
 
-class ApplicationStatusSerializer(serializers.ModelSerializer):
+class EligibilityBatchInputSerializer(serializers.Serializer):
+    """Serializer for bulk eligibility screening input"""
+    profiles = EligibilityInputSerializer(many=True, allow_empty=False)
+
+    def validate_profiles(self, value):
+        limit = settings.ELIGIBILITY_BATCH_MAX_PROFILES
+        if len(value) > limit:
+            raise serializers.ValidationError(f'At most {limit} profiles can be screened per request')
+        return value
+
+class PolicyChangeSerializer(serializers.Serializer):
+    """Proposed criteria for one program; omitted fields keep their current value"""
+    program_id = serializers.IntegerField()
+    min_age = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    max_age = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    max_income = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0,
+                                          required=False, allow_null=True)
+    max_benefit_amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0,
+                                                  required=False, allow_null=True)
+    requires_enrollment = serializers.BooleanField(required=False)
+    requires_citizenship = serializers.BooleanField(required=False)
+    states = serializers.CharField(required=False, allow_blank=True, max_length=1000)
+    is_active = serializers.BooleanField(required=False)
+
+class PolicySimulationInputSerializer(serializers.Serializer):
+    """Serializer for policy simulation input"""
+    changes = PolicyChangeSerializer(many=True, allow_empty=False)
+
+    def validate_changes(self, value):
+        program_ids = [change['program_id'] for change in value]
+        if len(set(program_ids)) != len(program_ids):
+            raise serializers.ValidationError('Each program can only be changed once per simulation')
+        return value
+
+class ProgramSearchSerializer(serializers.Serializer):
+    """Query parameters of the program search"""
+    q = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    program_type = serializers.CharField(required=False, help_text='Comma-separated program types')
+    benefit_range = serializers.CharField(required=False, help_text='min-max maximum benefit, max optional')
+    age_range = serializers.CharField(required=False, help_text='min-max applicant age, max optional')
+    requires_enrollment = serializers.BooleanField(required=False, allow_null=True, default=None)
+    requires_citizenship = serializers.BooleanField(required=False, allow_null=True, default=None)
+    state = serializers.CharField(required=False, max_length=50)
+    page = serializers.IntegerField(required=False, min_value=1, default=1)
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=100,
+                                         default=settings.REST_FRAMEWORK.get('PAGE_SIZE', 20))
+
+    def validate_program_type(self, value):
+        types = [part.strip() for part in value.split(',') if part.strip()]
+        known = {program_type for program_type, _ in GovernmentProgram.PROGRAM_TYPES}
+        unknown = [program_type for program_type in types if program_type not in known]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown program type: {', '.join(unknown)}")
+        return types
+
+    def _range(self, value):
+        lower, separator, upper = value.partition('-')
+        try:
+            lower = int(lower)
+            upper = int(upper) if upper else None
+        except ValueError:
+            separator = ''
+        if not separator or lower < 0 or (upper is not None and upper < lower):
+            raise serializers.ValidationError('Expected a range like 1000-5000 or 10000-')
+        return lower, upper
+
+    def validate_benefit_range(self, value):
+        return self._range(value)
+
+    def validate_age_range(self, value):
+        return self._range(value)
+
+class ApplicationStatusSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     program = GovernmentProgramSerializer(read_only=True)
     program_id = serializers.IntegerField(write_only=True)
     
@@ -37,4 +134,68 @@ class ApplicationStatusSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+# Read-only fast paths with the output of the serializers above, for the
+# list and check responses
+
+class GovernmentProgramReadSerializer(ReadOnlySerializer):
+    """``GovernmentProgramSerializer`` output"""
+    class Meta:
+        # What fields = '__all__' gives GovernmentProgramSerializer
+        fields = [field.name for field in GovernmentProgram._meta.concrete_fields]
+        formats = {
+            'max_benefit_amount': serializers.DecimalField(max_digits=10, decimal_places=2),
+            'max_income': serializers.DecimalField(max_digits=10, decimal_places=2),
+            'created_at': serializers.DateTimeField(),
+            'updated_at': serializers.DateTimeField(),
+        }
+
+class EligibilityCheckReadSerializer(ReadOnlySerializer):
+    """``EligibilityCheckSerializer`` output"""
+    class Meta:
+        fields = EligibilityCheckSerializer.Meta.fields
+        formats = {
+            'uuid': serializers.UUIDField(),
+            'annual_income': serializers.DecimalField(max_digits=10, decimal_places=2),
+            'total_potential_benefits': serializers.DecimalField(max_digits=12, decimal_places=2),
+            'created_at': serializers.DateTimeField(),
+        }
+
+    @cached_property
+    def program_serializer(self):
+        return GovernmentProgramReadSerializer(
+            context=self.context, fieldset_prefix=[*self.fieldset_path(), 'eligible_programs']
+        )
+
+    def get_eligible_programs(self, obj):
+        # Callers attach the programs, bulk-loaded (see views.attach_programs)
+        return [self.program_serializer.to_representation(program) for program in obj.evaluated_programs]
+
+class EligibilityCheckCompactReadSerializer(ReadOnlySerializer):
+    """``EligibilityCheckCompactSerializer`` output"""
+    class Meta:
+        fields = EligibilityCheckCompactSerializer.Meta.fields
+        formats = EligibilityCheckReadSerializer.Meta.formats
+
+    def get_eligible_program_ids(self, obj):
+        return list(obj.eligible_program_ids)
+
+class ApplicationStatusReadSerializer(ReadOnlySerializer):
+    """``ApplicationStatusSerializer`` output"""
+    class Meta:
+        fields = [name for name in ApplicationStatusSerializer.Meta.fields if name != 'program_id']
+        formats = {
+            'application_date': serializers.DateTimeField(),
+            'created_at': serializers.DateTimeField(),
+            'updated_at': serializers.DateTimeField(),
+        }
+
+    @cached_property
+    def program_serializer(self):
+        return GovernmentProgramReadSerializer(
+            context=self.context, fieldset_prefix=[*self.fieldset_path(), 'program']
+        )
+
+    def get_program(self, obj):
+        return self.program_serializer.to_representation(obj.program)
@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import reevaluation, rollups
+from .catalog import bump_catalog_version
+from .index import invalidate_index
+from .memo import get_memo
+from .search import invalidate_search_index
+from .models import ApplicationStatus, EligibilityCheck, GovernmentProgram, ProgramIncomeLimit
+
+
+@receiver(post_save, sender=GovernmentProgram)
+@receiver(post_delete, sender=GovernmentProgram)
+def catalog_changed(sender, **kwargs):
+    """Publish a new catalog version and drop local compiled state once the change commits"""
+    rollups.refresh_program_counters()
+    # Published earlier, the new version could be read by a worker that then
+    # rebuilds from the old, still visible rows and keeps that index
+    transaction.on_commit(publish_catalog)
+
+
+def publish_catalog():
+    bump_catalog_version()
+    invalidate_index()
+    invalidate_search_index()
+    get_memo().clear()
+
+
+@receiver(post_save, sender=ProgramIncomeLimit)
+@receiver(post_delete, sender=ProgramIncomeLimit)
+def income_limit_changed(sender, instance, **kwargs):
+    """Touch the program so the catalog version (and everything keyed on it) moves"""
+    GovernmentProgram.objects.filter(pk=instance.program_id).update(updated_at=timezone.now())
+    catalog_changed(sender)
+
+
+@receiver(pre_save, sender=GovernmentProgram)
+@receiver(pre_save, sender=ProgramIncomeLimit)
+@receiver(pre_delete, sender=ProgramIncomeLimit)
+def remember_criteria(sender, instance, raw=False, **kwargs):
+    """Snapshot the program's criteria before they change, for re-evaluating stored checks"""
+    program_id = instance.pk if sender is GovernmentProgram else instance.program_id
+    if program_id is not None and not raw:
+        instance._previous_criteria = reevaluation.criteria_snapshot(program_id)
+
+
+@receiver(post_save, sender=GovernmentProgram)
+@receiver(post_save, sender=ProgramIncomeLimit)
+@receiver(post_delete, sender=ProgramIncomeLimit)
+def criteria_changed(sender, instance, **kwargs):
+    """Queue re-evaluation of the stored checks the change can affect"""
+    previous = instance.__dict__.pop('_previous_criteria', None)
+    if previous is None:
+        return
+    if sender is GovernmentProgram:
+        program_id = instance.pk
+        # Income limits are not touched by saving the program itself
+        if all(previous[field] == value for field, value in reevaluation.instance_criteria(instance).items()):
+            return
+    else:
+        program_id = instance.program_id
+    transaction.on_commit(lambda: reevaluation.enqueue(program_id, previous))
+
+
+@receiver(post_save, sender=EligibilityCheck)
+def check_saved(sender, instance, created, **kwargs):
+    if created:
+        delta = rollups.RollupDelta()
+        delta.add_check(instance, instance.eligible_program_ids)
+        delta.apply()
+
+
+@receiver(pre_delete, sender=EligibilityCheck)
+def check_deleted(sender, instance, **kwargs):
+    delta = rollups.RollupDelta()
+    delta.add_check(instance, instance.eligible_program_ids, sign=-1)
+    delta.apply()
+
+
+@receiver(post_save, sender=ApplicationStatus)
+def application_saved(sender, instance, created, **kwargs):
+    if created:
+        rollups.record_application(1)
+
+
+@receiver(post_delete, sender=ApplicationStatus)
+def application_deleted(sender, **kwargs):
+    rollups.record_application(-1)
@@ -0,0 +1,183 @@
+"""
+Policy impact simulation over stored eligibility checks.
+
+Proposed criteria for some programs are compared with their current
+criteria on the inputs of every stored ``EligibilityCheck``. Only the
+programs being changed are compiled, once as they are and once as
+proposed, each into a ``CatalogMatrix``. The checks are read in id order,
+``ELIGIBILITY_SIMULATION_CHUNK_SIZE`` rows per keyset-paginated query, and
+screened as NumPy columns, so memory depends on the chunk size and the
+number of changed programs, never on the number of checks.
+
+A check gains a program when it is eligible for it under the proposed
+criteria and not under the current ones, and loses it the other way
+round. Programs that are not changed are not affected, so benefit deltas
+only involve the changed programs.
+"""
+import copy
+
+import numpy as np
+from django.conf import settings
+
+from .batch import CHUNK_SIZE, CatalogMatrix
+from .index import EligibilityIndex, from_cents
+from .models import EligibilityCheck, ProgramIncomeLimit
+
+# Program fields a proposal may change
+SIMULATED_FIELDS = [
+    'min_age', 'max_age', 'max_income', 'requires_enrollment', 'requires_citizenship', 'states',
+    'max_benefit_amount', 'is_active',
+]
+
+CHECK_COLUMNS = ['id', 'age', 'annual_income', 'is_student', 'is_citizen', 'household_size', 'state']
+
+# Per-state totals, in this order
+CHECKS, GAINING, LOSING, BENEFIT_DELTA = range(4)
+
+
+def check_chunks(queryset, chunk_size):
+    """Yield lists of up to ``chunk_size`` ``CHECK_COLUMNS`` rows, in id order"""
+    rows = queryset.order_by('id').values_list(*CHECK_COLUMNS)
+    last_id = None
+    while True:
+        page = rows if last_id is None else rows.filter(id__gt=last_id)
+        chunk = list(page[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+def chunk_columns(chunk):
+    """NumPy columns for a chunk of ``CHECK_COLUMNS`` rows, plus the states as a list"""
+    _, age, income, is_student, is_citizen, household_size, states = zip(*chunk)
+    return (
+        np.array(age, dtype=np.int64),
+        # Ten digits with two decimals round-trip through a double exactly
+        np.rint(np.array(income, dtype=np.float64) * 100).astype(np.int64),
+        np.array(is_student, dtype=bool),
+        np.array(is_citizen, dtype=bool),
+        np.array(household_size, dtype=np.int64),
+        list(states),
+    )
+
+
+def proposed_programs(programs, changes):
+    """Unsaved copies of ``programs`` with ``changes`` ({program id: {field: value}}) applied"""
+    proposed = []
+    for program in programs:
+        program = copy.copy(program)
+        for field, value in changes.get(program.id, {}).items():
+            setattr(program, field, value)
+        proposed.append(program)
+    return proposed
+
+
+class PolicySimulation:
+    """Impact of proposed criteria, accumulated over chunks of checks"""
+
+    def __init__(self, programs, changes, income_limits=()):
+        self.programs = list(programs)
+        proposed = proposed_programs(self.programs, changes)
+        income_limits = list(income_limits)
+        self.current = CatalogMatrix(EligibilityIndex(self.programs, income_limits=income_limits))
+        self.proposed = CatalogMatrix(EligibilityIndex(proposed, income_limits=income_limits))
+        # Inactive programs match nobody
+        self.current_active = np.array([program.is_active for program in self.programs], dtype=bool)
+        self.proposed_active = np.array([program.is_active for program in proposed], dtype=bool)
+
+        count = len(self.programs)
+        self.currently_eligible = np.zeros(count, dtype=np.int64)
+        self.proposed_eligible = np.zeros(count, dtype=np.int64)
+        self.gained = np.zeros(count, dtype=np.int64)
+        self.lost = np.zeros(count, dtype=np.int64)
+        # Stored state, as spelled in the statistics -> [checks, checks gaining,
+        # checks losing, benefit delta in cents]
+        self.states = {}
+
+    def add(self, chunk):
+        """Screen a chunk of ``CHECK_COLUMNS`` rows under both criteria"""
+        age, income, is_student, is_citizen, household_size, states = chunk_columns(chunk)
+        current_codes = self.current.state_code_array(states)
+        proposed_codes = self.proposed.state_code_array(states)
+        names, state_rows = np.unique(states, return_inverse=True)
+        by_state = np.zeros((len(names), 4), dtype=np.int64)
+
+        # Bounded matrices however large the chunk read from the database
+        for start in range(0, len(age), CHUNK_SIZE):
+            part = slice(start, start + CHUNK_SIZE)
+            columns = (age[part], income[part], is_student[part], is_citizen[part], household_size[part])
+            current = self.current.matrix(*columns, current_codes[part]) & self.current_active
+            proposed = self.proposed.matrix(*columns, proposed_codes[part]) & self.proposed_active
+            gained = proposed & ~current
+            lost = current & ~proposed
+
+            self.currently_eligible += current.sum(axis=0)
+            self.proposed_eligible += proposed.sum(axis=0)
+            self.gained += gained.sum(axis=0)
+            self.lost += lost.sum(axis=0)
+
+            totals = np.empty((len(current), 4), dtype=np.int64)
+            totals[:, CHECKS] = 1
+            totals[:, GAINING] = gained.any(axis=1)
+            totals[:, LOSING] = lost.any(axis=1)
+            totals[:, BENEFIT_DELTA] = proposed @ self.proposed.benefit_cents - current @ self.current.benefit_cents
+            np.add.at(by_state, state_rows[part], totals)
+
+        for name, row in zip(names.tolist(), by_state.tolist()):
+            totals = self.states.setdefault(name, [0, 0, 0, 0])
+            for column, value in enumerate(row):
+                totals[column] += value
+
+    def result(self):
+        """JSON-ready totals, per-program and per-state breakdowns"""
+        totals = [sum(column) for column in zip(*self.states.values())] or [0, 0, 0, 0]
+        programs = []
+        for position, program in enumerate(self.programs):
+            currently_eligible = int(self.currently_eligible[position])
+            proposed_eligible = int(self.proposed_eligible[position])
+            benefit_delta = (proposed_eligible * int(self.proposed.benefit_cents[position])
+                             - currently_eligible * int(self.current.benefit_cents[position]))
+            programs.append({
+                'program_id': program.id,
+                'program_name': program.name,
+                'currently_eligible': currently_eligible,
+                'proposed_eligible': proposed_eligible,
+                'gained': int(self.gained[position]),
+                'lost': int(self.lost[position]),
+                'benefit_delta': str(from_cents(benefit_delta)),
+            })
+        return {
+            'checks': totals[CHECKS],
+            'checks_gaining': totals[GAINING],
+            'checks_losing': totals[LOSING],
+            'benefit_delta': str(from_cents(totals[BENEFIT_DELTA])),
+            'programs': programs,
+            # Only states where some check gains or loses a program
+            'states': {
+                name: {
+                    'checks': row[CHECKS],
+                    'checks_gaining': row[GAINING],
+                    'checks_losing': row[LOSING],
+                    'benefit_delta': str(from_cents(row[BENEFIT_DELTA])),
+                }
+                for name, row in sorted(self.states.items()) if row[GAINING] or row[LOSING]
+            },
+        }
+
+
+def simulate(programs, changes, checks=None, chunk_size=None):
+    """Simulate ``changes`` ({program id: {field: value}}) to ``programs`` over stored checks.
+
+    ``checks`` narrows the ``EligibilityCheck`` queryset scanned (all of
+    them by default).
+    """
+    programs = sorted(programs, key=lambda program: program.id)
+    income_limits = ProgramIncomeLimit.objects.filter(program_id__in=[program.id for program in programs])
+    simulation = PolicySimulation(programs, changes, income_limits)
+    if checks is None:
+        checks = EligibilityCheck.objects.all()
+    for chunk in check_chunks(checks, chunk_size or settings.ELIGIBILITY_SIMULATION_CHUNK_SIZE):
+        simulation.add(chunk)
+    return simulation.result()
@@ -0,0 +1,244 @@
+import io
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from government_benefits.renderers import FastJSONRenderer
+
+from users.models import User
+from . import rollups
+from .archive import archive_batch
+from .batch import CatalogMatrix
+from .index import EligibilityIndex
+from .models import (
+    ApplicationStatus,
+    DailyCheckRollup,
+    EligibilityCheck,
+    GovernmentProgram,
+    ProgramRollup,
+    ReevaluationJob,
+)
+from .reevaluation import claim, run_job
+from .screening import read_profiles, screen_chunk
+from .serializers import (
+    ApplicationStatusReadSerializer,
+    ApplicationStatusSerializer,
+    EligibilityCheckCompactReadSerializer,
+    EligibilityCheckCompactSerializer,
+    EligibilityCheckReadSerializer,
+    EligibilityCheckSerializer,
+    GovernmentProgramReadSerializer,
+    GovernmentProgramSerializer,
+)
+
+
+class HistoryQueryCountTests(TestCase):
+    """The history endpoint runs the same queries however large the page"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('history', password='history-password')
+        programs = GovernmentProgram.objects.bulk_create([
+            GovernmentProgram(name=f'Program {i}', program_type='financial', description='',
+                              max_benefit_amount=Decimal(100 * (i + 1)))
+            for i in range(12)
+        ])
+        EligibilityCheck.objects.bulk_create([
+            EligibilityCheck(
+                user=cls.user, age=20 + i % 50, annual_income=Decimal(1000 * i), is_student=i % 2 == 0,
+                is_citizen=True, household_size=1 + i % 5, state='CA', total_potential_benefits=Decimal(0),
+                eligible_program_ids=[program.id for program in programs[:i % len(programs) + 1]],
+            )
+            for i in range(60)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_history(self, page_size, compact):
+        query = f'?page_size={page_size}' + ('&compact=true' if compact else '')
+        response = self.client.get(f'/api/eligibility/history/{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), page_size)
+        return response
+
+    def assert_constant_queries(self, compact):
+        with CaptureQueriesContext(connection) as small:
+            self.get_history(5, compact)
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.get_history(50, compact)
+
+    def test_full_history(self):
+        self.assert_constant_queries(compact=False)
+
+    def test_compact_history(self):
+        self.assert_constant_queries(compact=True)
+        response = self.get_history(50, compact=True)
+        self.assertEqual(len(response.data['programs']), 12)
+
+
+@override_settings(ALLOWED_HOSTS=['a.example', 'b.example'])
+class CatalogCacheTests(TestCase):
+    """Cached program pages keep the links of the host they were rendered for"""
+
+    @classmethod
+    def setUpTestData(cls):
+        GovernmentProgram.objects.bulk_create([
+            GovernmentProgram(name=f'Program {i}', program_type='financial', description='')
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_links_per_host(self):
+        for host in ('a.example', 'b.example', 'a.example'):
+            response = self.client.get('/api/eligibility/programs/', HTTP_HOST=host)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(json.loads(response.content)['next'].startswith(f'http://{host}/'))
+
+
+class ArchiveStatisticsTests(TestCase):
+    """Archiving checks leaves the statistics, and their reconciliation, unchanged"""
+
+    def statistics(self):
+        return (
+            rollups.get_counter(rollups.TOTAL_CHECKS),
+            sorted(DailyCheckRollup.objects.values_list('day', 'state', 'check_count')),
+            sorted(ProgramRollup.objects.values_list('program_id', 'eligible_count')),
+        )
+
+    def test_archive_then_reconcile(self):
+        program = GovernmentProgram.objects.create(name='Program', program_type='financial', description='')
+        user = User.objects.create_user('archived', password='archived-password')
+        now = timezone.now()
+        for days_ago in (400, 400, 1):
+            EligibilityCheck.objects.create(
+                user=user, age=30, annual_income=Decimal(1000), is_student=False, is_citizen=True,
+                household_size=1, state='CA', total_potential_benefits=Decimal(0),
+                eligible_program_ids=[program.id], created_at=now - timedelta(days=days_ago),
+            )
+        rollups.reconcile()
+        before = self.statistics()
+        self.assertEqual(before[0], 3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(archive_batch(now - timedelta(days=30), directory, 10), 2)
+        self.assertEqual(EligibilityCheck.objects.count(), 1)
+        self.assertEqual(self.statistics(), before)
+        rollups.reconcile()
+        self.assertEqual(self.statistics(), before)
+
+
+class ReadSerializerTests(TestCase):
+    """The read-only serializers render what the ModelSerializers they mirror render"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('reader', password='reader-password')
+        cls.program = GovernmentProgram.objects.create(
+            name='Program', program_type='financial', description='Help', max_benefit_amount=Decimal('1200.50'),
+            min_age=18, max_income=Decimal('30000'), states='CA,OR',
+        )
+        cls.check = EligibilityCheck.objects.create(
+            user=user, age=30, annual_income=Decimal('25000.10'), is_student=False, is_citizen=True,
+            household_size=2, state='CA', total_potential_benefits=Decimal('1200.50'),
+            eligible_program_ids=[cls.program.id],
+        )
+        cls.status = ApplicationStatus.objects.create(user=user, program=cls.program, application_date=timezone.now())
+
+    def assert_same_output(self, model_serializer, read_serializer, instance):
+        self.assertEqual(
+            FastJSONRenderer().render(read_serializer(instance).data),
+            JSONRenderer().render(model_serializer(instance).data),
+        )
+
+    def test_program(self):
+        self.assert_same_output(GovernmentProgramSerializer, GovernmentProgramReadSerializer,
+                                GovernmentProgram.objects.get())
+
+    def test_check(self):
+        check = EligibilityCheck.objects.get()
+        check.evaluated_programs = [self.program]
+        self.assert_same_output(EligibilityCheckSerializer, EligibilityCheckReadSerializer, check)
+        self.assert_same_output(EligibilityCheckCompactSerializer, EligibilityCheckCompactReadSerializer, check)
+
+    def test_check_without_programs_attached(self):
+        data = EligibilityCheckSerializer(EligibilityCheck.objects.get()).data
+        self.assertEqual([program['id'] for program in data['eligible_programs']], [self.program.id])
+
+    def test_application_status(self):
+        self.assert_same_output(ApplicationStatusSerializer, ApplicationStatusReadSerializer,
+                                ApplicationStatus.objects.select_related('program').get())
+
+
+class ReevaluationQueueTests(TestCase):
+    """Every edit of a program's criteria gets its stored checks re-evaluated"""
+
+    def edit(self, program, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for field, value in changes.items():
+                setattr(program, field, value)
+            program.save()
+
+    def test_edit_and_revert(self):
+        program = GovernmentProgram.objects.create(
+            name='Program', program_type='financial', description='', max_benefit_amount=Decimal(100), max_age=65,
+        )
+        self.edit(program, max_age=30)
+        # Stored while the program was capped at 30
+        check = EligibilityCheck.objects.create(
+            user=User.objects.create_user('edits', password='edits-password'), age=50,
+            annual_income=Decimal(1000), is_student=False, is_citizen=True, household_size=1, state='CA',
+            total_potential_benefits=Decimal(0), eligible_program_ids=[],
+        )
+        self.edit(program, max_age=65)
+        self.assertEqual(ReevaluationJob.objects.filter(status='pending').count(), 2)
+
+        while (job := claim('test')) is not None:
+            run_job(job)
+        check.refresh_from_db()
+        self.assertEqual(check.eligible_program_ids, [program.id])
+        self.assertEqual(check.total_potential_benefits, Decimal(100))
+
+
+class ScreeningInputTests(SimpleTestCase):
+    """Bad rows in an applicant file become per-row errors"""
+
+    profile = {
+        'age': 30, 'annual_income': '25000.00', 'is_student': False, 'is_citizen': True,
+        'household_size': 2, 'state': 'CA',
+    }
+
+    def setUp(self):
+        program = GovernmentProgram(id=1, name='Program', program_type='financial', description='',
+                                    max_benefit_amount=Decimal(100))
+        self.matrix = CatalogMatrix(EligibilityIndex([program]))
+
+    def screen(self, lines):
+        rows = list(read_profiles(io.StringIO('\n'.join(lines)), 'ndjson'))
+        return [error for _, _, _, error in screen_chunk(self.matrix, rows)]
+
+    def test_malformed_line(self):
+        good = json.dumps(self.profile)
+        errors = self.screen([good, '{"age": 30,', '', good])
+        self.assertEqual(len(errors), 3)
+        self.assertIsNone(errors[0])
+        self.assertTrue(errors[1].startswith('line 2: invalid JSON'))
+        self.assertIsNone(errors[2])
+
+    def test_income_as_the_api_validates_it(self):
+        incomes = ['Infinity', 'NaN', '123456789012.555', '1.555', '-1', '12345678.99']
+        errors = self.screen([json.dumps({**self.profile, 'annual_income': income}) for income in incomes])
+        self.assertTrue(all(error.startswith('annual_income:') for error in errors[:-1]))
+        self.assertIsNone(errors[-1])
@@ -1,11 +1,29 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+if settings.ELIGIBILITY_ASYNC_VIEWS:
+    program_list = async_views.program_list
+    check_eligibility = async_views.check_eligibility
+    eligibility_history = async_views.get_eligibility_history
+    program_statistics = async_views.get_program_statistics
+else:
+    program_list = views.GovernmentProgramListView.as_view()
+    check_eligibility = views.check_eligibility
+    eligibility_history = views.get_eligibility_history
+    program_statistics = views.get_program_statistics
 
 urlpatterns = [
-    path('programs/', views.GovernmentProgramListView.as_view(), name='programs'),
-    path('check/', views.check_eligibility, name='check_eligibility'),
-    path('history/', views.get_eligibility_history, name='eligibility_history'),
+    path('programs/', program_list, name='programs'),
+    path('programs/search/', views.ProgramSearchView.as_view(), name='program_search'),
+    path('check/', check_eligibility, name='check_eligibility'),
+    path('check/batch/', views.check_eligibility_batch, name='check_eligibility_batch'),
+    path('what-if/', views.what_if, name='what_if'),
+    path('simulate/', views.simulate_policy, name='simulate_policy'),
+    path('checks/<uuid:check_uuid>/', views.get_eligibility_check, name='eligibility_check_detail'),
+    path('history/', eligibility_history, name='eligibility_history'),
     path('applications/', views.ApplicationStatusListCreateView.as_view(), name='applications'),
     path('applications/<int:pk>/', views.ApplicationStatusDetailView.as_view(), name='application_detail'),
-    path('statistics/', views.get_program_statistics, name='statistics'),
+    path('statistics/', program_statistics, name='statistics'),
+    path('statistics/memo/', views.get_memo_statistics, name='memo_statistics'),
 ]
\ No newline at end of file
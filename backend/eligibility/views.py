@@ -1,22 +1,115 @@
 from rest_framework import status, generics
+from rest_framework.exceptions import NotFound
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.conf import settings
+from django.db.models import Sum
 from django.utils import timezone
-from decimal import Decimal
-from .models import GovernmentProgram, EligibilityCheck, ApplicationStatus
+from datetime import timedelta
+from government_benefits.instrumentation import span
+from . import memo, rollups
+from .archive import recent_checks
+from .batch import screen_profiles
+from .caching import CatalogCacheMixin
+from .models import (
+    GovernmentProgram,
+    EligibilityCheck,
+    ApplicationStatus,
+    StatisticsCounter,
+    DailyCheckRollup,
+    ProgramRollup
+)
+from .pagination import KeysetPagination
+from .search import search_programs
+from .simulation import simulate
 from .serializers import (
-    GovernmentProgramSerializer, 
-    EligibilityCheckSerializer,
+    GovernmentProgramReadSerializer,
+    EligibilityCheckReadSerializer,
+    EligibilityCheckCompactReadSerializer,
     EligibilityInputSerializer,
-    ApplicationStatusSerializer
+    EligibilityBatchInputSerializer,
+    ApplicationStatusSerializer,
+    ApplicationStatusReadSerializer,
+    PolicySimulationInputSerializer,
+    ProgramSearchSerializer
 )
+from .whatif import breakpoints
+from .writebehind import get_check_writer
 
-class GovernmentProgramListView(generics.ListAPIView):
+class GovernmentProgramListView(CatalogCacheMixin, generics.ListAPIView):
     """List all active government programs"""
-    queryset = GovernmentProgram.objects.filter(is_active=True)
-    serializer_class = GovernmentProgramSerializer
+    queryset = GovernmentProgram.objects.filter(is_active=True).order_by('id')
+    serializer_class = GovernmentProgramReadSerializer
+    permission_classes = [AllowAny]
+
+class ProgramSearchView(CatalogCacheMixin, generics.ListAPIView):
+    """Search active programs by text with faceted filters, best match first"""
+    serializer_class = GovernmentProgramReadSerializer
     permission_classes = [AllowAny]
+    
+    def list(self, request, *args, **kwargs):
+        params = ProgramSearchSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        filters = params.validated_data
+        number, page_size = filters['page'], filters['page_size']
+        total, facets, programs = search_programs(filters, (number - 1) * page_size, page_size)
+        if number > 1 and not programs:
+            raise NotFound('Invalid page.')
+        
+        url = request.build_absolute_uri()
+        if number == 1:
+            previous_link = None
+        elif number == 2:
+            previous_link = remove_query_param(url, 'page')
+        else:
+            previous_link = replace_query_param(url, 'page', number - 1)
+        with span('serialize'):
+            results = self.get_serializer(programs, many=True).data
+        return Response({
+            'count': total,
+            'next': replace_query_param(url, 'page', number + 1) if number * page_size < total else None,
+            'previous': previous_link,
+            'facets': facets,
+            'results': results,
+        })
+
+def build_check(user, data, eligible_programs, total_benefits):
+    """An unsaved EligibilityCheck for validated input and its evaluation"""
+    eligibility_check = EligibilityCheck(
+        user=user,
+        age=data['age'],
+        annual_income=data['annual_income'],
+        is_student=data['is_student'],
+        is_citizen=data['is_citizen'],
+        household_size=data['household_size'],
+        state=data['state'],
+        total_potential_benefits=total_benefits
+    )
+    eligibility_check.eligible_program_ids = [program.id for program in eligible_programs]
+    eligibility_check.evaluated_programs = eligible_programs
+    return eligibility_check
+
+def persist_check(eligibility_check, eligible_programs):
+    if settings.ELIGIBILITY_WRITE_BEHIND:
+        # Respond now; the record is written in the next background batch
+        get_check_writer().submit(eligibility_check, eligible_programs)
+    else:
+        eligibility_check.save()
+        if settings.ELIGIBILITY_STORE_PROGRAM_LINKS:
+            eligibility_check.eligible_programs.set(eligible_programs)
+
+def check_response(request, eligibility_check, eligible_programs):
+    with span('serialize'):
+        result_data = EligibilityCheckReadSerializer(eligibility_check, context={'request': request}).data
+    
+    return Response({
+        'eligibility_check': result_data,
+        'message': f'Found {len(eligible_programs)} eligible programs'
+    }, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -29,75 +122,146 @@ def check_eligibility(request):
     
     data = serializer.validated_data
     
-    # Get all active programs
-    programs = GovernmentProgram.objects.filter(is_active=True)
-    eligible_programs = []
-    total_benefits = Decimal('0.00')
-    
-    # Check eligibility for each program
-    for program in programs:
-        is_eligible = True
-        
-        # Age check
-        if program.min_age and data['age'] < program.min_age:
-            is_eligible = False
-        if program.max_age and data['age'] > program.max_age:
-            is_eligible = False
-            
-        # Income check
-        if program.max_income and data['annual_income'] > program.max_income:
-            is_eligible = False
-            
-        # Student enrollment check
-        if program.requires_enrollment and not data['is_student']:
-            is_eligible = False
-            
-        # Citizenship check
-        if program.requires_citizenship and not data['is_citizen']:
-            is_eligible = False
-        
-        if is_eligible:
-            eligible_programs.append(program)
-            if program.max_benefit_amount:
-                total_benefits += program.max_benefit_amount
+    # Evaluate against the compiled catalog index, reusing memoized results
+    with span('rules'):
+        eligible_programs, total_benefits = memo.evaluate(data)
     
     # Create eligibility check record
-    eligibility_check = EligibilityCheck.objects.create(
-        user=request.user,
-        age=data['age'],
-        annual_income=data['annual_income'],
-        is_student=data['is_student'],
-        is_citizen=data['is_citizen'],
-        household_size=data['household_size'],
-        state=data['state'],
-        total_potential_benefits=total_benefits
-    )
-    
-    eligibility_check.eligible_programs.set(eligible_programs)
+    eligibility_check = build_check(request.user, data, eligible_programs, total_benefits)
+    with span('persist'):
+        persist_check(eligibility_check, eligible_programs)
     
     # Serialize and return results
-    result_serializer = EligibilityCheckSerializer(eligibility_check)
+    return check_response(request, eligibility_check, eligible_programs)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def check_eligibility_batch(request):
+    """Screen many applicant profiles against the catalog in one request"""
+    serializer = EligibilityBatchInputSerializer(data=request.data)
+    
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    with span('rules'):
+        results = screen_profiles(serializer.validated_data['profiles'])
+    for result in results:
+        result['total_potential_benefits'] = str(result['total_potential_benefits'])
     
     return Response({
-        'eligibility_check': result_serializer.data,
-        'message': f'Found {len(eligible_programs)} eligible programs'
+        'results': results,
+        'message': f'Screened {len(results)} profiles'
     }, status=status.HTTP_200_OK)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def what_if(request):
+    """Eligibility breakpoints along income and age around a profile"""
+    serializer = EligibilityInputSerializer(data=request.data)
+    
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    with span('rules'):
+        result = breakpoints(serializer.validated_data)
+    return Response(result, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def simulate_policy(request):
+    """Count the stored checks that would gain or lose programs under proposed criteria"""
+    serializer = PolicySimulationInputSerializer(data=request.data)
+    
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    changes = {change.pop('program_id'): change for change in serializer.validated_data['changes']}
+    programs = GovernmentProgram.objects.in_bulk(list(changes))
+    unknown = sorted(set(changes) - set(programs))
+    if unknown:
+        return Response({'changes': [f'Unknown program: {program_id}' for program_id in unknown]},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    with span('rules'):
+        result = simulate(programs.values(), changes)
+    return Response(result, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_eligibility_check(request, check_uuid):
+    """Get a single eligibility check, including one still being written"""
+    eligibility_check = EligibilityCheck.objects.filter(user=request.user, uuid=check_uuid).first()
+    
+    if eligibility_check is None and settings.ELIGIBILITY_WRITE_BEHIND:
+        pending = get_check_writer().get_pending(check_uuid)
+        if pending is not None and pending[0].user_id == request.user.id:
+            eligibility_check, eligibility_check.evaluated_programs = pending
+    
+    if eligibility_check is None:
+        return Response({'error': 'Eligibility check not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if not hasattr(eligibility_check, 'evaluated_programs'):
+        programs = GovernmentProgram.objects.in_bulk(eligibility_check.eligible_program_ids)
+        attach_programs([eligibility_check], programs)
+    return Response(EligibilityCheckReadSerializer(eligibility_check, context={'request': request}).data)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_eligibility_history(request):
-    """Get user's eligibility check history"""
-    checks = EligibilityCheck.objects.filter(user=request.user).order_by('-created_at')
-    serializer = EligibilityCheckSerializer(checks, many=True)
-    return Response(serializer.data)
+    """Get user's eligibility check history, newest first, one page at a time
+    
+    Pass ``compact=true`` to get program IDs per check plus a single
+    ``programs`` dictionary instead of nesting every program in every check.
+    Checks past the retention window are left out.
+    """
+    checks = recent_checks(EligibilityCheck.objects.filter(user=request.user))
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(checks, request)
+    
+    # One query for every distinct program referenced on this page
+    programs = GovernmentProgram.objects.in_bulk(history_program_ids(page))
+    return history_response(request, paginator, page, programs)
+
+def history_program_ids(page):
+    return {program_id for check in page for program_id in check.eligible_program_ids}
+
+def attach_programs(checks, programs):
+    """Set ``evaluated_programs`` on each check from ``programs`` ({id: program}), as serializers expect"""
+    for check in checks:
+        check.evaluated_programs = [
+            programs[program_id] for program_id in check.eligible_program_ids if program_id in programs
+        ]
+
+def history_response(request, paginator, page, programs):
+    context = {'request': request}
+    if request.query_params.get('compact', '').lower() in ('1', 'true', 'yes'):
+        with span('serialize'):
+            check_data = EligibilityCheckCompactReadSerializer(page, many=True, context=context).data
+            program_data = GovernmentProgramReadSerializer(
+                programs.values(), many=True, context=context, fieldset_prefix=['programs']
+            ).data
+        return paginator.get_paginated_response(
+            check_data,
+            programs=dict(zip(programs, program_data)),
+        )
+    
+    attach_programs(page, programs)
+    with span('serialize'):
+        check_data = EligibilityCheckReadSerializer(page, many=True, context=context).data
+    return paginator.get_paginated_response(check_data)
 
 class ApplicationStatusListCreateView(generics.ListCreateAPIView):
     """List and create application status records"""
     serializer_class = ApplicationStatusSerializer
     permission_classes = [IsAuthenticated]
     
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return ApplicationStatusReadSerializer
+        return ApplicationStatusSerializer
+    
     def get_queryset(self):
-        return ApplicationStatus.objects.filter(user=self.request.user)
+        return ApplicationStatus.objects.filter(user=self.request.user).select_related('program').order_by('id')
 
 class ApplicationStatusDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete application status"""
@@ -105,25 +269,70 @@ class ApplicationStatusDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return ApplicationStatus.objects.filter(user=self.request.user)
+        return ApplicationStatus.objects.filter(user=self.request.user).select_related('program').order_by('id')
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def get_program_statistics(request):
-    """Get statistics about programs and applications"""
-    total_programs = GovernmentProgram.objects.filter(is_active=True).count()
-    total_checks = EligibilityCheck.objects.count()
-    total_applications = ApplicationStatus.objects.count()
+def statistics_queries(request):
+    """The independent queries behind the statistics endpoint, as callables"""
+    try:
+        days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+    except ValueError:
+        days = 30
+    since = timezone.localdate() - timedelta(days=days - 1)
+    
+    return [
+        lambda: dict(StatisticsCounter.objects.values_list('name', 'value')),
+        lambda: dict(
+            DailyCheckRollup.objects.values_list('state')
+            .annotate(total=Sum('check_count')).order_by('state')
+        ),
+        lambda: {
+            day.isoformat(): total
+            for day, total in DailyCheckRollup.objects.filter(day__gte=since)
+            .values_list('day').annotate(total=Sum('check_count')).order_by('day')
+        },
+        lambda: list(
+            ProgramRollup.objects.filter(eligible_count__gt=0)
+            .values_list('program_id', 'program__name', 'eligible_count').order_by('program_id')
+        ),
+    ]
+
+def statistics_response(counters, checks_per_state, checks_per_day, program_counts):
+    total_checks = counters.get(rollups.TOTAL_CHECKS, 0)
     
     # Program type distribution
-    program_types = GovernmentProgram.objects.filter(is_active=True).values_list('program_type', flat=True)
     type_counts = {}
-    for ptype in program_types:
-        type_counts[ptype] = type_counts.get(ptype, 0) + 1
+    for name, value in counters.items():
+        if name.startswith(rollups.PROGRAM_TYPE_PREFIX) and value:
+            type_counts[name[len(rollups.PROGRAM_TYPE_PREFIX):]] = value
+    
+    eligible_rates = [
+        {
+            'program_id': program_id,
+            'program_name': name,
+            'eligible_checks': eligible,
+            'eligible_rate': round(eligible / total_checks, 4) if total_checks else 0.0,
+        }
+        for program_id, name, eligible in program_counts
+    ]
     
     return Response({
-        'total_programs': total_programs,
+        'total_programs': counters.get(rollups.ACTIVE_PROGRAMS, 0),
         'total_eligibility_checks': total_checks,
-        'total_applications': total_applications,
-        'program_type_distribution': type_counts
-    })
\ No newline at end of file
+        'total_applications': counters.get(rollups.TOTAL_APPLICATIONS, 0),
+        'program_type_distribution': type_counts,
+        'checks_per_state': checks_per_state,
+        'checks_per_day': checks_per_day,
+        'eligible_rate_per_program': eligible_rates
+    })
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_program_statistics(request):
+    """Get statistics about programs and applications from the rollup tables"""
+    return statistics_response(*[query() for query in statistics_queries(request)])
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_memo_statistics(request):
+    """Get this worker's eligibility memoization counters"""
+    return Response(memo.get_memo().stats())
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+What-if analysis: where eligibility changes along income and along age.
+
+For a profile, every criterion but one is held fixed and the other is
+swept over its whole range with ``EligibilityIndex.sweep``: one merged
+pass over the presorted income (or age) thresholds, so the cost grows
+with the number of distinct limits, not with the number of incomes or
+ages tried. Each interval carries its eligible programs, their benefit
+total and what changed at its start.
+"""
+from .index import from_cents, get_index, iter_bits, to_cents
+
+# The ages EligibilityInputSerializer accepts
+MIN_AGE = 16
+MAX_AGE = 100
+
+
+def _ids(index, mask):
+    return [index.program_ids[position] for position in iter_bits(mask)]
+
+
+def _describe(index, intervals, value, label):
+    """JSON-ready intervals, the one holding ``value`` and where it ends"""
+    rows = []
+    current = None
+    previous = None
+    for position, (start, end, mask) in enumerate(intervals):
+        row = {
+            'min': label(start),
+            'max': label(end) if end is not None else None,
+            'eligible_program_ids': _ids(index, mask),
+            'total_potential_benefits': str(from_cents(index.total_cents(mask))),
+        }
+        if previous is not None:
+            row['gained_program_ids'] = _ids(index, mask & ~previous)
+            row['lost_program_ids'] = _ids(index, previous & ~mask)
+        if start <= value and (end is None or value <= end):
+            current = position
+        rows.append(row)
+        previous = mask
+    return {
+        'current_interval': current,
+        # The next value at which the eligible set changes, if any
+        'next_breakpoint': rows[current + 1]['min'] if current is not None and current + 1 < len(rows) else None,
+        'intervals': rows,
+    }
+
+
+def breakpoints(data, index=None):
+    """Income and age breakpoints for validated ``EligibilityInputSerializer`` data"""
+    index = index or get_index()
+    age = data['age']
+    income_cents = to_cents(data['annual_income'])
+    flags = index.flag_mask(data['is_student'], data['is_citizen'], data['state'])
+    income_indexes = index.income_indexes(data['household_size'], data['state'])
+
+    # Along income at this age, and along age at this income
+    income_base = flags & index.min_age.match(age) & index.max_age.match(age)
+    income = index.sweep(income_base, income_indexes, 0)
+    age_base = flags
+    for threshold_index in income_indexes:
+        age_base &= threshold_index.match(income_cents)
+    ages = index.sweep(age_base, [index.min_age, index.max_age], MIN_AGE, MAX_AGE)
+
+    current = index.match(age, income_cents, data['is_student'], data['is_citizen'],
+                          data['household_size'], data['state'])
+    seen = current
+    for _, _, mask in income + ages:
+        seen |= mask
+    return {
+        'eligible_program_ids': _ids(index, current),
+        'total_potential_benefits': str(from_cents(index.total_cents(current))),
+        'income': _describe(index, income, income_cents, lambda cents: str(from_cents(cents))),
+        'age': _describe(index, ages, age, int),
+        'programs': {
+            str(index.program_ids[position]): index.programs[position].name for position in iter_bits(seen)
+        },
+    }
@@ -0,0 +1,213 @@
+"""
+Write-behind persistence for eligibility checks.
+
+When ``ELIGIBILITY_WRITE_BEHIND`` is on, ``check_eligibility`` answers
+straight from the eligibility index and hands the unsaved check to a
+bounded in-process queue. A background thread drains the queue with
+``bulk_create`` on ``EligibilityCheck`` (and its program through table
+when ``ELIGIBILITY_STORE_PROGRAM_LINKS`` is on), whenever a batch fills up or the flush interval elapses.
+
+Checks are identified by their ``uuid``, which is assigned before the row
+exists, so a returned check can be resolved while it is still pending.
+When the queue is full, producers wait up to the put timeout and then
+write synchronously, which slows requests down instead of dropping
+records. Pending checks are flushed at interpreter exit.
+
+A batch that fails to insert is retried with backoff, then written row by
+row; rows that still fail are logged as JSON to the
+``eligibility.writebehind.dead_letter`` logger so they can be replayed.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import rollups
+from .models import EligibilityCheck
+
+logger = logging.getLogger(__name__)
+dead_letter_logger = logging.getLogger(f'{__name__}.dead_letter')
+
+_STOP = object()
+
+# Attempts at writing a whole batch, and the delay before the first retry
+# (doubled for each further one), before falling back to single rows
+WRITE_ATTEMPTS = 3
+RETRY_DELAY = 0.5
+
+DEAD_LETTER_FIELDS = [
+    'uuid', 'user_id', 'age', 'annual_income', 'is_student', 'is_citizen', 'household_size', 'state',
+    'total_potential_benefits', 'created_at',
+]
+
+
+def dead_letter(check, program_ids):
+    """Log a check that could not be written, with everything needed to insert it later"""
+    record = {field: getattr(check, field) for field in DEAD_LETTER_FIELDS}
+    record['eligible_program_ids'] = list(program_ids)
+    dead_letter_logger.error(json.dumps(record, default=str))
+
+
+class CheckWriter:
+    """Bounded queue of unsaved checks plus the thread that flushes it"""
+
+    def __init__(self, max_pending, batch_size, flush_interval, put_timeout):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # Guards ``closed`` and counts the puts in progress, so close() only
+        # queues its stop marker once no submit can put anything after it
+        self.state = threading.Condition()
+        self.submitting = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name='eligibility-write-behind', daemon=True)
+        self.thread.start()
+
+    def submit(self, check, programs):
+        """Queue an unsaved check and its eligible programs for writing"""
+        program_ids = [program.id for program in programs]
+        check.eligible_program_ids = program_ids
+        with self.pending_lock:
+            self.pending[check.uuid] = (check, programs)
+        with self.state:
+            accepting = not self.closed
+            if accepting:
+                self.submitting += 1
+        if accepting:
+            try:
+                self.queue.put((check, program_ids), timeout=self.put_timeout)
+                return
+            except queue.Full:
+                pass
+            finally:
+                with self.state:
+                    self.submitting -= 1
+                    self.state.notify_all()
+        # Backpressure (or shutting down): pay for this write now.
+        self.flush([(check, program_ids)])
+
+    def get_pending(self, check_uuid):
+        """Return ``(check, programs)`` for a check not yet written, or None"""
+        with self.pending_lock:
+            return self.pending.get(check_uuid)
+
+    def run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            if stop:
+                # Nothing is put after the marker, but leave nothing behind
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+            for start in range(0, len(batch), self.batch_size):
+                self.flush(batch[start:start + self.batch_size])
+            if stop:
+                return
+
+    def flush(self, batch):
+        """Write a batch, retrying it and then its rows one by one; never raises"""
+        try:
+            for attempt in range(WRITE_ATTEMPTS):
+                try:
+                    self.write(batch)
+                    return
+                except Exception:
+                    logger.exception('Failed to write %d eligibility checks (attempt %d of %d)',
+                                     len(batch), attempt + 1, WRITE_ATTEMPTS)
+                if attempt + 1 < WRITE_ATTEMPTS:
+                    time.sleep(RETRY_DELAY * 2 ** attempt)
+            for check, program_ids in batch:
+                try:
+                    self.write([(check, program_ids)])
+                except Exception:
+                    logger.exception('Failed to write eligibility check %s', check.uuid)
+                    dead_letter(check, program_ids)
+        finally:
+            with self.pending_lock:
+                for check, _ in batch:
+                    self.pending.pop(check.uuid, None)
+
+    def write(self, batch):
+        """Insert a batch of checks and their program links"""
+        Through = EligibilityCheck.eligible_programs.through
+        with self.flush_lock:
+            close_old_connections()
+            checks = [check for check, _ in batch]
+            # A failed attempt may have assigned ids that were rolled back
+            for check in checks:
+                check.pk = None
+            with transaction.atomic():
+                EligibilityCheck.objects.bulk_create(checks)
+                if settings.ELIGIBILITY_STORE_PROGRAM_LINKS and any(check.pk is None for check in checks):
+                    ids = dict(
+                        EligibilityCheck.objects
+                        .filter(uuid__in=[check.uuid for check in checks])
+                        .values_list('uuid', 'id')
+                    )
+                    for check in checks:
+                        check.pk = ids[check.uuid]
+                if settings.ELIGIBILITY_STORE_PROGRAM_LINKS:
+                    Through.objects.bulk_create([
+                        Through(eligibilitycheck_id=check.pk, governmentprogram_id=program_id)
+                        for check, program_ids in batch
+                        for program_id in program_ids
+                    ])
+                rollups.record_checks(checks, [program_ids for _, program_ids in batch])
+
+    def close(self):
+        """Stop accepting work and flush everything still queued"""
+        with self.state:
+            if self.closed:
+                return
+            self.closed = True
+            self.state.wait_for(lambda: self.submitting == 0)
+        self.queue.put(_STOP)
+        self.thread.join()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_check_writer():
+    """Return this process's write-behind writer, starting it on first use"""
+    global _writer
+
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = CheckWriter(
+                    max_pending=settings.ELIGIBILITY_WRITE_BEHIND_MAX_PENDING,
+                    batch_size=settings.ELIGIBILITY_WRITE_BEHIND_BATCH_SIZE,
+                    flush_interval=settings.ELIGIBILITY_WRITE_BEHIND_FLUSH_INTERVAL,
+                    put_timeout=settings.ELIGIBILITY_WRITE_BEHIND_PUT_TIMEOUT,
+                )
+                atexit.register(_writer.close)
+    return _writer
@@ -0,0 +1,148 @@
+"""
+Async API views for the ASGI deployment.
+
+DRF 3.14 only runs views synchronously, so under ASGI each DRF request
+occupies a thread for its whole duration. ``async_api_view`` turns an
+``async def`` view into a Django async view that does what those views
+need from DRF: it wraps the request in a DRF ``Request`` for parsing,
+authenticates it (bearer tokens, then the session with its CSRF check),
+applies the permission classes, answers ``OPTIONS`` with the view's
+metadata, converts ``APIException`` into the usual error responses and
+renders the returned ``Response`` data as JSON, with an ``Allow`` header.
+
+Async views await the ORM, which Django runs in a thread per request.
+``gather_queries`` runs independent read queries at the same time, each on
+a thread of a small pool with its own database connection, kept or closed
+around each query as request threads do (``CONN_MAX_AGE``, health checks).
+Those connections do not see the caller's uncommitted transaction, so
+only use it for reads in autocommit mode, as ASGI requests are.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView, exception_handler
+
+from users.authentication import KEYWORD, SignedTokenAuthentication
+from .renderers import FastJSONRenderer
+
+_query_pool = None
+
+
+def _get_query_pool():
+    global _query_pool
+    if _query_pool is None:
+        _query_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ASYNC_QUERY_THREADS', 8), thread_name_prefix='async-query'
+        )
+    return _query_pool
+
+
+def _run_query(func):
+    # Pool threads keep their connection between queries (there are at most
+    # ASYNC_QUERY_THREADS of them) unless it is too old or broken, which
+    # request_started/request_finished would check on a request thread
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def gather_queries(*funcs):
+    """Run independent read-only callables concurrently and return their results in order"""
+    loop = asyncio.get_running_loop()
+    pool = _get_query_pool()
+    # Each query runs in a copy of this context, so it is attributed to the request
+    return await asyncio.gather(*(
+        loop.run_in_executor(pool, contextvars.copy_context().run, _run_query, func) for func in funcs
+    ))
+
+
+async def authenticate(request):
+    """``(user, auth)`` for a request, from its bearer token or else its session"""
+    authenticated = await SignedTokenAuthentication().aauthenticate(request)
+    if authenticated is not None:
+        return authenticated
+
+    user = await sync_to_async(get_user)(request._request)
+    if not user.is_active:
+        return AnonymousUser(), None
+    if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+        SessionAuthentication().enforce_csrf(request)
+    return user, None
+
+
+def _render(data, status_code, headers=()):
+    response = HttpResponse(
+        FastJSONRenderer().render(data), status=status_code, content_type='application/json'
+    )
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+def _metadata_view(view):
+    """An ``APIView`` standing in for ``view`` in the ``OPTIONS`` metadata, as ``@api_view`` builds"""
+    return type(view.__name__, (APIView,), {
+        '__doc__': view.__doc__,
+        'renderer_classes': [FastJSONRenderer],
+        'parser_classes': api_settings.DEFAULT_PARSER_CLASSES,
+    })()
+
+
+def async_api_view(methods, permission_classes):
+    """Decorate an ``async def view(request, ...)`` returning a DRF ``Response``"""
+    allowed = [method.upper() for method in methods]
+    if 'OPTIONS' not in allowed:
+        allowed.append('OPTIONS')
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(django_request, *args, **kwargs):
+            request = Request(
+                django_request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]
+            )
+            try:
+                if request.method not in allowed:
+                    raise exceptions.MethodNotAllowed(request.method)
+                request.user, request.auth = await authenticate(request)
+                for permission in permission_classes:
+                    if not permission().has_permission(request, None):
+                        if request.user.is_authenticated:
+                            raise exceptions.PermissionDenied()
+                        raise exceptions.NotAuthenticated()
+                if request.method == 'OPTIONS' and 'OPTIONS' not in methods:
+                    metadata = api_settings.DEFAULT_METADATA_CLASS()
+                    response = Response(metadata.determine_metadata(request, _metadata_view(view)))
+                else:
+                    response = await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    # As APIView does with SignedTokenAuthentication listed first
+                    exc.auth_header = KEYWORD
+                response = exception_handler(exc, {})
+            # As APIView sends on every response
+            response['Allow'] = ', '.join(allowed)
+            if not hasattr(response, 'data'):
+                # Already a plain Django response (a 304, cached bytes)
+                return response
+            headers = [(name, value) for name, value in response.items() if name.lower() != 'content-type']
+            return _render(response.data, response.status_code, headers)
+        # CSRF is checked above for session requests only, as DRF does.
+        # (csrf_exempt itself returns a sync wrapper before Django 5.0.)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
@@ -0,0 +1,246 @@
+"""
+Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` times every request and, through a database
+execute wrapper, counts its queries and their time. Code on the hot path
+marks its own phases with ``span``::
+
+    with instrumentation.span('rules'):
+        programs, total = memo.evaluate(data)
+
+The breakdown is returned in a ``Server-Timing`` header and accumulated
+per URL name into Prometheus histograms and counters, served as text by
+``metrics_view`` at ``/metrics``. The figures are per process, like the
+memo statistics; scrape every worker.
+
+Queries are attributed through a wrapper on every database connection
+that reports to the current request's recorder, so the queries an async
+view runs in other threads are counted too. The middleware itself runs
+natively under both WSGI and ASGI.
+
+With ``INSTRUMENTATION_ENABLED`` off the middleware removes itself at
+startup and ``span`` returns a shared no-op context manager.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_recorder = ContextVar('instrumentation_recorder', default=None)
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'started')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.add_span(self.name, time.perf_counter_ns() - self.started)
+
+
+class Recorder:
+    """Timings collected for one request"""
+    __slots__ = ('lock', 'spans', 'db_queries', 'db_ns')
+
+    def __init__(self):
+        # Queries and spans of an async view can finish on several threads
+        self.lock = threading.Lock()
+        self.spans = {}
+        self.db_queries = 0
+        self.db_ns = 0
+
+    def add_span(self, name, elapsed_ns):
+        with self.lock:
+            self.spans[name] = self.spans.get(name, 0) + elapsed_ns
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        started = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter_ns() - started
+            with self.lock:
+                self.db_ns += elapsed
+                self.db_queries += 1
+
+
+def span(name):
+    """Time a block as ``name`` in the current request's breakdown"""
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NO_SPAN
+    return _Span(recorder, name)
+
+
+def _record_query(execute, sql, params, many, context):
+    # Execute wrapper installed on every connection
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def _install_query_recorder(sender=None, connection=None, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Process-wide request metrics keyed by URL name"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.requests = {}
+        self.db_queries = {}
+        self.db_seconds = {}
+        self.span_seconds = {}
+
+    def record(self, view, method, status_code, seconds, recorder):
+        with self.lock, recorder.lock:
+            histogram = self.latency.get(view)
+            if histogram is None:
+                histogram = self.latency[view] = Histogram()
+            histogram.observe(seconds)
+            key = (view, method, str(status_code))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.db_queries[view] = self.db_queries.get(view, 0) + recorder.db_queries
+            self.db_seconds[view] = self.db_seconds.get(view, 0.0) + recorder.db_ns / 1e9
+            for name, elapsed in recorder.spans.items():
+                key = (view, name)
+                self.span_seconds[key] = self.span_seconds.get(key, 0.0) + elapsed / 1e9
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = [
+            '# HELP http_request_duration_seconds Request wall time by URL name.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        with self.lock:
+            for view, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'http_request_duration_seconds_bucket{{view="{view}",le="{le}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{view="{view}"}} {histogram.total}')
+                lines.append(f'http_request_duration_seconds_count{{view="{view}"}} {histogram.count}')
+
+            lines += ['# HELP http_requests_total Requests by URL name, method and status.',
+                      '# TYPE http_requests_total counter']
+            for (view, method, status_code), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{view="{view}",method="{method}",status="{status_code}"}} {count}')
+
+            lines += ['# HELP http_request_db_queries_total Database queries by URL name.',
+                      '# TYPE http_request_db_queries_total counter']
+            for view, count in sorted(self.db_queries.items()):
+                lines.append(f'http_request_db_queries_total{{view="{view}"}} {count}')
+
+            lines += ['# HELP http_request_db_seconds_total Database time by URL name.',
+                      '# TYPE http_request_db_seconds_total counter']
+            for view, seconds in sorted(self.db_seconds.items()):
+                lines.append(f'http_request_db_seconds_total{{view="{view}"}} {seconds}')
+
+            lines += ['# HELP http_request_span_seconds_total Time in instrumented spans by URL name.',
+                      '# TYPE http_request_span_seconds_total counter']
+            for (view, name), seconds in sorted(self.span_seconds.items()):
+                lines.append(f'http_request_span_seconds_total{{view="{view}",span="{name}"}} {seconds}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def server_timing(total_ns, recorder):
+    with recorder.lock:
+        entries = [f'total;dur={total_ns / 1e6:.3f}',
+                   f'db;dur={recorder.db_ns / 1e6:.3f};desc="{recorder.db_queries} queries"']
+        entries += [f'{name};dur={elapsed / 1e6:.3f}' for name, elapsed in recorder.spans.items()]
+    return ', '.join(entries)
+
+
+class InstrumentationMiddleware:
+    """Time requests, count their queries and publish both"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(_install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            _install_query_recorder(connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = Recorder()
+        token = _recorder.set(recorder)
+        started = time.perf_counter_ns()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.publish(request, response, time.perf_counter_ns() - started, recorder)
+
+    async def __acall__(self, request):
+        recorder = Recorder()
+        token = _recorder.set(recorder)
+        started = time.perf_counter_ns()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.publish(request, response, time.perf_counter_ns() - started, recorder)
+
+    def publish(self, request, response, elapsed, recorder):
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unmatched'
+        registry.record(view, request.method, response.status_code, elapsed / 1e9, recorder)
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(elapsed, recorder)
+        return response
+
+
+def metrics_view(request):
+    """Serve the request metrics in Prometheus text format"""
+    if request.META.get('REMOTE_ADDR') not in settings.INSTRUMENTATION_METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,60 @@
+"""
+JSON rendering and parsing through orjson.
+
+``FastJSONRenderer`` and ``FastJSONParser`` replace DRF's JSON renderer
+and parser and produce and accept the same documents: compact, UTF-8,
+ISO 8601 datetimes with ``Z`` for UTC, ``\\u2028``/``\\u2029`` escaped.
+Types orjson does not know (decimals, lazy strings, querysets...) go
+through DRF's ``JSONEncoder.default``, so they come out as before.
+
+Pretty-printed output (``indent`` in the media type, or from the
+browsable API), ``UNICODE_JSON``/``COMPACT_JSON``/``STRICT_JSON`` turned
+off, request bodies in other charsets and deployments without orjson
+installed all fall back to DRF's implementation.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional; DRF's stdlib JSON is used without it
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` output, rendered by orjson when possible"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        content = orjson.dumps(data, default=_default, option=OPTIONS)
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    """``JSONParser`` for UTF-8 bodies, parsed by orjson when possible"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            # Like json.load in strict mode, orjson rejects NaN and Infinity
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,141 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary (``default``). While a request is being
+served, reads of the models in ``DATABASE_REPLICA_MODELS`` (the catalog,
+eligibility history and statistics rollups) go to one of the replicas
+configured through ``DB_REPLICA_HOSTS``, the same one for the whole
+request. Every other read, and every read outside a request (management
+commands, background writers and workers), stays on the primary.
+
+Read-your-writes: a request with an unsafe method reads only from the
+primary, and a client whose request wrote keeps reading from the primary
+for ``DATABASE_REPLICA_STICKY_SECONDS``. That is remembered in a cookie and,
+for authenticated users, in the cache, which covers token clients that
+drop cookies.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import LazyObject, empty
+
+PRIMARY = 'default'
+PIN_COOKIE = 'db_primary'
+PIN_KEY_PREFIX = 'db:primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_routing = ContextVar('database_routing', default=None)
+
+
+def replicas():
+    return [alias for alias in settings.DATABASES if alias != PRIMARY]
+
+
+def _known_user(request):
+    """The request's user if it has been resolved already, else None"""
+    user = request.__dict__.get('user')
+    if isinstance(user, LazyObject):
+        # Resolving it would run queries of its own
+        if user._wrapped is empty:
+            return None
+        user = user._wrapped
+    return user if user is not None and user.is_authenticated else None
+
+
+class RequestRouting:
+    """Routing state of one request"""
+    __slots__ = ('request', 'primary', 'wrote', 'replica')
+
+    def __init__(self, request):
+        self.request = request
+        self.primary = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+        self.wrote = False
+        self.replica = None
+
+    def use_primary(self):
+        if self.primary:
+            return True
+        # Authentication runs before the view's queries, so the user is known
+        # by the first catalog or history read
+        user = _known_user(self.request)
+        if user is not None:
+            self.primary = bool(cache.get(f'{PIN_KEY_PREFIX}:{user.pk}'))
+        return self.primary
+
+    def pin(self, response):
+        """Keep this client on the primary for a while after it wrote"""
+        if not (self.wrote or (self.request.method not in SAFE_METHODS and response.status_code < 400)):
+            return
+        seconds = settings.DATABASE_REPLICA_STICKY_SECONDS
+        response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+        user = _known_user(self.request)
+        if user is not None:
+            cache.set(f'{PIN_KEY_PREFIX}:{user.pk}', True, seconds)
+
+
+def reading_replica():
+    """The replica this request has read from, if any"""
+    state = _routing.get()
+    return state.replica if state is not None else None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or model._meta.label_lower not in settings.DATABASE_REPLICA_MODELS:
+            return PRIMARY
+        if state.replica is None:
+            aliases = replicas()
+            if not aliases or state.use_primary():
+                return PRIMARY
+            state.replica = random.choice(aliases)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaRoutingMiddleware:
+    """Track each request's routing state and pin clients that wrote to the primary"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RequestRouting(request)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        state.pin(response)
+        return response
+
+    async def __acall__(self, request):
+        state = RequestRouting(request)
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        state.pin(response)
+        return response
@@ -0,0 +1,126 @@
+"""
+Serializer building blocks shared by the apps.
+
+``SparseFieldsetMixin`` lets clients pick the fields of a response with
+``?fields=`` or leave some out with ``?exclude=``: comma-separated names,
+dotted to reach into nested objects::
+
+    /api/eligibility/history/?fields=id,created_at,eligible_programs.name
+    /api/eligibility/programs/?exclude=description,created_at,updated_at
+
+Naming a nested field without dotted names keeps all of it, and unknown
+names are ignored. In list responses the fieldset applies to every item;
+pagination keys are always kept. Serializers given input to validate are
+left whole, so writes see every field.
+
+``ReadOnlySerializer`` is a plain serializer for the hot read paths: each
+field is an attribute read (or a ``get_<name>`` method) and, for decimals,
+datetimes and UUIDs, the matching DRF field's ``to_representation``, with
+none of the per-field binding, source resolution and ``OrderedDict``
+building of ``ModelSerializer``. Subclasses mirror a ``ModelSerializer``
+and render exactly what it renders.
+"""
+from operator import attrgetter
+
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def parse_fieldset(value):
+    """``'a,b.c'`` -> ``{'a': {}, 'b': {'c': {}}}``; an empty dict means the whole field"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsetMixin:
+    """Drop the fields not asked for in ``?fields=``, or asked away in ``?exclude=``.
+
+    Needs the request in the serializer context. ``fieldset_prefix`` names
+    the field a serializer built outside its parent's fields (in a method,
+    say) is nested under.
+    """
+
+    def __init__(self, *args, fieldset_prefix=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fieldset_prefix = list(fieldset_prefix)
+
+    def fieldset_path(self):
+        """Field names from the response root down to this serializer"""
+        names = []
+        prefix = []
+        serializer = self
+        while serializer is not None:
+            # List children are bound without a name; with many=True the
+            # prefix is on the child
+            if serializer.field_name:
+                names.append(serializer.field_name)
+            prefix = getattr(serializer, 'fieldset_prefix', None) or prefix
+            serializer = serializer.parent
+        return prefix + names[::-1]
+
+    def sparse_fieldset(self):
+        """``(keep, drop)``: the names to keep (None for all) and to drop here"""
+        request = self.context.get('request')
+        if request is None or hasattr(self.root, 'initial_data'):
+            return None, set()
+
+        keep = parse_fieldset(request.query_params.get(FIELDS_PARAM))
+        drop = parse_fieldset(request.query_params.get(EXCLUDE_PARAM))
+        for name in self.fieldset_path():
+            keep = keep.get(name, {})
+            drop = drop.get(name, {})
+        return keep or None, {name for name, nested in drop.items() if not nested}
+
+    def select_fields(self, names):
+        keep, drop = self.sparse_fieldset()
+        return [name for name in names if name not in drop and (keep is None or name in keep)]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        return {name: fields[name] for name in self.select_fields(fields)}
+
+
+class ReadOnlySerializer(SparseFieldsetMixin, serializers.BaseSerializer):
+    """Output-only serializer built from plain attribute reads.
+
+    ``Meta.fields`` lists the output keys in order. Each value comes from
+    ``get_<name>(instance)`` if defined, else from the attribute of that
+    name, and goes through ``Meta.formats[name].to_representation`` (a DRF
+    field) unless it is None.
+    """
+
+    class Meta:
+        fields = []
+        formats = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._plan = None
+
+    def plan(self):
+        """``(name, getter, representation)`` per selected field, built once"""
+        if self._plan is None:
+            formats = getattr(self.Meta, 'formats', {})
+            self._plan = [
+                (
+                    name,
+                    getattr(self, f'get_{name}', None) or attrgetter(name),
+                    formats[name].to_representation if name in formats else None,
+                )
+                for name in self.select_fields(self.Meta.fields)
+            ]
+        return self._plan
+
+    def to_representation(self, instance):
+        data = {}
+        for name, getter, representation in self.plan():
+            value = getter(instance)
+            data[name] = value if value is None or representation is None else representation(value)
+        return data
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -24,6 +24,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'government_benefits.instrumentation.InstrumentationMiddleware',
+    'government_benefits.routers.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -53,6 +55,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'government_benefits.wsgi.application'
+ASGI_APPLICATION = 'government_benefits.asgi.application'
 
 # Database configuration for multiple database support
 DATABASES = {
@@ -63,9 +66,42 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='password'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Keep each worker thread's connection open between requests, and
+        # check it still works before reusing it
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        # Behind PgBouncer in transaction pooling mode, cursors cannot
+        # outlive a transaction
+        'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER_TRANSACTION_POOLING', default=False, cast=bool),
+        'OPTIONS': {
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+        },
     }
 }
 
+# Read replicas ("host" or "host:port", same database and credentials).
+# Catalog, history and statistics reads made while serving a request go to
+# a replica; see government_benefits/routers.py.
+for number, replica in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], HOST=host, PORT=port or DATABASES['default']['PORT'], TEST={'MIRROR': 'default'}
+    )
+
+DATABASE_ROUTERS = ['government_benefits.routers.PrimaryReplicaRouter']
+
+# Models whose reads may be served by a replica, and how long (seconds) a
+# client that wrote keeps reading from the primary
+DATABASE_REPLICA_MODELS = [
+    'eligibility.governmentprogram',
+    'eligibility.eligibilitycheck',
+    'eligibility.eligibilitycheck_eligible_programs',
+    'eligibility.statisticscounter',
+    'eligibility.dailycheckrollup',
+    'eligibility.programrollup',
+]
+DATABASE_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=10, cast=int)
+
 # Alternative MySQL configuration (commented out)
 # DATABASES = {
 #     'default': {
@@ -104,16 +140,29 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Largest accepted document upload (bytes); enforced while the upload streams in
+DOCUMENT_MAX_UPLOAD_SIZE = config('DOCUMENT_MAX_UPLOAD_SIZE', default=20 * 1024 * 1024, cast=int)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'government_benefits.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'government_benefits.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
@@ -124,4 +173,79 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
 ]
 
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+
+# Eligibility engine: how often a worker re-reads the catalog version stamp,
+# and how long the stamp may live in a process-local cache.
+ELIGIBILITY_INDEX_CHECK_INTERVAL = config('ELIGIBILITY_INDEX_CHECK_INTERVAL', default=5, cast=int)
+ELIGIBILITY_CATALOG_VERSION_TTL = config('ELIGIBILITY_CATALOG_VERSION_TTL', default=60, cast=int)
+
+# Largest number of profiles accepted by the batch screening endpoint
+ELIGIBILITY_BATCH_MAX_PROFILES = config('ELIGIBILITY_BATCH_MAX_PROFILES', default=10000, cast=int)
+
+# Stored checks read per query by the policy simulation (memory grows with
+# this, not with the number of checks)
+ELIGIBILITY_SIMULATION_CHUNK_SIZE = config('ELIGIBILITY_SIMULATION_CHUNK_SIZE', default=50000, cast=int)
+
+# Write-behind persistence of eligibility checks: queue size, flush batch
+# size and interval (seconds), and how long a request waits on a full queue
+# before writing its check synchronously.
+ELIGIBILITY_WRITE_BEHIND = config('ELIGIBILITY_WRITE_BEHIND', default=False, cast=bool)
+ELIGIBILITY_WRITE_BEHIND_MAX_PENDING = config('ELIGIBILITY_WRITE_BEHIND_MAX_PENDING', default=10000, cast=int)
+ELIGIBILITY_WRITE_BEHIND_BATCH_SIZE = config('ELIGIBILITY_WRITE_BEHIND_BATCH_SIZE', default=500, cast=int)
+ELIGIBILITY_WRITE_BEHIND_FLUSH_INTERVAL = config('ELIGIBILITY_WRITE_BEHIND_FLUSH_INTERVAL', default=1.0, cast=float)
+ELIGIBILITY_WRITE_BEHIND_PUT_TIMEOUT = config('ELIGIBILITY_WRITE_BEHIND_PUT_TIMEOUT', default=2.0, cast=float)
+
+# Memoization of eligibility results: per-worker LRU size and TTL (seconds),
+# backed by the named cache so workers can share results.
+ELIGIBILITY_MEMO_ENABLED = config('ELIGIBILITY_MEMO_ENABLED', default=True, cast=bool)
+ELIGIBILITY_MEMO_MAX_ENTRIES = config('ELIGIBILITY_MEMO_MAX_ENTRIES', default=10000, cast=int)
+ELIGIBILITY_MEMO_TTL = config('ELIGIBILITY_MEMO_TTL', default=300, cast=int)
+ELIGIBILITY_MEMO_CACHE = config('ELIGIBILITY_MEMO_CACHE', default='default')
+
+# How long rendered catalog responses stay cached (they are also retired by
+# any catalog edit)
+ELIGIBILITY_CATALOG_CACHE_TTL = config('ELIGIBILITY_CATALOG_CACHE_TTL', default=3600, cast=int)
+
+# Also write eligible programs to the EligibilityCheck M2M through table.
+# The compact eligible_program_ids column is always written and read.
+ELIGIBILITY_STORE_PROGRAM_LINKS = config('ELIGIBILITY_STORE_PROGRAM_LINKS', default=False, cast=bool)
+
+# Retention of eligibility checks: older checks are hidden from history and
+# the admin, and moved to compressed files by `manage.py archive_checks`.
+ELIGIBILITY_RETENTION_DAYS = config('ELIGIBILITY_RETENTION_DAYS', default=365, cast=int)
+ELIGIBILITY_ARCHIVE_DIR = config('ELIGIBILITY_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive'))
+
+# Re-evaluation of stored checks after a program's criteria change
+# (manage.py run_reevaluation_jobs): checks rewritten per transaction, and
+# how long (seconds) a running job may go without progress before it is
+# handed out again
+ELIGIBILITY_REEVALUATION_BATCH_SIZE = config('ELIGIBILITY_REEVALUATION_BATCH_SIZE', default=2000, cast=int)
+ELIGIBILITY_REEVALUATION_JOB_TIMEOUT = config('ELIGIBILITY_REEVALUATION_JOB_TIMEOUT', default=300, cast=int)
+
+# Per-request instrumentation: Server-Timing headers and Prometheus metrics
+# at /metrics (only answered for the listed client addresses)
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=False, cast=bool)
+INSTRUMENTATION_SERVER_TIMING = config('INSTRUMENTATION_SERVER_TIMING', default=True, cast=bool)
+INSTRUMENTATION_METRICS_ALLOWED_IPS = config('INSTRUMENTATION_METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+
+# Background document processing (manage.py run_document_workers): attempts
+# per job, base retry delay and how long a job may run (seconds)
+DOCUMENT_JOB_MAX_ATTEMPTS = config('DOCUMENT_JOB_MAX_ATTEMPTS', default=3, cast=int)
+DOCUMENT_JOB_RETRY_DELAY = config('DOCUMENT_JOB_RETRY_DELAY', default=60, cast=int)
+DOCUMENT_JOB_TIMEOUT = config('DOCUMENT_JOB_TIMEOUT', default=300, cast=int)
+
+# Signed API tokens (POST /api/auth/token/): lifetimes (seconds), the
+# per-worker cache of resolved users, and the cache holding revocations
+AUTH_TOKEN_ACCESS_TTL = config('AUTH_TOKEN_ACCESS_TTL', default=900, cast=int)
+AUTH_TOKEN_REFRESH_TTL = config('AUTH_TOKEN_REFRESH_TTL', default=7 * 24 * 3600, cast=int)
+AUTH_TOKEN_PRINCIPAL_TTL = config('AUTH_TOKEN_PRINCIPAL_TTL', default=60, cast=int)
+AUTH_TOKEN_PRINCIPAL_MAX_ENTRIES = config('AUTH_TOKEN_PRINCIPAL_MAX_ENTRIES', default=10000, cast=int)
+AUTH_TOKEN_CACHE = config('AUTH_TOKEN_CACHE', default='default')
+
+# Serve the catalog, check, history and statistics endpoints with async
+# views (turn on when deploying government_benefits.asgi), and how many
+# threads (each with its own database connection) run their independent
+# queries concurrently
+ELIGIBILITY_ASYNC_VIEWS = config('ELIGIBILITY_ASYNC_VIEWS', default=False, cast=bool)
+ASYNC_QUERY_THREADS = config('ASYNC_QUERY_THREADS', default=8, cast=int)
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""
+Settings for running the tests locally, without PostgreSQL.
+
+Two SQLite databases: ``default`` and a ``replica`` mirroring it. A
+replica connection does not see a test's uncommitted rows, so nothing is
+read from it unless a test routes models there (government_benefits/tests.py).
+
+    python manage.py test --settings=government_benefits.test_settings
+"""
+from .settings import *  # noqa: F401,F403
+
+AUTH_USER_MODEL = 'users.User'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_REPLICA_MODELS = []
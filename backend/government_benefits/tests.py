@@ -0,0 +1,76 @@
+from contextlib import ExitStack
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from eligibility.models import GovernmentProgram
+from users.models import User
+from .routers import PIN_COOKIE, PRIMARY, PrimaryReplicaRouter, ReplicaRoutingMiddleware, replicas
+
+
+def read_catalog(request):
+    list(GovernmentProgram.objects.all())
+    return HttpResponse()
+
+
+def read_users(request):
+    list(User.objects.all())
+    return HttpResponse()
+
+
+def write_catalog(request):
+    GovernmentProgram.objects.create(name='Program', program_type='financial', description='')
+    return HttpResponse()
+
+
+@skipUnless(replicas(), 'needs a replica database (see government_benefits/test_settings.py)')
+@override_settings(DATABASE_REPLICA_MODELS=['eligibility.governmentprogram'])
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    """Requests read the catalog from a replica until they or their client write"""
+    databases = {PRIMARY, *replicas()}
+
+    def setUp(self):
+        cache.clear()
+
+    def serve(self, view, method='get', cookies=None, user=None):
+        """``(response, primary queries, replica queries)`` for one request through the middleware"""
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        if user is not None:
+            request.user = user
+        with ExitStack() as stack:
+            primary = stack.enter_context(CaptureQueriesContext(connections[PRIMARY]))
+            replica = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in replicas()]
+            response = ReplicaRoutingMiddleware(view)(request)
+        return response, len(primary), sum(len(queries) for queries in replica)
+
+    def test_reads_go_to_the_replica(self):
+        response, primary, replica = self.serve(read_catalog)
+        self.assertEqual((primary, replica), (0, 1))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_other_reads_stay_on_the_primary(self):
+        self.assertEqual(self.serve(read_users)[1:], (1, 0))
+        # Outside a request
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(GovernmentProgram), PRIMARY)
+
+    def test_writes_go_to_the_primary_and_pin_the_client(self):
+        response, primary, replica = self.serve(write_catalog, method='post')
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        cookies = {PIN_COOKIE: response.cookies[PIN_COOKIE].value}
+        self.assertEqual(self.serve(read_catalog, cookies=cookies)[1:], (1, 0))
+
+    def test_pinned_user_without_the_cookie(self):
+        user = User.objects.create_user('writer', password='writer-password')
+        self.serve(write_catalog, method='post', user=user)
+        self.assertEqual(self.serve(read_catalog, user=user)[1:], (1, 0))
+        # Another user still reads from the replica
+        other = User.objects.create_user('reader', password='reader-password')
+        self.assertEqual(self.serve(read_catalog, user=other)[1:], (0, 1))
@@ -11,7 +11,25 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'government_benefits.settings')
 django.setup()
 
-from eligibility.models import GovernmentProgram
+from decimal import Decimal
+from eligibility.index import MAX_HOUSEHOLD_SIZE
+from eligibility.models import GovernmentProgram, ProgramIncomeLimit
+
+# Federal poverty guidelines (2024): annual amount for one person plus the
+# amount for each additional household member. Alaska and Hawaii publish
+# their own guidelines; every other state uses the national figures.
+POVERTY_GUIDELINES = {
+    '': (15060, 5380),
+    'Alaska': (18810, 6730),
+    'Hawaii': (17310, 6190),
+}
+
+# Gross income limit of household-size based programs, as percent of poverty
+INCOME_LIMIT_PERCENT = {
+    'SNAP (Food Stamps)': 130,
+    'Medicaid': 138,
+    'WIC (Women, Infants, and Children)': 185,
+}
 
 def create_sample_programs():
     """Create sample government benefit programs"""
@@ -154,5 +172,30 @@ def create_sample_programs():
     print(f"\nSeed completed! Created {created_count} new programs.")
     print(f"Total programs in database: {GovernmentProgram.objects.count()}")
 
+def create_income_limits():
+    """Create household-size income limit tables for poverty-based programs"""
+    
+    for name, percent in INCOME_LIMIT_PERCENT.items():
+        program = GovernmentProgram.objects.filter(name=name).first()
+        if program is None:
+            continue
+        
+        limits = []
+        for state, (base, per_member) in POVERTY_GUIDELINES.items():
+            for household_size in range(1, MAX_HOUSEHOLD_SIZE + 1):
+                guideline = base + per_member * (household_size - 1)
+                limits.append(ProgramIncomeLimit(
+                    program=program,
+                    state=state,
+                    household_size=household_size,
+                    max_income=(Decimal(guideline) * percent / 100).quantize(Decimal('1')),
+                ))
+        ProgramIncomeLimit.objects.bulk_create(limits, ignore_conflicts=True)
+        
+        # bulk_create sends no signals; saving the program publishes the change
+        program.save(update_fields=['updated_at'])
+        print(f"Income limits: {program.name} ({percent}% of poverty guidelines)")
+
 if __name__ == '__main__':
-    create_sample_programs()
\ No newline at end of file
+    create_sample_programs()
+    create_income_limits()
\ No newline at end of file
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, UserDocument
+from .models import DocumentBlob, DocumentJob, User, UserDocument
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -17,6 +17,20 @@ class UserAdmin(BaseUserAdmin):
 
 @admin.register(UserDocument)
 class UserDocumentAdmin(admin.ModelAdmin):
-    list_display = ['user', 'document_type', 'uploaded_at', 'verified']
+    list_display = ['user', 'document_type', 'uploaded_at', 'verified', 'extracted_income']
     list_filter = ['document_type', 'verified', 'uploaded_at']
-    search_fields = ['user__username', 'user__email']
\ No newline at end of file
+    search_fields = ['user__username', 'user__email']
+    readonly_fields = ['blob', 'extracted_income', 'processed_at']
+
+@admin.register(DocumentBlob)
+class DocumentBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'file', 'size', 'ref_count', 'created_at']
+
+@admin.register(DocumentJob)
+class DocumentJobAdmin(admin.ModelAdmin):
+    list_display = ['document', 'status', 'attempts', 'available_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['document__user__username', 'error']
+    readonly_fields = ['timings', 'result', 'error', 'locked_by', 'started_at', 'finished_at']
\ No newline at end of file
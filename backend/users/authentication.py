@@ -0,0 +1,285 @@
+"""
+Signed, stateless API tokens.
+
+A token is a ``django.core.signing`` blob (signed with ``SECRET_KEY``)
+naming the user, a random token id, its kind (``access`` or ``refresh``),
+its expiry and a fingerprint of the user's password hash. Clients send
+access tokens as ``Authorization: Bearer <token>``; nothing is looked up
+in a session table.
+
+``SignedTokenAuthentication`` resolves the user through ``PrincipalCache``,
+a per-worker TTL cache of ``User`` rows, so a warm worker authenticates
+without a database query. Saving or deleting a user drops its cached
+entry in that worker; other workers see the change within
+``AUTH_TOKEN_PRINCIPAL_TTL`` seconds. A password change invalidates every
+token issued before it through the fingerprint.
+
+Revoked token ids are kept in a process-local set in front of the Django
+cache named by ``AUTH_TOKEN_CACHE`` (share it between workers to make a
+revocation visible everywhere at once), and recorded in ``RevokedToken``.
+Refreshing checks that table, so refresh tokens stay revoked even if the
+cache is flushed; access tokens are short-lived and are only checked
+against the caches.
+"""
+import copy
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import RevokedToken, User
+
+TOKEN_SALT = 'users.authentication'
+KEYWORD = 'Bearer'
+REVOKED_KEY_PREFIX = 'auth:revoked'
+
+
+def password_fingerprint(user):
+    """Short digest of the password hash; changes whenever the password does"""
+    return salted_hmac(TOKEN_SALT, user.password).hexdigest()[:16]
+
+
+def _ttl(kind):
+    if kind == 'access':
+        return settings.AUTH_TOKEN_ACCESS_TTL
+    return settings.AUTH_TOKEN_REFRESH_TTL
+
+
+def make_token(user, kind):
+    """Sign a new ``kind`` token for ``user``, returning ``(token, expires)``"""
+    expires = int(time.time()) + _ttl(kind)
+    payload = {
+        'uid': user.pk,
+        'jti': secrets.token_hex(16),
+        'typ': kind,
+        'exp': expires,
+        'pwd': password_fingerprint(user),
+    }
+    return signing.dumps(payload, salt=TOKEN_SALT), expires
+
+
+def issue_pair(user):
+    """Access and refresh tokens for a freshly authenticated user"""
+    access, access_expires = make_token(user, 'access')
+    refresh, _ = make_token(user, 'refresh')
+    return {
+        'access': access,
+        'refresh': refresh,
+        'token_type': KEYWORD,
+        'expires_in': access_expires - int(time.time()),
+    }
+
+
+def read_token(token, kind):
+    """Verify the signature, kind and expiry of ``token`` and return its payload"""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+    if not isinstance(payload, dict) or payload.get('typ') != kind:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+    if payload['exp'] <= time.time():
+        raise exceptions.AuthenticationFailed('Token has expired.')
+    return payload
+
+
+class RevocationList:
+    """Revoked token ids: a local set in front of a Django cache and the RevokedToken table"""
+
+    def __init__(self, cache_alias):
+        self.cache_alias = cache_alias
+        self.local = {}
+        self.lock = threading.Lock()
+
+    def _key(self, jti):
+        return f'{REVOKED_KEY_PREFIX}:{jti}'
+
+    def _remember(self, payloads):
+        now = time.time()
+        with self.lock:
+            for payload in payloads:
+                self.local[payload['jti']] = payload['exp']
+        cache = caches[self.cache_alias]
+        for payload in payloads:
+            cache.set(self._key(payload['jti']), True, max(1, int(payload['exp'] - now)))
+
+    def claim(self, payload):
+        """Revoke a single-use token; False if it was already revoked (by a concurrent request, say)"""
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(
+                    jti=payload['jti'], expires_at=datetime.fromtimestamp(payload['exp'], dt_timezone.utc)
+                )
+            claimed = True
+        except IntegrityError:
+            claimed = False
+        self._remember([payload])
+        RevokedToken.objects.filter(expires_at__lt=timezone.now()).delete()
+        return claimed
+
+    def revoke(self, *payloads):
+        self._remember(payloads)
+        RevokedToken.objects.bulk_create([
+            RevokedToken(jti=payload['jti'], expires_at=datetime.fromtimestamp(payload['exp'], dt_timezone.utc))
+            for payload in payloads
+        ], ignore_conflicts=True)
+        # Expired rows no longer matter
+        RevokedToken.objects.filter(expires_at__lt=timezone.now()).delete()
+
+    def is_revoked(self, payload, check_database=False):
+        jti = payload['jti']
+        now = time.time()
+        with self.lock:
+            if jti in self.local:
+                return True
+            if len(self.local) > 10000:
+                self.local = {key: expires for key, expires in self.local.items() if expires > now}
+        if caches[self.cache_alias].get(self._key(jti)):
+            return True
+        return check_database and RevokedToken.objects.filter(jti=jti).exists()
+
+    def clear(self):
+        with self.lock:
+            self.local.clear()
+
+
+class PrincipalCache:
+    """Per-worker LRU with TTL of users resolved from tokens"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                # Views may change request.user; never hand out the cached instance
+                return copy.copy(entry[1]), entry[2]
+            self.misses += 1
+        return None
+
+    def _store(self, user):
+        if user is None:
+            return None, None
+        fingerprint = password_fingerprint(user)
+        with self.lock:
+            self.entries[user.pk] = (time.monotonic() + self.ttl, copy.copy(user), fingerprint)
+            self.entries.move_to_end(user.pk)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return user, fingerprint
+
+    def get(self, user_id):
+        """The user with ``user_id`` and its password fingerprint, or ``(None, None)``"""
+        return self._lookup(user_id) or self._store(User.objects.filter(pk=user_id).first())
+
+    async def aget(self, user_id):
+        return self._lookup(user_id) or self._store(await User.objects.filter(pk=user_id).afirst())
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+            }
+
+
+_principals = PrincipalCache(
+    max_entries=getattr(settings, 'AUTH_TOKEN_PRINCIPAL_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'AUTH_TOKEN_PRINCIPAL_TTL', 60),
+)
+_revoked = RevocationList(cache_alias=getattr(settings, 'AUTH_TOKEN_CACHE', 'default'))
+
+
+def get_principal_cache():
+    return _principals
+
+
+def get_revocation_list():
+    return _revoked
+
+
+def _check_principal(payload, user, fingerprint):
+    if user is None or not user.is_active:
+        raise exceptions.AuthenticationFailed('User inactive or deleted.')
+    if fingerprint != payload['pwd']:
+        raise exceptions.AuthenticationFailed('Token predates a password change.')
+    return user
+
+
+def resolve_user(payload, check_database=False):
+    """The active user a verified payload belongs to, unless the token was revoked"""
+    if _revoked.is_revoked(payload, check_database):
+        raise exceptions.AuthenticationFailed('Token has been revoked.')
+    if check_database:
+        user = User.objects.filter(pk=payload['uid']).first()
+        fingerprint = password_fingerprint(user) if user is not None else None
+    else:
+        user, fingerprint = _principals.get(payload['uid'])
+    return _check_principal(payload, user, fingerprint)
+
+
+async def aresolve_user(payload):
+    """``resolve_user`` for async views; the principal cache is consulted first"""
+    if _revoked.is_revoked(payload):
+        raise exceptions.AuthenticationFailed('Token has been revoked.')
+    user, fingerprint = await _principals.aget(payload['uid'])
+    return _check_principal(payload, user, fingerprint)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authenticate ``Authorization: Bearer <access token>`` requests"""
+
+    def _read(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != KEYWORD.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        return read_token(token, 'access')
+
+    def authenticate(self, request):
+        payload = self._read(request)
+        if payload is None:
+            return None
+        return resolve_user(payload), payload
+
+    async def aauthenticate(self, request):
+        payload = self._read(request)
+        if payload is None:
+            return None
+        return await aresolve_user(payload), payload
+
+    def authenticate_header(self, request):
+        return KEYWORD
@@ -0,0 +1,98 @@
+"""
+Content-addressed document storage.
+
+Uploads are streamed to a temporary file in chunks by
+``HashingUploadHandler``, which computes the SHA-256 digest as the bytes
+arrive and aborts as soon as ``DOCUMENT_MAX_UPLOAD_SIZE`` is exceeded.
+``store_upload`` then files the contents under their digest, so identical
+uploads are kept once as a ``DocumentBlob`` whose ``ref_count`` tracks the
+``UserDocument`` rows using it. Deleting a document releases its reference
+(see ``signals.py``); ``manage.py cleanup_document_blobs`` removes blobs
+nobody references any more and files no blob points at.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.template.defaultfilters import filesizeformat
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import DocumentBlob
+
+BLOB_DIRECTORY = 'documents/sha256'
+
+
+class DocumentTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Document is too large.'
+    default_code = 'document_too_large'
+
+
+def blob_name(sha256):
+    return f'{BLOB_DIRECTORY}/{sha256[:2]}/{sha256}'
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Stream each uploaded file to a temporary file, hashing and size-checking on the way"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        limit = settings.DOCUMENT_MAX_UPLOAD_SIZE
+        if self.received > limit:
+            self.file.close()
+            raise DocumentTooLarge(f'Documents may be at most {filesizeformat(limit)}.')
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.sha256 = self.digest.hexdigest()
+        return upload
+
+
+def content_digest(upload):
+    """SHA-256 of an upload, reusing the digest computed while it streamed in"""
+    sha256 = getattr(upload, 'sha256', None)
+    if sha256 is None:
+        digest = hashlib.sha256()
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        sha256 = digest.hexdigest()
+        upload.seek(0)
+    return sha256
+
+
+def store_upload(upload):
+    """Return the blob holding ``upload``'s contents with one more reference, storing them if new"""
+    sha256 = content_digest(upload)
+    if DocumentBlob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1):
+        upload.close()
+        return DocumentBlob.objects.get(sha256=sha256)
+
+    # New contents. A file left by an interrupted upload can be reused as is.
+    name = blob_name(sha256)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, upload)
+    try:
+        with transaction.atomic():
+            return DocumentBlob.objects.create(sha256=sha256, file=name, size=upload.size, ref_count=1)
+    except IntegrityError:
+        # Stored concurrently by another upload of the same bytes
+        if name != blob_name(sha256):
+            default_storage.delete(name)
+        DocumentBlob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1)
+        return DocumentBlob.objects.get(sha256=sha256)
+
+
+def release_blob(blob_id):
+    """Drop one reference; unreferenced blobs are removed by cleanup_document_blobs"""
+    DocumentBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
@@ -0,0 +1,105 @@
+"""
+Database-backed queue for background document processing.
+
+Uploads enqueue a ``DocumentJob``; ``manage.py run_document_workers``
+claims due jobs in batches, runs ``processing.process_document`` on a
+process pool and records the outcome here. Failed jobs are retried with
+exponential backoff up to ``DOCUMENT_JOB_MAX_ATTEMPTS``; jobs whose worker
+died are handed out again after ``DOCUMENT_JOB_TIMEOUT`` seconds, within the
+same limit. A document whose bytes do not match their digest fails at once.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DocumentJob, UserDocument
+
+
+def enqueue(document):
+    return DocumentJob.objects.create(document=document)
+
+
+def claim(limit, worker):
+    """Mark up to ``limit`` due jobs as running for ``worker`` and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            DocumentJob.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('document__blob')
+            .filter(status='pending', available_at__lte=now)
+            .order_by('available_at', 'id')[:limit]
+        )
+        DocumentJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status='running', locked_by=worker, started_at=now, attempts=F('attempts') + 1
+        )
+    for job in jobs:
+        job.status, job.locked_by, job.started_at, job.attempts = 'running', worker, now, job.attempts + 1
+    return jobs
+
+
+def requeue_stale():
+    """Return running jobs whose worker has gone quiet to the queue, failing those out of attempts.
+
+    Returns ``(requeued, failed)`` counts. Attempts are counted when a job
+    is claimed, so the stalled run is already one of them.
+    """
+    now = timezone.now()
+    stale = DocumentJob.objects.filter(
+        status='running', started_at__lt=now - timedelta(seconds=settings.DOCUMENT_JOB_TIMEOUT)
+    )
+    failed = stale.filter(attempts__gte=settings.DOCUMENT_JOB_MAX_ATTEMPTS).update(
+        status='failed', locked_by='', error='Timed out', finished_at=now
+    )
+    requeued = stale.update(status='pending', locked_by='', error='Timed out')
+    return requeued, failed
+
+
+def complete(job, outcome):
+    """Record a processed document; returns False if it failed its checksum instead"""
+    if not outcome['checksum_ok']:
+        # The stored bytes are not the ones uploaded; nothing read from them is trusted
+        fail(job, 'Checksum mismatch', retry=False)
+        return False
+    now = timezone.now()
+    job.status = 'done'
+    job.finished_at = now
+    job.timings = outcome.pop('timings')
+    job.timings['total'] = (now - job.started_at).total_seconds() * 1000
+    job.result = outcome
+    job.error = ''
+    with transaction.atomic():
+        job.save(update_fields=['status', 'finished_at', 'timings', 'result', 'error'])
+        income = outcome['annual_income']
+        UserDocument.objects.filter(pk=job.document_id).update(
+            extracted_income=Decimal(income) if income is not None else None,
+            processed_at=now,
+        )
+    return True
+
+
+def fail(job, error, retry=True):
+    """Record a failed attempt and schedule a retry while attempts remain"""
+    now = timezone.now()
+    job.error = error
+    job.finished_at = now
+    job.timings = {'total': (now - job.started_at).total_seconds() * 1000}
+    if retry and job.attempts < settings.DOCUMENT_JOB_MAX_ATTEMPTS:
+        job.status = 'pending'
+        job.available_at = now + timedelta(seconds=settings.DOCUMENT_JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = 'failed'
+    job.save(update_fields=['status', 'error', 'finished_at', 'timings', 'available_at'])
+
+
+def income_suggestion(user):
+    """The most recently processed income figure from ``user``'s documents, or None"""
+    return (
+        UserDocument.objects.filter(user=user, extracted_income__isnull=False)
+        .order_by('-processed_at')
+        .values('id', 'document_type', 'original_filename', 'extracted_income', 'processed_at')
+        .first()
+    )
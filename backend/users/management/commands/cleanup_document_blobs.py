@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from users.documents import BLOB_DIRECTORY
+from users.models import DocumentBlob
+
+
+def stored_files(directory):
+    """Yield every file name below ``directory`` in the default storage"""
+    try:
+        subdirectories, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f'{directory}/{name}'
+    for subdirectory in subdirectories:
+        yield from stored_files(f'{directory}/{subdirectory}')
+
+
+class Command(BaseCommand):
+    help = ('Correct document blob reference counts, then delete blobs no document uses '
+            'and stored blob files no blob points at')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24,
+                            help='Leave blobs and files younger than this alone (uploads in flight)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        # Counters drift if a request dies between storing a blob and saving its document
+        drifted = DocumentBlob.objects.annotate(references=Count('documents')).exclude(ref_count=F('references'))
+        corrected = 0
+        for blob in drifted.iterator():
+            corrected += 1
+            if not dry_run:
+                DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=blob.references)
+
+        removed = freed = 0
+        unreferenced = DocumentBlob.objects.filter(created_at__lt=cutoff).annotate(
+            references=Count('documents')
+        ).filter(references=0)
+        for blob in unreferenced.iterator():
+            removed += 1
+            freed += blob.size
+            if dry_run:
+                continue
+            with transaction.atomic():
+                # Re-check under the row lock: an upload may have just reused it
+                locked = DocumentBlob.objects.select_for_update().filter(pk=blob.pk, ref_count__lte=0).first()
+                if locked is None or locked.documents.exists():
+                    removed -= 1
+                    freed -= blob.size
+                    continue
+                locked.delete()
+                default_storage.delete(locked.file.name)
+
+        known = set(DocumentBlob.objects.values_list('file', flat=True))
+        orphans = 0
+        for name in stored_files(BLOB_DIRECTORY):
+            if name in known or default_storage.get_modified_time(name) >= cutoff:
+                continue
+            orphans += 1
+            freed += default_storage.size(name)
+            if not dry_run:
+                default_storage.delete(name)
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {removed} unreferenced blobs and {orphans} orphaned files ({freed:,} bytes); '
+            f'{corrected} reference counts corrected'
+        ))
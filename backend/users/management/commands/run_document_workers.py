@@ -0,0 +1,94 @@
+import os
+import signal
+import socket
+import time
+from multiprocessing import Pool, TimeoutError
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from users import jobs
+from users.processing import process_document
+
+
+def _ignore_interrupts():
+    # Ctrl-C stops the supervisor, which then shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _pool(processes):
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    return Pool(processes, initializer=_ignore_interrupts, maxtasksperchild=100)
+
+
+class Command(BaseCommand):
+    help = ('Process queued uploaded documents (checksum verification, text extraction, '
+            'income parsing) on a pool of worker processes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Jobs claimed at a time (default: two per process)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when no jobs are due instead of polling')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        batch_size = options['batch_size'] or processes * 2
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+
+        done = failed = 0
+        pool = _pool(processes)
+        try:
+            while True:
+                requeued, timed_out = jobs.requeue_stale()
+                if requeued or timed_out:
+                    self.stdout.write(f'  requeued {requeued} stalled jobs, failed {timed_out} out of attempts')
+                claimed = jobs.claim(batch_size, worker)
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                running = [
+                    (job, pool.apply_async(process_document, (
+                        job.document.file.name,
+                        job.document.original_filename,
+                        job.document.document_type,
+                        job.document.blob.sha256 if job.document.blob_id else None,
+                    )))
+                    for job in claimed
+                ]
+                hung = False
+                for job, result in running:
+                    try:
+                        if jobs.complete(job, result.get(timeout=settings.DOCUMENT_JOB_TIMEOUT)):
+                            done += 1
+                        else:
+                            failed += 1
+                    except TimeoutError:
+                        jobs.fail(job, f'No result within {settings.DOCUMENT_JOB_TIMEOUT}s')
+                        failed += 1
+                        hung = True
+                    except Exception as exc:
+                        jobs.fail(job, f'{type(exc).__name__}: {exc}')
+                        failed += 1
+                if hung:
+                    # A hung task keeps its process busy for good; replace the pool
+                    pool.terminate()
+                    pool.join()
+                    pool = _pool(processes)
+                    self.stdout.write('  restarted the worker pool after a timeout')
+                self.stdout.write(f'  {done} processed, {failed} failed attempts')
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted; running jobs will be requeued after the job timeout')
+        finally:
+            pool.terminate()
+            pool.join()
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {done} documents ({failed} failed attempts)'))
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 class User(AbstractUser):
     """Extended user model for government benefits system"""
@@ -15,6 +16,18 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+class DocumentBlob(models.Model):
+    """Uploaded file contents, stored once per distinct SHA-256 digest"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    # Number of UserDocument rows sharing these contents
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes, {self.ref_count} refs)"
+
 class UserDocument(models.Model):
     """Model for storing user uploaded documents"""
     DOCUMENT_TYPES = [
@@ -29,10 +42,59 @@ class UserDocument(models.Model):
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES)
-    file = models.FileField(upload_to='documents/')
+    file = models.FileField(upload_to='documents/', max_length=255)
+    # Content-addressed storage; documents uploaded before blobs own their file
+    blob = models.ForeignKey(DocumentBlob, on_delete=models.PROTECT, null=True, blank=True,
+                             related_name='documents')
     original_filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     verified = models.BooleanField(default=False)
     
+    # Filled in by the background document workers
+    extracted_income = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.get_document_type_display()}"
+
+class DocumentJob(models.Model):
+    """Background processing of one uploaded document (see users/jobs.py)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    document = models.ForeignKey(UserDocument, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    # Milliseconds per processing stage, the extraction result, the last error
+    timings = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='document_job_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.document} - {self.status}"
+
+class RevokedToken(models.Model):
+    """A signed API token withdrawn before it expired (see users/authentication.py)"""
+    jti = models.CharField(max_length=32, primary_key=True)
+    # Past this the token is rejected anyway and the row can go
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    
     def __str__(self):
-        return f"{self.user.username} - {self.get_document_type_display()}"
\ No newline at end of file
+        return self.jti
\ No newline at end of file
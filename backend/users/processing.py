@@ -0,0 +1,143 @@
+"""
+Document processing run by ``manage.py run_document_workers``.
+
+``process_document`` runs in a worker process and never touches the
+database: it reads the stored file, verifies its SHA-256 against the
+blob it was filed under, extracts text and looks for an annual income
+figure. It returns the findings plus the milliseconds spent per stage.
+
+Text comes from plain-text and CSV files directly and from PDFs through
+``pypdf`` when it is installed, otherwise from the text operators in the
+PDF's (Flate-compressed or plain) content streams. Scanned images are
+not OCR'd; they are verified and reported as having no text.
+"""
+import hashlib
+import io
+import re
+import time
+import zlib
+from decimal import Decimal, InvalidOperation
+
+from django.core.files.storage import default_storage
+
+try:
+    import pypdf
+except ImportError:  # optional; used for PDF text when installed
+    pypdf = None
+
+# Characters of extracted text kept in the job result
+TEXT_EXCERPT = 2000
+
+AMOUNT = r'\$?\s*(\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d+(?:\.\d{2})?)'
+
+# Periods per year for pay frequencies printed on pay stubs
+PAY_PERIODS = {
+    'weekly': 52,
+    'bi-weekly': 26,
+    'biweekly': 26,
+    'semi-monthly': 24,
+    'semimonthly': 24,
+    'monthly': 12,
+}
+
+# (document types, label pattern, periods per year or None to use the pay frequency)
+INCOME_PATTERNS = [
+    (('tax_return', 'fafsa'), r'adjusted\s+gross\s+income|\bAGI\b', 1),
+    (('tax_return',), r'total\s+income', 1),
+    (('pay_stub',), r'(?:YTD|year[\s-]+to[\s-]+date)\s+gross(?:\s+pay)?', None),
+    (('pay_stub',), r'gross\s+(?:pay|earnings)', None),
+    (('pay_stub', 'bank_statement', 'other'), r'annual\s+(?:income|salary)', 1),
+]
+
+
+def _pdf_text(data):
+    if pypdf is not None:
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+    parts = []
+    for stream in re.findall(rb'stream\r?\n(.*?)\r?\nendstream', data, re.S):
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        for literal in re.findall(rb'\(((?:\\.|[^\\)])*)\)\s*(?:Tj|\'|")', stream):
+            parts.append(literal)
+        for array in re.findall(rb'\[(.*?)\]\s*TJ', stream, re.S):
+            parts.append(b''.join(re.findall(rb'\(((?:\\.|[^\\)])*)\)', array)))
+    return '\n'.join(part.replace(b'\\(', b'(').replace(b'\\)', b')').decode('latin-1') for part in parts)
+
+
+def extract_text(data, filename):
+    """Best-effort text of a document, or '' when it holds none we can read"""
+    if data.startswith(b'%PDF'):
+        return _pdf_text(data)
+    if filename.lower().endswith(('.txt', '.csv', '.tsv')) or b'\0' not in data[:1024]:
+        return data.decode('utf-8', errors='replace')
+    return ''
+
+
+def _amount(text):
+    try:
+        return Decimal(text.replace(',', '').replace('$', '').strip())
+    except InvalidOperation:
+        return None
+
+
+def parse_income(text, document_type):
+    """Find an annual income figure, returning ``(amount, label)`` or ``(None, None)``"""
+    frequency = None
+    match = re.search(r'pay\s+(?:frequency|period)\s*:?\s*([a-z-]+)', text, re.I)
+    if match:
+        frequency = PAY_PERIODS.get(match.group(1).lower())
+
+    for document_types, label, periods in INCOME_PATTERNS:
+        if document_type not in document_types:
+            continue
+        match = re.search(rf'({label})\W{{0,20}}?{AMOUNT}', text, re.I)
+        if not match:
+            continue
+        amount = _amount(match.group(2))
+        if amount is None:
+            continue
+        if periods is None:
+            if re.match(r'YTD|year', match.group(1), re.I):
+                periods = 1
+            elif frequency is None:
+                continue
+            else:
+                periods = frequency
+        return (amount * periods).quantize(Decimal('0.01')), ' '.join(match.group(1).split()).lower()
+    return None, None
+
+
+def process_document(file_name, original_filename, document_type, expected_sha256):
+    """Verify, extract and parse one stored document (runs in a worker process)"""
+    timings = {}
+    started = time.perf_counter()
+    with default_storage.open(file_name, 'rb') as stored:
+        data = stored.read()
+    timings['read'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    sha256 = hashlib.sha256(data).hexdigest()
+    timings['checksum'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    text = extract_text(data, original_filename)
+    timings['extract'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    income, label = parse_income(text, document_type)
+    timings['parse'] = (time.perf_counter() - started) * 1000
+
+    return {
+        'sha256': sha256,
+        'checksum_ok': expected_sha256 is None or sha256 == expected_sha256,
+        'size': len(data),
+        'text_length': len(text),
+        'text_excerpt': text[:TEXT_EXCERPT],
+        'annual_income': str(income) if income is not None else None,
+        'income_source': label,
+        'timings': timings,
+    }
@@ -1,5 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db import transaction
+from government_benefits.serializers import SparseFieldsetMixin
+from . import jobs
+from .documents import store_upload
 from .models import User, UserDocument
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -44,20 +48,32 @@ class UserLoginSerializer(serializers.Serializer):
         
         return attrs
 
-class UserSerializer(serializers.ModelSerializer):
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 
                  'date_of_birth', 'phone_number', 'address', 'city', 'state', 'zip_code']
         read_only_fields = ['id']
 
-class UserDocumentSerializer(serializers.ModelSerializer):
+class UserDocumentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = UserDocument
-        fields = ['id', 'document_type', 'file', 'original_filename', 'uploaded_at', 'verified']
-        read_only_fields = ['id', 'uploaded_at', 'verified']
+        fields = ['id', 'document_type', 'file', 'original_filename', 'uploaded_at', 'verified',
+                  'extracted_income', 'processed_at']
+        read_only_fields = ['id', 'original_filename', 'uploaded_at', 'verified',
+                            'extracted_income', 'processed_at']
 
+    @transaction.atomic
     def create(self, validated_data):
+        upload = validated_data['file']
+        blob = store_upload(upload)
         validated_data['user'] = self.context['request'].user
-        validated_data['original_filename'] = validated_data['file'].name
-        return super().create(validated_data)
\ No newline at end of file
+        validated_data['original_filename'] = upload.name
+        validated_data['blob'] = blob
+        validated_data['file'] = blob.file.name
+        document = super().create(validated_data)
+        jobs.enqueue(document)
+        return document
\ No newline at end of file
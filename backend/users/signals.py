@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import get_principal_cache
+from .documents import release_blob
+from .models import User, UserDocument
+
+
+@receiver(post_delete, sender=UserDocument)
+def document_deleted(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release_blob(instance.blob_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Token requests in this worker must see the new password, is_active and profile
+    get_principal_cache().discard(instance.pk)
@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import User, UserDocument
+
+
+class IncomeSuggestionTests(TestCase):
+    """The suggested income is a decimal string, like every other amount"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('earner', password='earner-password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_decimal_string(self):
+        UserDocument.objects.create(
+            user=self.user, document_type='pay_stub', file='documents/stub.pdf', original_filename='stub.pdf',
+            extracted_income=Decimal('32500'), processed_at=timezone.now(),
+        )
+        response = self.client.get('/api/auth/documents/income/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['annual_income'], '32500.00')
+
+    def test_no_documents(self):
+        self.assertIsNone(self.client.get('/api/auth/documents/income/').json()['annual_income'])
@@ -5,7 +5,11 @@ urlpatterns = [
     path('register/', views.register_user, name='register'),
     path('login/', views.login_user, name='login'),
     path('logout/', views.logout_user, name='logout'),
+    path('token/', views.issue_token, name='token'),
+    path('token/refresh/', views.refresh_token, name='token_refresh'),
+    path('token/revoke/', views.revoke_token, name='token_revoke'),
     path('profile/', views.get_user_profile, name='profile'),
     path('profile/update/', views.update_user_profile, name='update_profile'),
     path('documents/', views.UserDocumentListCreateView.as_view(), name='user_documents'),
+    path('documents/income/', views.get_income_suggestion, name='document_income'),
 ]
\ No newline at end of file
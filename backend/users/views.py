@@ -1,16 +1,23 @@
-from rest_framework import status, generics
+from rest_framework import serializers, status, generics
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from django.contrib.auth import login, logout
+from django.contrib.auth import login, logout, user_logged_in
+from . import jobs
+from .authentication import SignedTokenAuthentication, get_revocation_list, issue_pair, read_token, resolve_user
+from .documents import HashingUploadHandler
 from .models import User, UserDocument
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
     UserSerializer,
-    UserDocumentSerializer
+    UserDocumentSerializer,
+    RefreshTokenSerializer,
 )
 
+INCOME_FORMAT = serializers.DecimalField(max_digits=12, decimal_places=2)
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
@@ -43,14 +50,58 @@ def login_user(request):
 @permission_classes([IsAuthenticated])
 def logout_user(request):
     """Logout user"""
+    if isinstance(request.successful_authenticator, SignedTokenAuthentication):
+        get_revocation_list().revoke(request.auth)
     logout(request)
     return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def issue_token(request):
+    """Login for API clients: exchange credentials for access and refresh tokens"""
+    serializer = UserLoginSerializer(data=request.data)
+    if serializer.is_valid():
+        user = serializer.validated_data['user']
+        user_logged_in.send(sender=user.__class__, request=request, user=user)
+        return Response(dict(issue_pair(user), user=UserSerializer(user).data), status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def refresh_token(request):
+    """Exchange a refresh token for a new token pair, without the password hashing of a login"""
+    serializer = RefreshTokenSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    payload = read_token(serializer.validated_data['refresh'], 'refresh')
+    user = resolve_user(payload, check_database=True)
+    # Refresh tokens are single use; of concurrent requests with one, only the first gets a pair
+    if not get_revocation_list().claim(payload):
+        raise AuthenticationFailed('Token has been revoked.')
+    return Response(issue_pair(user), status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def revoke_token(request):
+    """Logout for API clients: revoke the access token used and, if given, a refresh token"""
+    serializer = RefreshTokenSerializer(data=request.data, partial=True)
+    serializer.is_valid(raise_exception=True)
+    payloads = []
+    if serializer.validated_data.get('refresh'):
+        payload = read_token(serializer.validated_data['refresh'], 'refresh')
+        if payload['uid'] != request.user.pk:
+            return Response({'refresh': ['Token belongs to another user.']}, status=status.HTTP_400_BAD_REQUEST)
+        payloads.append(payload)
+    if isinstance(request.successful_authenticator, SignedTokenAuthentication):
+        payloads.append(request.auth)
+    if payloads:
+        get_revocation_list().revoke(*payloads)
+    return Response({'message': 'Token revoked'}, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_profile(request):
     """Get current user profile"""
-    serializer = UserSerializer(request.user)
+    serializer = UserSerializer(request.user, context={'request': request})
     return Response(serializer.data)
 
 @api_view(['PUT'])
@@ -63,10 +114,33 @@ def update_user_profile(request):
         return Response(serializer.data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_income_suggestion(request):
+    """Annual income extracted from the user's latest processed document, to prefill the eligibility form"""
+    suggestion = jobs.income_suggestion(request.user)
+    if suggestion is None:
+        return Response({'annual_income': None})
+    return Response({
+        # A decimal string, as UserDocumentSerializer renders it
+        'annual_income': INCOME_FORMAT.to_representation(suggestion['extracted_income']),
+        'document_id': suggestion['id'],
+        'document_type': suggestion['document_type'],
+        'original_filename': suggestion['original_filename'],
+        'processed_at': suggestion['processed_at'],
+    })
+
 class UserDocumentListCreateView(generics.ListCreateAPIView):
     """List and create user documents"""
     serializer_class = UserDocumentSerializer
     permission_classes = [IsAuthenticated]
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Upload handlers must be in place before anything (the CSRF check
+        # included) reads the request body
+        if request.method == 'POST':
+            request.upload_handlers = [HashingUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
     def get_queryset(self):
-        return UserDocument.objects.filter(user=self.request.user)
\ No newline at end of file
+        return UserDocument.objects.filter(user=self.request.user).order_by('-uploaded_at', '-id')
\ No newline at end of file
@@ -1,5 +1,6 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { EligibilityInput } from '../../types';
+import { documentsAPI } from '../../services/api';
 import { CheckCircle } from 'lucide-react';
 
 interface EligibilityFormProps {
@@ -16,6 +17,20 @@ const EligibilityForm: React.FC<EligibilityFormProps> = ({ onSubmit, isLoading }
     household_size: 1,
     state: '',
   });
+  const [incomeSource, setIncomeSource] = useState<string | null>(null);
+
+  // Offer the income figure read from the user's latest processed document
+  useEffect(() => {
+    documentsAPI.getIncomeSuggestion()
+      .then((suggestion) => {
+        if (suggestion.annual_income === null) return;
+        setFormData((current) => current.annual_income === 0
+          ? { ...current, annual_income: Number(suggestion.annual_income) }
+          : current);
+        setIncomeSource(suggestion.original_filename ?? 'an uploaded document');
+      })
+      .catch(() => undefined);
+  }, []);
 
   const handleChange = (e: React.ChangeEvent<HTMLInputElement | HTMLSelectElement>) => {
     const { name, value, type } = e.target;
@@ -83,6 +98,11 @@ const EligibilityForm: React.FC<EligibilityFormProps> = ({ onSubmit, isLoading }
               value={formData.annual_income}
               onChange={handleChange}
             />
+            {incomeSource && (
+              <p className="mt-1 text-xs text-gray-500">
+                Prefilled from {incomeSource}; adjust it if it is out of date.
+              </p>
+            )}
           </div>
 
           <div>
@@ -1,32 +1,58 @@
 import React, { useState, useEffect } from 'react';
-import { GovernmentProgram } from '../types';
+import { GovernmentProgram, ProgramFacets, ProgramSearchParams } from '../types';
 import { eligibilityAPI } from '../services/api';
-import { DollarSign, ExternalLink, Filter } from 'lucide-react';
+import { DollarSign, ExternalLink, Filter, Search } from 'lucide-react';
+
+const PAGE_SIZE = 24;
 
 const Programs: React.FC = () => {
   const [programs, setPrograms] = useState<GovernmentProgram[]>([]);
-  const [filteredPrograms, setFilteredPrograms] = useState<GovernmentProgram[]>([]);
+  const [facets, setFacets] = useState<ProgramFacets | null>(null);
+  const [count, setCount] = useState(0);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState('');
+  const [query, setQuery] = useState('');
+  const [debouncedQuery, setDebouncedQuery] = useState('');
   const [selectedType, setSelectedType] = useState('all');
+  const [benefitRange, setBenefitRange] = useState('');
+  const [ageRange, setAgeRange] = useState('');
+  const [studentsOnly, setStudentsOnly] = useState(false);
+  const [page, setPage] = useState(1);
 
+  // Search once typing pauses
   useEffect(() => {
-    fetchPrograms();
-  }, []);
+    const timer = setTimeout(() => {
+      if (query.trim() !== debouncedQuery) {
+        setDebouncedQuery(query.trim());
+        setPage(1);
+      }
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [query]);
+
+  // Every filter change starts again from the first page
+  const changeFilter = <T,>(setter: (value: T) => void) => (value: T) => {
+    setter(value);
+    setPage(1);
+  };
 
   useEffect(() => {
-    if (selectedType === 'all') {
-      setFilteredPrograms(programs);
-    } else {
-      setFilteredPrograms(programs.filter(program => program.program_type === selectedType));
-    }
-  }, [programs, selectedType]);
+    fetchPrograms();
+  }, [debouncedQuery, selectedType, benefitRange, ageRange, studentsOnly, page]);
 
   const fetchPrograms = async () => {
+    const params: ProgramSearchParams = { page, page_size: PAGE_SIZE };
+    if (debouncedQuery) params.q = debouncedQuery;
+    if (selectedType !== 'all') params.program_type = selectedType;
+    if (benefitRange) params.benefit_range = benefitRange;
+    if (ageRange) params.age_range = ageRange;
+    if (studentsOnly) params.requires_enrollment = true;
     try {
-      const data = await eligibilityAPI.getPrograms();
-      setPrograms(data);
-      setFilteredPrograms(data);
+      const data = await eligibilityAPI.searchPrograms(params);
+      setPrograms(data.results);
+      setFacets(data.facets);
+      setCount(data.count);
+      setError('');
     } catch (error) {
       setError('Failed to load programs. Please try again.');
     } finally {
@@ -63,6 +89,29 @@ const Programs: React.FC = () => {
     { value: 'financial', label: 'Financial Aid' },
   ];
 
+  const benefitRanges = [
+    { value: '', label: 'Any benefit' },
+    { value: '0-1000', label: 'Under $1,000' },
+    { value: '1000-5000', label: '$1,000 - $5,000' },
+    { value: '5000-10000', label: '$5,000 - $10,000' },
+    { value: '10000-', label: '$10,000 and up' },
+  ];
+
+  const ageRanges = [
+    { value: '', label: 'Any age' },
+    { value: '16-17', label: 'Ages 16-17' },
+    { value: '18-24', label: 'Ages 18-24' },
+    { value: '25-64', label: 'Ages 25-64' },
+    { value: '65-', label: 'Ages 65+' },
+  ];
+
+  const withCount = (label: string, counts: Record<string, number> | undefined, value: string) => {
+    if (!value || !counts) return label;
+    return `${label} (${counts[value] ?? 0})`;
+  };
+
+  const totalPages = Math.max(1, Math.ceil(count / PAGE_SIZE));
+
   if (isLoading) {
     return (
       <div className="min-h-screen bg-gray-50 flex items-center justify-center">
@@ -100,30 +149,72 @@ const Programs: React.FC = () => {
           </p>
         </div>
 
-        {/* Filter */}
-        <div className="mb-8">
-          <div className="flex items-center space-x-4">
+        {/* Search and filters */}
+        <div className="mb-8 space-y-4">
+          <div className="relative max-w-xl">
+            <Search className="h-5 w-5 text-gray-400 absolute left-3 top-1/2 -translate-y-1/2" />
+            <input
+              type="search"
+              value={query}
+              onChange={(e) => setQuery(e.target.value)}
+              placeholder="Search programs by name or description"
+              className="input-field pl-10"
+            />
+          </div>
+          <div className="flex flex-wrap items-center gap-4">
             <Filter className="h-5 w-5 text-gray-500" />
             <select
               value={selectedType}
-              onChange={(e) => setSelectedType(e.target.value)}
+              onChange={(e) => changeFilter(setSelectedType)(e.target.value)}
               className="input-field max-w-xs"
             >
               {programTypes.map((type) => (
                 <option key={type.value} value={type.value}>
-                  {type.label}
+                  {withCount(type.label, facets?.program_type, type.value === 'all' ? '' : type.value)}
+                </option>
+              ))}
+            </select>
+            <select
+              value={benefitRange}
+              onChange={(e) => changeFilter(setBenefitRange)(e.target.value)}
+              className="input-field max-w-xs"
+            >
+              {benefitRanges.map((range) => (
+                <option key={range.value} value={range.value}>
+                  {withCount(range.label, facets?.benefit_range, range.value)}
+                </option>
+              ))}
+            </select>
+            <select
+              value={ageRange}
+              onChange={(e) => changeFilter(setAgeRange)(e.target.value)}
+              className="input-field max-w-xs"
+            >
+              {ageRanges.map((range) => (
+                <option key={range.value} value={range.value}>
+                  {withCount(range.label, facets?.age_range, range.value)}
                 </option>
               ))}
             </select>
+            <label className="flex items-center space-x-2 text-sm text-gray-700">
+              <input
+                type="checkbox"
+                checked={studentsOnly}
+                onChange={(e) => changeFilter(setStudentsOnly)(e.target.checked)}
+              />
+              <span>
+                For enrolled students{facets ? ` (${facets.requires_enrollment.true})` : ''}
+              </span>
+            </label>
             <span className="text-sm text-gray-500">
-              Showing {filteredPrograms.length} of {programs.length} programs
+              {count} matching programs
             </span>
           </div>
         </div>
 
         {/* Programs Grid */}
         <div className="grid gap-6 md:grid-cols-2 lg:grid-cols-3">
-          {filteredPrograms.map((program) => (
+          {programs.map((program) => (
             <div key={program.id} className="card hover:shadow-lg transition-shadow duration-200">
               <div className="flex justify-between items-start mb-3">
                 <h3 className="text-lg font-semibold text-gray-900 line-clamp-2">
@@ -191,9 +282,31 @@ const Programs: React.FC = () => {
           ))}
         </div>
 
-        {filteredPrograms.length === 0 && (
+        {programs.length === 0 && (
           <div className="text-center py-12">
-            <p className="text-gray-500 text-lg">No programs found for the selected category.</p>
+            <p className="text-gray-500 text-lg">No programs match your search.</p>
+          </div>
+        )}
+
+        {totalPages > 1 && (
+          <div className="flex justify-center items-center space-x-4 mt-8">
+            <button
+              onClick={() => setPage(page - 1)}
+              disabled={page <= 1}
+              className="btn-secondary disabled:opacity-50"
+            >
+              Previous
+            </button>
+            <span className="text-sm text-gray-600">
+              Page {page} of {totalPages}
+            </span>
+            <button
+              onClick={() => setPage(page + 1)}
+              disabled={page >= totalPages}
+              className="btn-secondary disabled:opacity-50"
+            >
+              Next
+            </button>
           </div>
         )}
       </div>
@@ -2,11 +2,14 @@ import axios from 'axios';
 import { 
   User, 
   GovernmentProgram, 
+  ProgramSearchParams,
+  ProgramSearchResponse,
   EligibilityInput, 
   EligibilityResponse, 
-  EligibilityCheck,
+  EligibilityHistoryPage,
   ApplicationStatus,
   UserDocument,
+  IncomeSuggestion,
   AuthResponse 
 } from '../types';
 
@@ -68,13 +71,19 @@ export const eligibilityAPI = {
     return response.data;
   },
 
+  searchPrograms: async (params: ProgramSearchParams): Promise<ProgramSearchResponse> => {
+    const response = await api.get('/eligibility/programs/search/', { params });
+    return response.data;
+  },
+
   checkEligibility: async (data: EligibilityInput): Promise<EligibilityResponse> => {
     const response = await api.post('/eligibility/check/', data);
     return response.data;
   },
 
-  getEligibilityHistory: async (): Promise<EligibilityCheck[]> => {
-    const response = await api.get('/eligibility/history/');
+  // Newest checks first; pass the page's `next` to load the following one
+  getEligibilityHistory: async (next?: string | null): Promise<EligibilityHistoryPage> => {
+    const response = await api.get(next || '/eligibility/history/');
     return response.data;
   },
 
@@ -98,6 +107,14 @@ export const eligibilityAPI = {
     total_eligibility_checks: number;
     total_applications: number;
     program_type_distribution: Record<string, number>;
+    checks_per_state: Record<string, number>;
+    checks_per_day: Record<string, number>;
+    eligible_rate_per_program: {
+      program_id: number;
+      program_name: string;
+      eligible_checks: number;
+      eligible_rate: number;
+    }[];
   }> => {
     const response = await api.get('/eligibility/statistics/');
     return response.data;
@@ -123,6 +140,11 @@ export const documentsAPI = {
     });
     return response.data;
   },
+
+  getIncomeSuggestion: async (): Promise<IncomeSuggestion> => {
+    const response = await api.get('/auth/documents/income/');
+    return response.data;
+  },
 };
 
 export default api;
\ No newline at end of file
@@ -24,9 +24,44 @@ export interface GovernmentProgram {
   max_income?: number;
   requires_enrollment: boolean;
   requires_citizenship: boolean;
+  states: string;
   is_active: boolean;
 }
 
+export interface ProgramSearchParams {
+  q?: string;
+  program_type?: string;
+  benefit_range?: string;
+  age_range?: string;
+  requires_enrollment?: boolean;
+  requires_citizenship?: boolean;
+  state?: string;
+  page?: number;
+  page_size?: number;
+}
+
+export interface ProgramFacets {
+  program_type: Record<string, number>;
+  benefit_range: Record<string, number>;
+  age_range: Record<string, number>;
+  requires_enrollment: { true: number; false: number };
+  requires_citizenship: { true: number; false: number };
+}
+
+export interface EligibilityHistoryPage {
+  // Absolute URL of the next (older) page, or null on the last one
+  next: string | null;
+  results: EligibilityCheck[];
+}
+
+export interface ProgramSearchResponse {
+  count: number;
+  next: string | null;
+  previous: string | null;
+  facets: ProgramFacets;
+  results: GovernmentProgram[];
+}
+
 export interface EligibilityInput {
   age: number;
   annual_income: number;
@@ -38,6 +73,7 @@ export interface EligibilityInput {
 
 export interface EligibilityCheck {
   id: number;
+  uuid: string;
   age: number;
   annual_income: number;
   is_student: boolean;
@@ -66,6 +102,16 @@ export interface UserDocument {
   original_filename: string;
   uploaded_at: string;
   verified: boolean;
+  extracted_income?: string | null;
+  processed_at?: string | null;
+}
+
+export interface IncomeSuggestion {
+  annual_income: string | null;
+  document_id?: number;
+  document_type?: UserDocument['document_type'];
+  original_filename?: string;
+  processed_at?: string;
 }
 
 export interface AuthResponse {